@@ -9,9 +9,10 @@ from . import drawdown, turnover, periodstats, trade, detail
 
 
 class Analyzer:
-    def __init__(self, args: arg.Args, order_handler):
+    def __init__(self, args: arg.Args, order_handler, use_detail=True):
         self.args = args
         self.order_handler = order_handler
+        self.use_detail = use_detail
         self.interval_in_day = self.__calculate_interval_in_day(args.interval)
         self.intervals_per_year = helper.calculate_number_of_intervals_per_year(args.interval)
         self.current_year = 0
@@ -39,7 +40,7 @@ class Analyzer:
 
         # 데이터프레임 단위의 분석을 사용할 경우에만 추가.
         # 다른 analyzer의 정보를 사용하기 때문에 가장 마지막에 append 해야 한다.
-        if self.args.backtest.use_analyze_per_dataframe:
+        if self.use_detail and self.args.backtest.use_analyze_per_dataframe:
             analyzers["detail"] = detail.Detail(self, symbol, self.order_handler)
 
         return analyzers
@@ -0,0 +1,40 @@
+import numpy as np
+
+
+class Buffer:
+    """
+    append만 하는 1차원 numpy 버퍼. 공간이 부족하면 크기를 두 배로 늘리므로 append는 평균 O(1)이다.\n
+    buf[-1], len(buf) 처럼 리스트와 같이 읽을 수 있고, values는 채워진 부분의 view를 반환한다.
+    """
+
+    def __init__(self, dtype="float64", capacity=256):
+        self.array = np.empty(max(1, capacity), dtype=dtype)
+        self.size = 0
+
+    def append(self, value):
+        if self.size == len(self.array):
+            grown = np.empty(len(self.array) * 2, dtype=self.array.dtype)
+            grown[: self.size] = self.array
+            self.array = grown
+
+        self.array[self.size] = value
+        self.size += 1
+
+    @property
+    def values(self):
+        return self.array[: self.size]
+
+    def to_array(self):
+        return self.values.copy()
+
+    def last(self, default=None):
+        return self.array[self.size - 1] if self.size > 0 else default
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __iter__(self):
+        return iter(self.values)
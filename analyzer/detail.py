@@ -1,6 +1,8 @@
+import numpy as np
 import pandas as pd
 
 from . import base
+from . import buffer
 
 
 class Detail(base.Base):
@@ -10,50 +12,65 @@ class Detail(base.Base):
         self.analyzer = analyzer
         self.symbol = symbol
 
+        # 데이터프레임 행은 컬럼별 버퍼에 쌓아두고 finalize에서 한 번에 DataFrame으로 만든다.
         self.data = pd.DataFrame()
+        self.row_buffers = {}
+        self.index_buffer = buffer.Buffer("int64")
+        self.index_tz = None
 
         # 기본 정보
-        self.position_sizes = []
-        self.position_values = []
-        self.cash_values = []
+        self.position_sizes = buffer.Buffer()
+        self.position_values = buffer.Buffer()
+        self.cash_values = buffer.Buffer()
         self.prev_portfolio_value = None
-        self.portfolio_values = []
-        self.all_portfolio_values = []
-        self.all_cash_values = []
+        self.portfolio_values = buffer.Buffer()
+        self.all_portfolio_values = buffer.Buffer()
+        self.all_cash_values = buffer.Buffer()
 
         # PnL
-        self.pnl_values = []
-        self.cum_pnl_values = []
+        self.pnl_values = buffer.Buffer()
+        self.cum_pnl_values = buffer.Buffer()
 
         # Returns
-        self.return_values = []
-        self.cum_return_values = []
+        self.return_values = buffer.Buffer()
+        self.cum_return_values = buffer.Buffer()
 
         # TurnOver
-        self.turnover_values = []
+        self.turnover_values = buffer.Buffer()
 
         # Sharpe
         # self.sharpe_values = []
 
         # Trade
-        self.win_rate_values = []
-        self.number_of_wins = []
-        self.number_of_closed_orders = []
-        self.number_of_loses = []
-        self.total_loses = []
-        self.total_profit = []
+        self.win_rate_values = buffer.Buffer()
+        self.number_of_wins = buffer.Buffer("int64")
+        self.number_of_closed_orders = buffer.Buffer("int64")
+        self.number_of_loses = buffer.Buffer("int64")
+        self.total_loses = buffer.Buffer()
+        self.total_profit = buffer.Buffer()
 
         # P/L Ratio
-        self.pnl_ratio_values = []
+        self.pnl_ratio_values = buffer.Buffer()
 
         # Drawdown
-        self.drawdown_values = []
-        self.drawn_period_values = []
-        self.max_drawdown_values = []
+        self.drawdown_values = buffer.Buffer()
+        self.drawn_period_values = buffer.Buffer()
+        self.max_drawdown_values = buffer.Buffer()
+
+    def __append_row(self, ohlcv):
+        if not self.row_buffers:
+            for key in ohlcv.keys():
+                dtype = np.asarray(ohlcv[key]).dtype
+                self.row_buffers[key] = buffer.Buffer(dtype if dtype.kind in "biuf" else object)
+            self.index_tz = ohlcv.name.tz
+
+        for key, buf in self.row_buffers.items():
+            buf.append(ohlcv[key])
+        self.index_buffer.append(ohlcv.name.value)
 
     def on_data(self, df):
         ohlcv = df.iloc[-1]
-        self.data = self.data.append(ohlcv)
+        self.__append_row(ohlcv)
 
         close_price = ohlcv["close"]
 
@@ -77,7 +94,7 @@ class Detail(base.Base):
         # pnl = self.analyzer.analyzers[self.symbol]["total"]["periodstats"].pnl_value
         pnl = self.position_values[-1] - self.position_values[-2] if len(self.position_values) > 1 else 0.0
         self.pnl_values.append(pnl)
-        prev_pnl = self.cum_pnl_values[-1] if len(self.cum_pnl_values) > 0 else 0
+        prev_pnl = self.cum_pnl_values.last(0)
         self.cum_pnl_values.append(prev_pnl + pnl)
 
         # Returns
@@ -122,3 +139,15 @@ class Detail(base.Base):
         self.max_drawdown_values.append(max_drawdown)
 
         self.prev_portfolio_value = portfolio_value
+
+    def finalize(self):
+        # 결과 작성 코드가 numpy 배열로 사용할 수 있도록 버퍼를 배열로 바꾼다.
+        for name, value in list(vars(self).items()):
+            if isinstance(value, buffer.Buffer) and name != "index_buffer":
+                setattr(self, name, value.to_array())
+
+        if self.row_buffers:
+            index = pd.to_datetime(self.index_buffer.values, unit="ns", utc=self.index_tz is not None)
+            if self.index_tz is not None:
+                index = index.tz_convert(self.index_tz)
+            self.data = pd.DataFrame({key: buf.values for key, buf in self.row_buffers.items()}, index=index)
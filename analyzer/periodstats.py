@@ -2,6 +2,7 @@ import numpy as np
 from statistics import geometric_mean
 
 from . import base
+from . import buffer
 
 
 class PeriodStats(base.Base):
@@ -14,7 +15,7 @@ class PeriodStats(base.Base):
         self.start_time = None
         self.end_time = None
         self.pnl_value = 0.0
-        self.returns = []
+        self.returns = buffer.Buffer()
         self.positive_count = 0
         self.negative_count = 0
         self.nochange_count = 0
@@ -48,24 +49,22 @@ class PeriodStats(base.Base):
         self.last_value = value
 
     def finalize(self):
-        positive_list = []
-        negative_list = []
+        returns = self.returns.values
 
-        for val in self.returns:
-            if val > 0.0:
-                self.positive_count += 1
-                positive_list.append(val)
-            elif val < 0.0:
-                self.negative_count += 1
-                negative_list.append(val)
-            else:
-                self.nochange_count += 1
+        positive = returns[returns > 0.0]
+        negative = returns[returns < 0.0]
+        self.positive_count = len(positive)
+        self.negative_count = len(negative)
+        self.nochange_count = len(returns) - self.positive_count - self.negative_count
 
-            self.best = max(self.best, val)
-            self.worst = min(self.worst, val)
+        # nan은 best/worst 계산에서 제외한다.
+        valid = returns[~np.isnan(returns)]
+        if len(valid) > 0:
+            self.best = max(self.best, float(valid.max()))
+            self.worst = min(self.worst, float(valid.min()))
 
-        self.positive_avg = np.mean(positive_list) if positive_list else 0
-        self.negative_avg = np.mean(negative_list) if negative_list else 0
+        self.positive_avg = np.mean(positive) if len(positive) > 0 else 0
+        self.negative_avg = np.mean(negative) if len(negative) > 0 else 0
 
         self.sharpe_ratio = self.calculate_sharpe_ratio()
         self.win_rate = (
@@ -78,8 +77,8 @@ class PeriodStats(base.Base):
         # Sharpe Ratio = (자산 X의 기대수익률 – 무위험 자산 수익률) / 자산 X의 기대수익률의 표준편차
         try:
             # avg = np.mean(self.returns)
-            avg = geometric_mean(map(lambda x: x + 1.0, self.returns)) - 1.0
-            stdev = np.std(self.returns)
+            avg = geometric_mean((self.returns.values + 1.0).tolist()) - 1.0
+            stdev = np.std(self.returns.values)
         except Exception:
             avg = 0
             stdev = 0
@@ -95,4 +94,4 @@ class PeriodStats(base.Base):
         return ((prect ** (365 / len(self.returns))) - 1) * 100.0
 
     def get_last_return_value(self):
-        return self.returns[-1] if len(self.returns) > 0 else 0.0
+        return self.returns.last(0.0)
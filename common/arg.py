@@ -13,10 +13,16 @@ class BacktestArgs:
     initial_usd: float
     commission: float
     use_analyze_per_dataframe: bool
+    use_window_view: bool = False
     start_time: datetime.date = None
     end_time: datetime.date = None
 
 
+@dataclass
+class LiveArgs:
+    use_window_view: bool = False
+
+
 @dataclass
 class MultiOrderArgs:
     order_interval: int
@@ -39,6 +45,9 @@ class Args:
     backtest: BacktestArgs = None
     fill_missing_data: bool = True
     multi_order: MultiOrderArgs = None
+    live: LiveArgs = None
+    use_multiplex_socket: bool = False
+    bar_deadline_seconds: float = None
 
 
 def __get_json(strategy_name: str):
@@ -76,6 +85,8 @@ def create_args(strategy_name, is_live) -> Args:
         reset_variables=data["reset_variables"],
         fill_missing_data=data["fill_missing_data"] if "fill_missing_data" in data else True,
         author=data["author"] if "author" in data else None,
+        use_multiplex_socket=data["use_multiplex_socket"] if "use_multiplex_socket" in data else False,
+        bar_deadline_seconds=data["bar_deadline_seconds"] if "bar_deadline_seconds" in data else None,
     )
 
     if "exchange_alias" in data:
@@ -95,11 +106,20 @@ def create_args(strategy_name, is_live) -> Args:
     if "leverage" in data:
         args.leverage = data["leverage"]
 
+    # live, live_paper 모드에서 사용하는 설정
+    live_data = data["live"] if "live" in data else {}
+    args.live = LiveArgs(
+        use_window_view=live_data["use_window_view"] if "use_window_view" in live_data else False,
+    )
+
     if not is_live:
         args.backtest = BacktestArgs(
             initial_usd=data["backtest"]["initial_usd"],
             commission=data["backtest"]["commission"],
             use_analyze_per_dataframe=data["backtest"]["use_analyze_per_dataframe"],
+            use_window_view=(
+                data["backtest"]["use_window_view"] if "use_window_view" in data["backtest"] else False
+            ),
         )
 
         if "T" in data["backtest"]["start_time"]:
@@ -106,13 +106,18 @@ def send_slack(message: str, mention: str = None):
     # if r.status_code != 200:
     #     log.makeLogger("slack_noti").error(f"Failed to send slack. status={r.status_code} message={message}")
 
-def save_multi_summary(strategy_name, results):
-
+def save_multi_summary(strategy_name, results, pruned_results=list()):
+    """
+    results = [(variables, summaries)]
+    pruned_results = [(variables, 중단 사유)]. 조기 종료된 케이스는 pruned 시트에만 기록한다.
+    """
     error_results = pd.DataFrame()
     for i in results:
         if i[1] == {}:
             error_results = pd.concat([error_results, pd.DataFrame([{"error_variables": i[0]}])], ignore_index=True)
 
+    pruned = pd.DataFrame([{"variables": v, "reason": r} for v, r in pruned_results])
+
     combined_by_symbol = [pd.concat([s.T for t, s in m.items() if t != "ALL"], axis=0) for _, m in results if m.items()]
 
     combined_all = [pd.concat([s.T for t, s in m.items() if t == "ALL"], axis=0) for _, m in results if m.items()]
@@ -130,6 +135,7 @@ def save_multi_summary(strategy_name, results):
             all_summary.to_excel(writer, sheet_name="all")
             symbols_summary.to_excel(writer, sheet_name="symbols")
             error_results.to_excel(writer, sheet_name="errors")
+            pruned.to_excel(writer, sheet_name="pruned")
 
         print(all_summary)
     except Exception:
@@ -1,3 +1,5 @@
+import copy
+import hashlib
 import multiprocessing
 from itertools import product
 import logging
@@ -5,12 +7,18 @@ import time
 import sys
 import traceback
 from pathlib import Path
+from datetime import timedelta
 
 from mode import backtest
+from mode import sink
+from mode import stop
 from common import log
 from common import helper
 from common import arg
+from common import results
 from data import backtest as data
+from data import indicator
+from data import shared
 
 
 # Retreive data for a symbol of strategy
@@ -25,7 +33,9 @@ class StrategyData(data.BacktestData):
 
 
 class Multi:
-    def __init__(self, strategy_name):
+    def __init__(self, strategy_name, resume=True):
+        """resume이 True면 이전 실행에서 이미 끝난 케이스는 다시 실행하지 않는다."""
+        self.resume = resume
         self.strategy_name = str(strategy_name)
         self.variables = list(list())
         self.variables_to_test = list()
@@ -37,14 +47,30 @@ class Multi:
         # 파라미터 최적화를 실행하는 동안 불필요한 로그 출력을 제한한다.
         log.min_log_level = logging.WARNING
 
+        # 워커들이 함께 사용할 공유 메모리 데이터
+        self.data_plane = None
+
+        # 케이스마다 적용할 조기 종료 규칙
+        self.stop_rules = []
+
+        # 워커 실행 전에 미리 계산해 둘 지표: [(지표 이름, 파라미터)]
+        self.indicators = []
+
     def run_strategy(self, variables):
         try:
             symbols_to_override = [s[1] for s in variables if s[0] == "symbols"]
             if symbols_to_override:
                 symbols_to_override = [s.upper() for s in symbols_to_override[0]]
 
-            argos = backtest.BacktestMode(self.strategy_name, False, symbols_to_override)
-            return variables, argos.run(variables)
+            # 파라미터 최적화에서는 summaries만 사용하므로 파일을 쓰지 않는다.
+            argos = backtest.BacktestMode(
+                self.strategy_name, False, symbols_to_override, self.data_plane, sink.MemorySink()
+            )
+            # 규칙은 상태를 가지므로 케이스마다 복사해서 사용한다.
+            for rule in self.stop_rules:
+                argos.add_stop_rule(copy.deepcopy(rule))
+            summaries = argos.run(variables)
+            return variables, summaries, argos.stop_reason
         except Exception:
             print("Exception: run_strategy. Returning empty run_strategy")
             Path(".error").mkdir(parents=True, exist_ok=True)
@@ -55,7 +81,57 @@ class Multi:
                 "w",
             ) as f:
                 f.write("".join(traceback.format_exception(*sys.exc_info())))
-            return variables, {}
+            return variables, {}, None
+
+    def add_stop_rule(self, rule: stop.StopRule):
+        self.stop_rules.append(rule)
+
+    def add_indicator(self, name: str, **params):
+        """
+        워커 실행 전에 부모 프로세스에서 미리 계산할 지표를 추가한다.\n
+        파라미터 값이 add_variable로 추가한 변수 이름이면 케이스들에 등장하는 그 변수의 모든 값으로 계산한다.
+        ex) multi.add_indicator("sma", window="long_period_mapping")
+        """
+        self.indicators.append((name, params))
+
+    def get_indicator_params(self, params):
+        """변수 이름으로 지정된 파라미터를 케이스들의 값으로 펼친 파라미터 조합 list"""
+        candidates = []
+        for key, value in params.items():
+            values = [value]
+            if isinstance(value, str):
+                found = []
+                for case in self.variables_to_test:
+                    for name, case_value in case:
+                        if name != value:
+                            continue
+                        # permutable 변수는 심볼별 값의 tuple이다.
+                        for v in case_value if isinstance(case_value, (list, tuple)) else [case_value]:
+                            if v not in found:
+                                found.append(v)
+                values = found or values
+            candidates.append([(key, v) for v in values])
+        return [dict(c) for c in product(*candidates)]
+
+    def precompute_indicators(self):
+        """공유 메모리에 올린 데이터로 지표를 한 번씩만 계산해 캐시에 저장한다. 워커들은 캐시 파일을 읽기만 한다."""
+        if not self.indicators:
+            return
+
+        begin_ts = time.time()
+        interval = arg.create_args(self.strategy_name, False).interval
+        cache = indicator.IndicatorCache()
+        count = 0
+        for sym in self.get_all_symbols():
+            entry = self.data_plane.manifest.get(sym.lower())
+            if entry is None:
+                continue
+            df = self.data_plane.get(sym)
+            for name, params in self.indicators:
+                params_list = self.get_indicator_params(params)
+                cache.get_many(sym, interval, df, entry["fingerprint"], name, params_list)
+                count += len(params_list)
+        print(f"Precomputed {count} indicator series in {time.time() - begin_ts:.1f} seconds.")
 
     def add_variable(self, name: str, values: list):
         self.variables.append(list(product([name], values)))
@@ -127,16 +203,45 @@ class Multi:
         data = StrategyData(self.strategy_name)
         data.get_data(symbol)
 
-    def get_all_data(self):
+    def get_all_symbols(self):
         all_syms = []
         for v in self.variables_to_test:
             for sym in v[0][1]:
                 if sym not in all_syms:
                     all_syms.append(sym)
+        return all_syms
+
+    def get_all_data(self):
+        all_syms = self.get_all_symbols()
         # Download data into cache first before start strategy to solve duplicate downloads because of multiprocessing
         with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
             pool.map(self.get_strategy_data, all_syms)
 
+    def publish_all_data(self):
+        """prefetch 한 데이터를 부모 프로세스에서 한 번만 읽어 공유 메모리에 올린다."""
+        strategy_data = StrategyData(self.strategy_name)
+        start_time = strategy_data.args.backtest.start_time
+        end_time = strategy_data.args.backtest.end_time
+        history_start = start_time - timedelta(days=strategy_data.args.history_days + 1)
+
+        self.data_plane = shared.SharedDataPlane()
+        for sym in self.get_all_symbols():
+            df = strategy_data._get_data(sym, history_start, end_time)
+            self.data_plane.publish(
+                sym, df, helper.datetime_to_timestamp(history_start), helper.datetime_to_timestamp(end_time)
+            )
+
+    def get_result_name(self):
+        """
+        결과 저장소 이름. 저장소 key는 variables만 담으므로 백테스트 구간, interval, 설정 심볼을 이름에 넣는다.\n
+        설정을 바꾸면 다른 저장소를 사용하므로 resume이 이전 설정의 결과를 재사용하지 않는다.
+        """
+        args = arg.create_args(self.strategy_name, False)
+        start = args.backtest.start_time.strftime("%Y%m%d%H%M")
+        end = args.backtest.end_time.strftime("%Y%m%d%H%M")
+        symbols = hashlib.blake2b(",".join(self.syms_from_config).encode(), digest_size=4).hexdigest()
+        return f"{self.strategy_name}_multi_{start}_{end}_{args.interval}_{symbols}"
+
     def run(self):
         self.set_variables_to_test()
 
@@ -147,8 +252,34 @@ class Multi:
         # Prefetch all data of each symbols
         self.get_all_data()
 
-        with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-            results = pool.map(self.run_strategy, [list(t) for t in self.variables_to_test])
-
-        helper.save_multi_summary(self.strategy_name, results)
+        # 끝난 케이스는 바로 저장하고, 다시 실행하면 저장된 케이스는 건너뛴다.
+        result_store = results.ResultStore(results.ResultStore.make_path(self.get_result_name()))
+        if not self.resume:
+            result_store.clear()
+        cases = [list(t) for t in self.variables_to_test]
+        keys = {results.ResultStore.make_key(c) for c in cases}
+        finished = result_store.get_finished_keys() & keys
+        cases = [c for c in cases if results.ResultStore.make_key(c) not in finished]
+        print(f"Skipping {len(finished)} finished cases. Running {len(cases)} cases.")
+
+        # 워커들은 부모가 공유 메모리에 올린 데이터를 복사 없이 사용한다.
+        self.publish_all_data()
+        try:
+            self.precompute_indicators()
+            with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
+                for i, (variables, summaries, stop_reason) in enumerate(
+                    pool.imap_unordered(self.run_strategy, cases), start=1
+                ):
+                    status = result_store.put(variables, summaries, stop_reason)
+                    print(f"[{i}/{len(cases)}] {status}: {helper.variable_to_string(variables)}")
+        finally:
+            self.data_plane.close()
+            self.data_plane = None
+
+        stored = result_store.load(keys)
+        result_store.close()
+        results_to_save = [(v, s) for v, s, status, _ in stored if status != results.STATUS_PRUNED]
+        pruned_results = [(v, reason) for v, _, status, reason in stored if status == results.STATUS_PRUNED]
+
+        helper.save_multi_summary(self.strategy_name, results_to_save, pruned_results)
         print(f"Multi process took {time.time() - begin_ts} seconds.")
@@ -1,3 +1,4 @@
+import copy
 import multiprocessing
 from itertools import product
 import logging
@@ -9,11 +10,16 @@ from pathlib import Path
 import os
 
 from mode import backtest
+from mode import sink
+from mode import stop
 from common import log
 from common import helper
 from common import arg
+from common import results
 from data import backtest as data
+from data import shared
 from datetime import datetime
+from datetime import timedelta
 
 # Retreive data for a symbol of strategy
 class StrategyData2(data.BacktestData):
@@ -26,7 +32,9 @@ class StrategyData2(data.BacktestData):
         self._get_data(symbol, start_time, end_time)
 
 class Multi2:
-    def __init__(self, strategy_name, start_date, end_date):
+    def __init__(self, strategy_name, start_date, end_date, resume=True):
+        """resume이 True면 이전 실행에서 이미 끝난 케이스는 다시 실행하지 않는다."""
+        self.resume = resume
         self.start_date = start_date
         self.end_date = end_date
 
@@ -45,16 +53,29 @@ class Multi2:
         # 파라미터 최적화를 실행하는 동안 불필요한 로그 출력을 제한한다.
         log.min_log_level = logging.WARNING
 
+        # 워커들이 함께 사용할 공유 메모리 데이터
+        self.data_plane = None
+
+        # 케이스마다 적용할 조기 종료 규칙
+        self.stop_rules = []
+
     def run_strategy(self, variables):
         try:
             symbols_to_override = [s[1] for s in variables if s[0] == "symbols"]
             if symbols_to_override:
                 symbols_to_override = [s.upper() for s in symbols_to_override[0]]
 
-            argos = backtest.BacktestMode(self.strategy_name, False, symbols_to_override)
+            # 파라미터 최적화에서는 summaries만 사용하므로 파일을 쓰지 않는다.
+            argos = backtest.BacktestMode(
+                self.strategy_name, False, symbols_to_override, self.data_plane, sink.MemorySink()
+            )
+            # 규칙은 상태를 가지므로 케이스마다 복사해서 사용한다.
+            for rule in self.stop_rules:
+                argos.add_stop_rule(copy.deepcopy(rule))
             argos.args.backtest.start_time = self.start_date
             argos.args.backtest.end_time = self.end_date
-            return variables, argos.run(variables)
+            summaries = argos.run(variables)
+            return variables, summaries, argos.stop_reason
         except Exception:
             print("Exception: run_strategy. Returning empty run_strategy")
             Path(".error").mkdir(parents=True, exist_ok=True)
@@ -65,7 +86,10 @@ class Multi2:
                 "w",
             ) as f:
                 f.write("".join(traceback.format_exception(*sys.exc_info())))
-            return variables, {}
+            return variables, {}, None
+
+    def add_stop_rule(self, rule: stop.StopRule):
+        self.stop_rules.append(rule)
 
     def add_variable(self, name: str, values: list):
         self.variables.append(list(product([name], values)))
@@ -160,16 +184,63 @@ class Multi2:
                 }
         return best_sharpe_results
 
-    def get_all_data(self):
+    def get_all_symbols(self):
         all_syms = []
         for v in self.variables_to_test:
             for sym in v[0][1]:
                 if sym not in all_syms:
                     all_syms.append(sym)
+        return all_syms
+
+    def get_all_data(self):
+        all_syms = self.get_all_symbols()
         # Download data into cache first before start strategy to solve duplicate downloads because of multiprocessing
         with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
             pool.map(self.get_strategy_data, all_syms)
 
+    def publish_all_data(self):
+        """prefetch 한 데이터를 부모 프로세스에서 한 번만 읽어 공유 메모리에 올린다."""
+        strategy_data = StrategyData2(self.strategy_name)
+        start_time = self.start_date or strategy_data.args.backtest.start_time
+        end_time = self.end_date or strategy_data.args.backtest.end_time
+        history_start = start_time - timedelta(days=strategy_data.args.history_days + 1)
+
+        self.data_plane = shared.SharedDataPlane()
+        for sym in self.get_all_symbols():
+            df = strategy_data._get_data(sym, history_start, end_time)
+            self.data_plane.publish(
+                sym, df, helper.datetime_to_timestamp(history_start), helper.datetime_to_timestamp(end_time)
+            )
+
+    def run_cases(self, cases, result_name):
+        """
+        cases를 현재 start_date ~ end_date로 실행하고 [(variables, summaries, status, reason)]를 반환한다.\n
+        끝난 케이스는 바로 저장하고, 다시 실행하면 저장된 케이스는 건너뛴다.
+        """
+        result_store = results.ResultStore(results.ResultStore.make_path(result_name))
+        if not self.resume:
+            result_store.clear()
+        keys = {results.ResultStore.make_key(c) for c in cases}
+        finished = result_store.get_finished_keys() & keys
+        cases = [c for c in cases if results.ResultStore.make_key(c) not in finished]
+        print(f"Skipping {len(finished)} finished cases. Running {len(cases)} cases.")
+
+        with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
+            for i, (variables, summaries, stop_reason) in enumerate(
+                pool.imap_unordered(self.run_strategy, cases), start=1
+            ):
+                status = result_store.put(variables, summaries, stop_reason)
+                print(f"[{i}/{len(cases)}] {status}: {helper.variable_to_string(variables)}")
+
+        stored = result_store.load(keys)
+        result_store.close()
+        return stored
+
+    def get_result_name(self):
+        start = self.start_date.strftime("%Y%m%d") if self.start_date else "default"
+        end = self.end_date.strftime("%Y%m%d") if self.end_date else "default"
+        return f"{self.strategy_name}_multi2_{start}_{end}"
+
     def run(self):
         self.set_variables_to_test()
 
@@ -180,9 +251,17 @@ class Multi2:
         # Prefetch all data of each symbols
         self.get_all_data()
 
-        with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-            results = pool.map(self.run_strategy, [list(t) for t in self.variables_to_test])
+        # 워커들은 부모가 공유 메모리에 올린 데이터를 복사 없이 사용한다.
+        self.publish_all_data()
+        try:
+            stored = self.run_cases([list(t) for t in self.variables_to_test], self.get_result_name())
+        finally:
+            self.data_plane.close()
+            self.data_plane = None
+
+        results_to_save = [(v, s) for v, s, status, _ in stored if status != results.STATUS_PRUNED]
+        pruned_results = [(v, reason) for v, _, status, reason in stored if status == results.STATUS_PRUNED]
 
-        helper.save_multi_summary(self.strategy_name, results)
+        helper.save_multi_summary(self.strategy_name, results_to_save, pruned_results)
         print(f"Multi process took {time.time() - begin_ts} seconds.")
-        self.result = results
+        self.result = results_to_save
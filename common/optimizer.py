@@ -0,0 +1,186 @@
+import math
+import multiprocessing
+import numbers
+import time
+from datetime import timedelta
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from common import arg
+from common import helper
+from common import results
+from common.multi2 import Multi2
+
+
+def sharpe_objective(summaries):
+    """전체(ALL) Sharpe. 값이 클수록 좋은 케이스다."""
+    return summaries["ALL"]["total"]["Sharpe"]
+
+
+def sharpe_mdd_objective(summaries, mdd_weight=0.02):
+    """Sharpe에서 MDD(%)에 비례한 값을 뺀다. mdd_weight=0.02면 MDD 50%가 Sharpe 1만큼 감점된다."""
+    total = summaries["ALL"]["total"]
+    return total["Sharpe"] - mdd_weight * total["Max Drawdown(%)"]
+
+
+class Optimizer(Multi2):
+    """
+    Multi와 같은 방식으로 add_variable 한 변수 공간에서 전체 그리드를 모두 실행하지 않고 좋은 케이스를 찾는다.\n
+    - run_halving: successive halving. 모든 후보를 짧은 기간으로 실행한 뒤 상위 1/eta만 더 긴 기간으로 올리고,
+      마지막 단계에서 남은 후보만 전체 기간으로 실행한다.
+    - run_surrogate: 일부 케이스를 실행한 결과로 RandomForest를 학습하고,
+      예측 평균 + kappa * 트리 간 표준편차(UCB)가 큰 케이스를 다음에 실행한다.
+    각 단계의 결과는 ResultStore에 저장되므로 중단 후 다시 실행하면 이어서 진행한다.
+    """
+
+    def __init__(self, strategy_name, start_date=None, end_date=None, objective=sharpe_objective, resume=True):
+        args = arg.create_args(str(strategy_name), False)
+        start_date = start_date or args.backtest.start_time
+        end_date = end_date or args.backtest.end_time
+        Multi2.__init__(self, strategy_name, start_date, end_date, resume)
+
+        self.full_start_date = start_date
+        self.full_end_date = end_date
+        self.objective = objective
+
+    def get_score(self, summaries, status):
+        if status != results.STATUS_DONE or not summaries:
+            return float("-inf")
+        try:
+            score = float(self.objective(summaries))
+        except Exception:
+            return float("-inf")
+        return score if math.isfinite(score) else float("-inf")
+
+    def __evaluate(self, cases, start_date, end_date, label):
+        self.start_date = start_date
+        self.end_date = end_date
+        result_name = f"{self.strategy_name}_{label}_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+        return self.run_cases(cases, result_name)
+
+    def __prepare(self):
+        self.set_variables_to_test()
+        print(f"Num of cases: {len(self.variables_to_test)}")
+
+        # 데이터는 전체 기간으로 한 번만 받아서 공유 메모리에 올린다.
+        self.start_date = self.full_start_date
+        self.end_date = self.full_end_date
+        self.get_all_data()
+        self.publish_all_data()
+
+    def __finish(self, stored, begin_ts):
+        self.start_date = self.full_start_date
+        self.end_date = self.full_end_date
+
+        results_to_save = [(v, s) for v, s, status, _ in stored if status != results.STATUS_PRUNED]
+        pruned_results = [(v, reason) for v, _, status, reason in stored if status == results.STATUS_PRUNED]
+        helper.save_multi_summary(self.strategy_name, results_to_save, pruned_results)
+        print(f"Optimization took {time.time() - begin_ts} seconds.")
+        self.result = results_to_save
+
+    def get_halving_schedule(self, count, eta, min_days):
+        """[(기간(일), 실행할 후보 수)]. 마지막 단계는 항상 전체 기간이다."""
+        total_days = max(1, (self.full_end_date - self.full_start_date).days)
+        rungs = max(0, int(math.floor(math.log(max(count, 1), eta))))
+
+        schedule = []
+        for i in range(rungs + 1):
+            days = total_days
+            if i < rungs:
+                days = min(total_days, max(min_days, math.ceil(total_days / eta ** (rungs - i))))
+            schedule.append((days, max(1, math.ceil(count / eta**i))))
+        return schedule
+
+    def run_halving(self, eta=3, min_days=30):
+        begin_ts = time.time()
+        self.__prepare()
+        try:
+            candidates = [list(t) for t in self.variables_to_test]
+            schedule = self.get_halving_schedule(len(candidates), eta, min_days)
+
+            stored = []
+            for rung, (days, _) in enumerate(schedule):
+                end_date = min(self.full_end_date, self.full_start_date + timedelta(days=days))
+                print(f"[rung {rung + 1}/{len(schedule)}] {len(candidates)} cases, {days} days")
+                stored = self.__evaluate(candidates, self.full_start_date, end_date, f"halving{eta}")
+
+                if rung == len(schedule) - 1:
+                    break
+
+                # 점수가 높은 상위 1/eta 후보만 다음 단계로 올린다.
+                scored = sorted(stored, key=lambda x: self.get_score(x[1], x[2]), reverse=True)
+                promoted = {results.ResultStore.make_key(v) for v, _, _, _ in scored[: schedule[rung + 1][1]]}
+                candidates = [c for c in candidates if results.ResultStore.make_key(c) in promoted]
+        finally:
+            self.data_plane.close()
+            self.data_plane = None
+
+        self.__finish(stored, begin_ts)
+
+    @staticmethod
+    def encode_cases(cases):
+        """
+        케이스를 RandomForest 입력 행렬로 바꾼다. 숫자는 그대로, 숫자 tuple(심볼별 permutation)은 원소별 컬럼으로,
+        그 외 값(심볼 목록 등)은 범주 번호로 사용한다.
+        """
+        columns = []
+        for position in range(len(cases[0])):
+            values = [case[position][1] for case in cases]
+            if all(isinstance(v, numbers.Number) for v in values):
+                columns.append(np.array(values, dtype="float64"))
+            elif all(isinstance(v, (tuple, list)) and all(isinstance(x, numbers.Number) for x in v) for v in values) and (
+                len({len(v) for v in values}) == 1
+            ):
+                columns.extend(np.array(values, dtype="float64").T)
+            else:
+                labels = {}
+                columns.append(np.array([labels.setdefault(repr(v), len(labels)) for v in values], dtype="float64"))
+        return np.column_stack(columns)
+
+    def run_surrogate(self, n_trials, n_initial=None, batch_size=None, kappa=1.0, seed=0):
+        begin_ts = time.time()
+        self.__prepare()
+        try:
+            candidates = [list(t) for t in self.variables_to_test]
+            n_trials = min(n_trials, len(candidates))
+            batch_size = batch_size or multiprocessing.cpu_count()
+            n_initial = min(n_trials, n_initial or max(batch_size, n_trials // 5))
+
+            features = self.encode_cases(candidates)
+            keys = [results.ResultStore.make_key(c) for c in candidates]
+            rng = np.random.default_rng(seed)
+
+            # 처음에는 임의로 고른 케이스를 실행한다. 이후에는 새로 고른 케이스만 실행한다.
+            chosen = rng.choice(len(candidates), size=n_initial, replace=False).tolist()
+            stored = {}
+            batch = chosen
+            while True:
+                for v, s, status, reason in self.__evaluate(
+                    [candidates[i] for i in batch], self.start_date, self.end_date, "surrogate"
+                ):
+                    stored[results.ResultStore.make_key(v)] = (v, s, status, reason)
+                if len(chosen) >= n_trials:
+                    break
+
+                observed = np.array([self.get_score(*stored[keys[i]][1:3]) for i in chosen])
+                finite = observed[np.isfinite(observed)]
+                # 실패/중단 케이스는 관측된 최저 점수로 학습한다.
+                observed[~np.isfinite(observed)] = finite.min() if len(finite) > 0 else 0.0
+
+                model = RandomForestRegressor(n_estimators=100, random_state=seed)
+                model.fit(features[chosen], observed)
+
+                remaining = np.setdiff1d(np.arange(len(candidates)), chosen)
+                predictions = np.stack([tree.predict(features[remaining]) for tree in model.estimators_])
+                ucb = predictions.mean(axis=0) + kappa * predictions.std(axis=0)
+
+                batch = remaining[np.argsort(-ucb, kind="stable")[: min(batch_size, n_trials - len(chosen))]].tolist()
+                chosen.extend(batch)
+                print(f"[surrogate] {len(chosen)}/{n_trials} cases, best={finite.max() if len(finite) else None}")
+            stored = list(stored.values())
+        finally:
+            self.data_plane.close()
+            self.data_plane = None
+
+        self.__finish(stored, begin_ts)
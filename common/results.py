@@ -0,0 +1,80 @@
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+from common import helper
+
+STATUS_DONE = "done"
+STATUS_PRUNED = "pruned"
+STATUS_ERROR = "error"
+
+
+class ResultStore:
+    """
+    Multi 실행 결과를 케이스가 끝날 때마다 sqlite에 기록하는 저장소.\n
+    variables를 키로 사용하므로 다시 실행하면 이미 끝난 케이스는 건너뛴다(에러 케이스는 다시 실행).
+    부모 프로세스에서만 쓰기 때문에 별도의 잠금은 필요 없다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, status TEXT NOT NULL, reason TEXT, result BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_path(name):
+        return os.path.join(helper.create_directory("/backtest_result"), f"{name}_results.db")
+
+    @staticmethod
+    def make_key(variables):
+        return json.dumps([list(v) for v in variables], default=str)
+
+    def get_finished_keys(self):
+        rows = self.conn.execute("SELECT key FROM results WHERE status != ?", (STATUS_ERROR,))
+        return {key for key, in rows}
+
+    def put(self, variables, summaries, stop_reason=None):
+        if stop_reason:
+            status = STATUS_PRUNED
+        elif not summaries:
+            status = STATUS_ERROR
+        else:
+            status = STATUS_DONE
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (key, status, reason, result, created) VALUES (?, ?, ?, ?, ?)",
+            (
+                self.make_key(variables),
+                status,
+                stop_reason,
+                pickle.dumps((variables, summaries), protocol=pickle.HIGHEST_PROTOCOL),
+                time.time(),
+            ),
+        )
+        self.conn.commit()
+        return status
+
+    def load(self, keys=None):
+        """[(variables, summaries, status, reason)]. keys가 주어지면 해당 케이스만 반환한다."""
+        results = []
+        for key, status, reason, result in self.conn.execute(
+            "SELECT key, status, reason, result FROM results ORDER BY created"
+        ):
+            if keys is not None and key not in keys:
+                continue
+            variables, summaries = pickle.loads(result)
+            results.append((variables, summaries, status, reason))
+        return results
+
+    def clear(self):
+        self.conn.execute("DELETE FROM results")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
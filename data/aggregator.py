@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from common import helper
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+class RingBuffer:
+    """
+    고정 크기의 컬럼별 ring buffer. append는 O(1)이다.\n
+    값을 i, i + capacity 두 위치에 같이 써두므로 최근 n개를 항상 복사 없이 연속된 view로 읽을 수 있다.
+    """
+
+    def __init__(self, columns, capacity):
+        """columns = {컬럼명: dtype}"""
+        self.capacity = capacity
+        self.columns = list(columns)
+        self.arrays = [np.empty(2 * capacity, dtype=dtype) for dtype in columns.values()]
+        self.data = dict(zip(self.columns, self.arrays))
+        self.pos = 0
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, values):
+        """values는 columns 순서의 값"""
+        pos = self.pos
+        mirror = pos + self.capacity
+        for array, value in zip(self.arrays, values):
+            array[pos] = value
+            array[mirror] = value
+
+        self.pos = pos + 1 if pos + 1 < self.capacity else 0
+        if self.length < self.capacity:
+            self.length += 1
+
+    def extend(self, columns):
+        """columns 순서의 배열들을 한 번에 추가한다. capacity보다 길면 최근 capacity개만 남는다."""
+        count = len(columns[0]) if columns else 0
+        if count > self.capacity:
+            columns = [values[-self.capacity:] for values in columns]
+            count = self.capacity
+
+        positions = (self.pos + np.arange(count)) % self.capacity
+        for array, values in zip(self.arrays, columns):
+            array[positions] = values
+            array[positions + self.capacity] = values
+
+        self.pos = (self.pos + count) % self.capacity
+        self.length = min(self.capacity, self.length + count)
+
+    def bounds(self):
+        """최근 값 전체가 self.data의 각 배열에서 차지하는 [start, stop) 범위"""
+        end = self.pos + self.capacity
+        return end - self.length, end
+
+    def column(self, name, count=None):
+        """최근 count개(None이면 전체)의 읽기 전용 view. 오래된 값부터 정렬되어 있다."""
+        count = self.length if count is None else min(count, self.length)
+        # 최근 값은 항상 [pos + capacity - length, pos + capacity) 에 연속으로 있다.
+        end = self.pos + self.capacity
+        view = self.data[name][end - count: end]
+        view.flags.writeable = False
+        return view
+
+    def last(self, name, default=None):
+        if self.length == 0:
+            return default
+        return self.data[name][self.pos + self.capacity - 1]
+
+    def clear(self):
+        self.pos = 0
+        self.length = 0
+
+
+class TimeframeSeries:
+    """
+    기본 봉을 받아 하나의 상위 timeframe 봉을 만든다. 봉의 경계는 epoch(UTC 00:00) 기준으로 고정된다.\n
+    마지막 기본 봉이 들어오는 즉시 봉을 닫고 ring buffer에 추가한 뒤 listener를 호출한다.
+    중간 봉이 빠진 채 다음 구간의 봉이 들어오면 이전 구간은 가진 봉만으로 닫는다.
+    """
+
+    def __init__(self, symbol, interval, base_interval, capacity):
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = helper.interval_in_seconds(interval) * 1000
+        self.base_interval_ms = helper.interval_in_seconds(base_interval) * 1000
+        if self.interval_ms % self.base_interval_ms != 0:
+            raise ValueError(f"interval {interval} is not a multiple of {base_interval}")
+
+        dtypes = {"timestamp": "int64"}
+        dtypes.update({c: "float64" for c in OHLCV_COLUMNS})
+        self.bars = RingBuffer(dtypes, capacity)
+        self.listeners = []
+
+        # 아직 닫히지 않은 봉: [timestamp, open, high, low, close, volume]
+        self.current = None
+
+    def __close_current(self):
+        current, self.current = self.current, None
+        self.bars.append(current)
+        for listener in self.listeners:
+            listener(self.symbol, *current)
+
+    def on_bar(self, symbol, timestamp, open, high, low, close, volume):
+        bucket = timestamp - timestamp % self.interval_ms
+        current = self.current
+        if current is not None and current[0] != bucket:
+            self.__close_current()
+            current = None
+
+        if current is None:
+            self.current = [bucket, open, high, low, close, volume]
+        else:
+            if high > current[2]:
+                current[2] = high
+            if low < current[3]:
+                current[3] = low
+            current[4] = close
+            current[5] += volume
+
+        if timestamp + self.base_interval_ms >= bucket + self.interval_ms:
+            self.__close_current()
+
+    def __len__(self):
+        return len(self.bars)
+
+    def column(self, name, count=None):
+        return self.bars.column(name, count)
+
+    def to_df(self, count=None):
+        """닫힌 봉들의 DataFrame. 필요할 때만 만든다."""
+        index = pd.DatetimeIndex(pd.to_datetime(self.column("timestamp", count), unit="ms", utc=True), name="datetime")
+        return pd.DataFrame({c: np.array(self.column(c, count)) for c in OHLCV_COLUMNS}, index=index)
+
+
+class BarAggregator:
+    """
+    기본 interval의 닫힌 봉으로 심볼별 여러 상위 timeframe 봉을 동시에 유지한다.\n
+    data handler의 subscribe_timeframe으로 사용하며, 같은 (심볼, interval)은 하나의 TimeframeSeries를 공유한다.
+    """
+
+    def __init__(self, base_interval, capacity=1000):
+        self.base_interval = base_interval
+        self.capacity = capacity
+        self.series = {}
+
+    def get_series(self, symbol, interval):
+        return self.series.get((symbol, interval))
+
+    def subscribe(self, symbol, interval, listener=None, capacity=None):
+        """(TimeframeSeries, 새로 만들어졌는지 여부)"""
+        key = (symbol, interval)
+        is_new = key not in self.series
+        if is_new:
+            self.series[key] = TimeframeSeries(symbol, interval, self.base_interval, capacity or self.capacity)
+
+        series = self.series[key]
+        if listener is not None:
+            series.listeners.append(listener)
+        return series, is_new
@@ -1,5 +1,4 @@
 import datetime
-import sys
 import typing
 from dataclasses import dataclass
 
@@ -8,6 +7,9 @@ import pandas as pd
 from common import arg
 from common import helper
 from . import base
+from . import clock
+from . import indicator
+from . import window
 
 
 @dataclass
@@ -18,7 +20,15 @@ class Data:
     entire_df: typing.Any
     entire_length: int
     funding_rate_df: typing.Any
-    skip_count: int
+    funding_rates: typing.Any = None
+    funding_schedule: typing.Any = None
+    columns: typing.Any = None
+    bar_values: typing.Any = None
+    indicator_source: typing.Any = None
+
+
+def _to_ns(index):
+    return pd.DatetimeIndex(index).as_unit("ns").asi8
 
 
 class BacktestData(base.Base):
@@ -27,50 +37,67 @@ class BacktestData(base.Base):
         self.data_counter = 0
         self.datas = dict()
 
+        # 지표 캐시. 처음 get_indicator를 호출할 때 만든다.
+        self.indicator_cache = None
+        self.indicators = {}
+
     def _load_history(self, symbol):
         history_start = self.args.backtest.start_time - datetime.timedelta(days=self.args.history_days + 1)
         df = self._get_data(symbol, history_start, self.args.backtest.start_time)
 
         return df.tail(self.data_length - 1)
 
-    def __get_next(self):
-        next_datas = []
-        for data in self.datas.values():
-            if data.use_count >= min(data.entire_length, len(data.df) - self.data_length):
-                continue
-
-            if data.skip_count > 0:
-                # skip_count가 있으면 그 만큼 데이터를 스킵한다.
-                data.skip_count -= 1
-                continue
-
-            next_df = data.df[data.use_count: self.data_length + data.use_count]
-            data.use_count += 1
-
-            # funding rate가 변경될 경우 해당 내용 추가
-            funding_rate = None
-            data_date = next_df.iloc[-1].name
-            if len(data.funding_rate_df) > 0 and data.funding_rate_df.iloc[0].name <= data_date:
-                funding_rate = data.funding_rate_df.iloc[0]["funding_rate"]
-                data.funding_rate_df.drop(data.funding_rate_df.head(1).index, inplace=True)
-
-            next_datas.append((data.symbol, next_df, funding_rate))
+    def __get_bar(self, data, position):
+        if data.columns is not None:
+            # 윈도우 뷰 모드에서는 DataFrame을 잘라내지 않고 배열 범위만 넘긴다.
+            next_df = window.WindowFrame(data.df.index, data.columns, position, self.data_length + position)
+        else:
+            next_df = data.df[position: self.data_length + position]
+        data.use_count = position + 1
+        return next_df
+
+    def __notify_bar(self, data, position, listeners):
+        # listener가 있는 심볼만 봉 값을 python list로 한 번 변환해두고 사용한다.
+        if data.bar_values is None:
+            df = data.df
+            data.bar_values = [pd.DatetimeIndex(df.index).as_unit("ms").asi8.tolist()] + [
+                df[c].to_numpy(dtype="float64").tolist() for c in ["open", "high", "low", "close", "volume"]
+            ]
+
+        row = self.data_length - 1 + position
+        values = [v[row] for v in data.bar_values]
+        for listener in listeners:
+            listener(data.symbol, *values)
+
+    def _get_listener_history(self, symbol):
+        if symbol not in self.datas:
+            return None
+        return self.datas[symbol].df.iloc[: self.data_length - 1]
 
-        return next_datas
+    def __get_funding_rate(self, data, position):
+        # funding rate가 변경될 경우 해당 내용 추가. 봉 위치별로 미리 배정된 이벤트를 사용한다.
+        event = data.funding_schedule[position]
+        if event < 0:
+            return None
+        return data.funding_rates[event]
 
     def __load_funding_rate(self, symbol):
         start_timestamp = helper.datetime_to_timestamp(self.args.backtest.start_time)
         end_timestamp = helper.datetime_to_timestamp(self.args.backtest.end_time)
         return base.Base._get_funding_rate(self, symbol.lower(), start_timestamp, end_timestamp)
 
+    def _load_data(self, symbol):
+        """(history를 포함한 전체 데이터, 백테스트 구간 데이터)"""
+        df = self._load_history(symbol)
+        entire_df = self._get_data(symbol, self.args.backtest.start_time, self.args.backtest.end_time)
+        return pd.concat([df, entire_df]), entire_df
+
     def init(self, on_data):
         self.on_data = on_data
-        min_skip_count = sys.maxsize
 
+        timestamps = []
         for symbol in self.args.symbols:
-            df = self._load_history(symbol)
-            entire_df = self._get_data(symbol, self.args.backtest.start_time, self.args.backtest.end_time)
-            df = pd.concat([df, entire_df])
+            df, entire_df = self._load_data(symbol)
 
             if len(df) < self.data_length:
                 self.logging.warning(f"symbol {symbol} is skipped due to empty data")
@@ -81,13 +108,10 @@ class BacktestData(base.Base):
             actual_start_time = df.iloc[self.data_length - 1].name
             self.logging.info(f"({symbol}) data loaded from {actual_start_time}")
 
-            data_start_time = pd.to_datetime(self.args.backtest.start_time, utc=True)
-
-            skip_count = int(
-                (actual_start_time - data_start_time).total_seconds() / helper.interval_in_seconds(self.args.interval)
-            )
-            print(f"skip_count = {skip_count}")
-            min_skip_count = min(skip_count, min_skip_count)
+            # 윈도우의 마지막 봉 시각이 곧 이벤트 시각이다.
+            count = max(0, min(len(entire_df), len(df) - self.data_length))
+            bar_timestamps = _to_ns(df.index[self.data_length - 1: self.data_length - 1 + count])
+            timestamps.append(bar_timestamps)
 
             self.datas[symbol] = Data(
                 symbol=symbol,
@@ -96,11 +120,12 @@ class BacktestData(base.Base):
                 entire_df=entire_df,
                 entire_length=len(entire_df),
                 funding_rate_df=funding_rate_df,
-                skip_count=skip_count,
+                funding_rates=funding_rate_df["funding_rate"].to_numpy() if len(funding_rate_df) > 0 else None,
+                funding_schedule=clock.funding_schedule(bar_timestamps, _to_ns(funding_rate_df.index)),
+                columns=window.WindowFrame.build_columns(df) if self.args.backtest.use_window_view else None,
             )
 
-        for k, v in self.datas.items():
-            self.datas[k].skip_count -= min_skip_count
+        self.clock = clock.BarClock(timestamps)
 
     def set_variable(self, symbol, key, value):
         self.variables[symbol][key] = value
@@ -119,7 +144,46 @@ class BacktestData(base.Base):
 
         return self.datas[symbol].entire_df
 
+    def _get_indicator_source(self, symbol):
+        """(지표를 계산할 df, fingerprint, self.datas[symbol].df의 첫 봉이 df에서 갖는 위치)"""
+        df = self.datas[symbol].df
+        return df, indicator.fingerprint(df), 0
+
+    def get_indicator(self, symbol, name, **params):
+        """
+        history를 포함한 전체 봉에 대해 미리 계산된 지표 배열(읽기 전용). self.datas[symbol].df 와 같은 위치를 사용한다.\n
+        indicator.IndicatorCache에 저장되므로 Multi에서 파라미터 조합이 같은 지표는 한 번만 계산된다.
+        ex) self.data_handler.get_indicator(symbol, "sma", window=self.variables[symbol]["long_period_mapping"])
+        """
+        key = (symbol, name, indicator.make_params_key(params))
+        values = self.indicators.get(key)
+        if values is None:
+            data = self.datas[symbol]
+            if data.indicator_source is None:
+                data.indicator_source = self._get_indicator_source(symbol)
+            if self.indicator_cache is None:
+                self.indicator_cache = indicator.IndicatorCache()
+
+            df, data_fingerprint, offset = data.indicator_source
+            values = self.indicator_cache.get(symbol, self.args.interval, df, data_fingerprint, name, **params)
+            values = values[offset: offset + len(data.df)]
+            self.indicators[key] = values
+        return values
+
+    def get_indicator_value(self, symbol, name, **params):
+        """현재 봉(on_data로 전달된 윈도우의 마지막 봉) 시점의 지표 값"""
+        return self.get_indicator(symbol, name, **params)[self.data_length - 2 + self.datas[symbol].use_count]
+
     def run(self, on_start):
         on_start()
-        while next_data := self.__get_next():
-            self.on_data(next_data)
+        data_list = list(self.datas.values())
+        for _, symbol_indices, positions in self.clock:
+            next_datas = []
+            for symbol_index, position in zip(symbol_indices, positions):
+                data = data_list[symbol_index]
+                if listeners := self.bar_listeners.get(data.symbol):
+                    self.__notify_bar(data, position, listeners)
+                next_datas.append(
+                    (data.symbol, self.__get_bar(data, position), self.__get_funding_rate(data, position))
+                )
+            self.on_data(next_datas)
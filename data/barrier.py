@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class BarBarrier:
+    """
+    심볼별 봉 도착을 봉 시각 단위로 세고, 모든 심볼이 도착하거나 deadline이 지나면 그 봉을 한 번만 release한다.\n
+    도착 처리는 O(1)이며 봉 하나가 release되면 그보다 오래된 봉은 더 이상 release하지 않는다.
+    thread-safe 하지 않으므로 arrive, release_before, expire는 호출하는 쪽에서 같은 lock을 잡고 호출한다.
+    """
+
+    def __init__(self, symbols, interval_ms, on_release, deadline=None, on_timeout=None):
+        """
+        on_release(timestamp, stale_symbols, skew_ms): 봉 release 시 호출. stale_symbols는 도착하지 않은 심볼 set.\n
+        deadline: 봉 종료 후 기다리는 최대 시간(초). None이면 모든 심볼이 도착할 때까지 기다린다.\n
+        on_timeout(timestamp): deadline이 지나면 timer thread에서 호출된다. lock을 잡고 expire(timestamp)를 호출해야 한다.
+        """
+        self.symbols = set(symbols)
+        self.interval_ms = interval_ms
+        self.on_release = on_release
+        self.deadline = deadline
+        self.on_timeout = on_timeout
+
+        # 봉 시각 -> [도착한 심볼 set, 첫 도착 시각(monotonic), deadline timer]
+        self.pending = {}
+        self.released_ts = None
+        # release 이후에 도착한 봉 수
+        self.late_count = 0
+
+    def arrive(self, symbol, timestamp):
+        """봉 도착을 기록한다. 이미 release된 봉이면 False."""
+        if self.released_ts is not None and timestamp <= self.released_ts:
+            self.late_count += 1
+            return False
+
+        entry = self.pending.get(timestamp)
+        if entry is None:
+            entry = [set(), time.monotonic(), self.__start_timer(timestamp)]
+            self.pending[timestamp] = entry
+
+        entry[0].add(symbol)
+        if len(entry[0]) >= len(self.symbols):
+            self.__release(timestamp)
+        return True
+
+    def release_before(self, timestamp):
+        """
+        timestamp보다 오래된 봉을 정리한다. 다음 봉을 버퍼에 쓰기 전에 호출한다.\n
+        deadline을 사용하면 도착한 심볼만으로 release하고, 아니면 모든 심볼이 모이지 못한 봉이므로 release 없이 버린다.
+        """
+        older = [t for t in self.pending if t < timestamp]
+        if not older:
+            return
+
+        if self.deadline is not None:
+            self.__release(max(older))
+            return
+
+        for t in older:
+            self.__discard(t)
+
+    def __discard(self, timestamp):
+        timer = self.pending.pop(timestamp)[2]
+        if timer is not None:
+            timer.cancel()
+
+    def expire(self, timestamp):
+        if timestamp in self.pending:
+            self.__release(timestamp)
+
+    def __start_timer(self, timestamp):
+        if self.deadline is None or self.on_timeout is None:
+            return None
+
+        close_time = (timestamp + self.interval_ms) / 1000
+        timer = threading.Timer(max(0.0, close_time + self.deadline - time.time()), self.on_timeout, [timestamp])
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def __release(self, timestamp):
+        arrived, first_arrival, _ = self.pending[timestamp]
+
+        # release하는 봉과 그보다 오래된 봉은 모두 정리한다.
+        for t in [t for t in self.pending if t <= timestamp]:
+            self.__discard(t)
+
+        self.released_ts = timestamp
+        skew_ms = (time.monotonic() - first_arrival) * 1000
+        self.on_release(timestamp, self.symbols - arrived, skew_ms)
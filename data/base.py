@@ -3,7 +3,6 @@ import datetime
 import os
 from collections import defaultdict
 import requests
-import sqlite3
 
 import ccxt
 import pandas as pd
@@ -13,6 +12,11 @@ from common import helper
 from common import arg
 from common import log
 from common.config import Config as config
+from . import aggregator
+from . import downloader
+from . import planner
+from . import sqlmanager
+from . import store
 
 
 class ArquesDateTime:
@@ -84,18 +88,68 @@ class Base(ABC):
         self.variables = defaultdict(lambda: {})
         self.variables_cache = defaultdict(lambda: {})
 
+        # 로컬 OHLCV / 펀딩비 저장소
+        self.store = store.OhlcvStore()
+        self.funding_rate_store = store.FundingRateStore()
+
+        # 직전 on_data에서 이번 봉이 도착하지 않아 이전 봉까지의 데이터를 전달한 심볼들 (live bar deadline)
+        self.stale_symbols = set()
+
+        # 닫힌 봉마다 호출되는 listener: [symbol] = [listener, ...]
+        self.bar_listeners = defaultdict(list)
+        self.aggregator = aggregator.BarAggregator(args.interval)
+
         # logging
         self.logging = log.makeLogger(args.strategy)
 
+    def add_bar_listener(self, symbol, listener):
+        """
+        닫힌 봉마다 listener(symbol, timestamp(ms), open, high, low, close, volume)를 호출한다.\n
+        이미 불러온 history가 있으면 등록 시점에 history로 먼저 warm up 한다. (ex. jg_indicator.RsiStream(14).on_bar)
+        """
+        self.bar_listeners[symbol].append(listener)
+        history = self._get_listener_history(symbol)
+        if history is not None:
+            self._feed_bars(symbol, history, [listener])
+
+    def subscribe_timeframe(self, symbol, interval, listener=None, capacity=None):
+        """
+        기본 interval 봉으로 만든 상위 timeframe(ex. 15m, 1h, 1d) 봉을 구독한다. 봉 경계는 epoch 기준으로 고정된다.\n
+        반환되는 TimeframeSeries에서 닫힌 봉을 읽을 수 있고, listener가 있으면 봉이 닫힐 때마다 bar listener와 같은 형태로 호출된다.
+        """
+        series, is_new = self.aggregator.subscribe(symbol, interval, listener, capacity)
+        if is_new:
+            self.add_bar_listener(symbol, series.on_bar)
+        elif listener is not None:
+            # 이미 만들어진 봉들로 새 listener를 warm up 한다.
+            self._feed_bars(symbol, series.to_df(), [listener])
+        return series
+
+    def _get_listener_history(self, symbol):
+        """listener warm up에 사용할 이미 닫힌 봉들. 아직 데이터가 없으면 None."""
+        return None
+
+    def _feed_bars(self, symbol, df, listeners):
+        if len(df) == 0 or not listeners:
+            return
+
+        timestamps = pd.DatetimeIndex(df.index).as_unit("ms").asi8.tolist()
+        columns = [pd.to_numeric(df[c]).to_numpy(dtype="float64").tolist() for c in store.OhlcvStore.COLUMNS]
+        for timestamp, open, high, low, close, volume in zip(timestamps, *columns):
+            for listener in listeners:
+                listener(symbol, timestamp, open, high, low, close, volume)
+
     def _get_data(self, symbol, start, end):
-        data = self.__try_load_from_cache(symbol, start, end)
-        if data is None:
-            # 캐시된 데이터가 없을 경우 새로 받아와서 저장한다.
+        start_ts = self._to_timestamp(start)
+        end_ts = self._to_timestamp(end)
+        key = self.store.make_key(self.args.ex_name, self.args.ex_class, symbol, self.args.interval)
+        interval_ms = helper.interval_in_seconds(self.args.interval) * 1000
+        fetch_planner = planner.FetchPlanner(self.store, key, interval_ms)
+
+        # 이전에 받아오지 않은 구간만 새로 받아와서 저장한다.
+        for gap_start, gap_end in fetch_planner.plan(start_ts, end_ts):
             try:
-                data = self.__load_from_sqllite(symbol.lower(), start, end)
-                
-                if data is None or len(data) == 0:
-                    data = self.__load_from_api_server(symbol.lower(), start, end)
+                self.__fetch_ohlcv(symbol.lower(), key, fetch_planner, gap_start, gap_end)
             except Exception:
                 import traceback
 
@@ -103,16 +157,61 @@ class Base(ABC):
                 print(err_msg)
                 pass
 
-        data["datetime"] = pd.to_datetime(data["datetime"])
-        data.drop_duplicates("datetime", inplace=True)
-        data.set_index(keys="datetime", inplace=True)
+        data = self.store.read_df(key, start_ts, end_ts)
 
-        if self.args.fill_missing_data:
+        if self.args.fill_missing_data and len(data) > 0:
             data = self.__fill_missing_data(data)
 
         return data
 
+    def __fetch_ohlcv(self, symbol, key, fetch_planner, start, end):
+        interval_ms = fetch_planner.interval_ms
+
+        missing = [(start, end)]
+        columns = self.__load_from_sqllite(symbol, start, end)
+        if columns is not None:
+            self.store.write(key, columns)
+            # sqlite에 실제로 연속해서 있는 캔들 구간만 받은 것으로 기록한다.
+            # 그 앞, 중간에 빠진 구간, 뒤는 거래소에서 받는다.
+            runs = planner.contiguous_runs(columns["timestamp"], interval_ms, end)
+            for run_start, run_end in runs:
+                fetch_planner.record(run_start, run_end)
+            missing = planner.subtract_intervals(start, end, runs)
+
+        for gap_start, gap_end in missing:
+            data = self.__load_from_api_server(symbol, gap_start, gap_end)
+            self.store.write_df(key, data)
+
+            # 아직 닫히지 않은 캔들 구간은 다음에 다시 받는다.
+            closed_end = int(helper.now_ts()) // interval_ms * interval_ms
+            fetch_planner.record(gap_start, min(gap_end, max(gap_start, closed_end)))
+
+    @staticmethod
+    def _to_timestamp(value):
+        if isinstance(value, datetime.datetime):
+            return helper.datetime_to_timestamp(value)
+        if isinstance(value, str):
+            return helper.datetime_to_timestamp(
+                ArquesDateTime.convert_datetime_from_string(value, format="%Y-%m-%dT%H:%M:%S.%fZ")
+            )
+        return int(value)
+
     def _get_funding_rate(self, symbol, start, end):
+        key = self.funding_rate_store.make_key(self.args.ex_name, self.args.ex_class, symbol)
+        fetch_planner = planner.FetchPlanner(self.funding_rate_store, key)
+
+        # 이전에 받아오지 않은 구간만 새로 받아와서 저장한다.
+        for gap_start, gap_end in fetch_planner.plan(start, end):
+            funding_rates = self.__load_funding_rate_from_api_server(symbol, gap_start, gap_end)
+            self.funding_rate_store.write(key, funding_rates)
+            fetch_planner.record(gap_start, min(gap_end, int(helper.now_ts())))
+
+        results = self.funding_rate_store.read_df(key, start, end)
+        results["symbol"] = symbol
+        self.logging.info(f"({symbol}) funding rate history loaded from {start} to {end}")
+        return results
+
+    def __load_funding_rate_from_api_server(self, symbol, start, end):
         # CCXT client initialization
         if not hasattr(self, 'ccxt_client'):
             self.ccxt_client = ccxt.binance(
@@ -127,38 +226,30 @@ class Base(ABC):
         if ccxt_symbol not in markets:
             raise ValueError(f"Unsupported symbol: {ccxt_symbol}")
 
-
         # Fetch funding rates
         start_time = start
         end_time = end
         ms = 1000
         one_minutes: int = 60 * ms
         limit = 300
-        results = pd.DataFrame(columns=["symbol", "funding_rate", "datetime"])
+        timestamps = []
+        funding_rates = []
         while start_time < end_time:
             funding_rate_history = self.ccxt_client.fetch_funding_rate_history(
                 ccxt_symbol,
                 since=start_time,
                 limit=limit,
-                params={"endTime": end_time}
+                params={"endTime": end_time - 1}
             )
             if not funding_rate_history:
                 break
-            data = {
-                "symbol": [rate["symbol"] for rate in funding_rate_history],
-                "funding_rate": [rate["fundingRate"] for rate in funding_rate_history],
-                "datetime": [pd.to_datetime(rate["timestamp"], unit="ms", utc=True) for rate in funding_rate_history],
-            }
-            df = pd.DataFrame(data)
-            if results.empty:
-                results = df
-            else:
-                results = pd.concat([results, df], ignore_index=True)
+            for rate in funding_rate_history:
+                if start <= rate["timestamp"] < end:
+                    timestamps.append(rate["timestamp"])
+                    funding_rates.append(rate["fundingRate"])
             start_time = funding_rate_history[-1]["timestamp"] + one_minutes  # Increment start time to avoid duplicates
 
-        results.set_index("datetime", inplace=True)
-        self.logging.info(f"({symbol}) funding rate history loaded from {start} to {end}")
-        return results
+        return {"timestamp": timestamps, "funding_rate": funding_rates}
 
     def __get_json(self, file_name):
         filePath = f"{os.path.dirname(os.path.realpath(__file__))}/../{file_name}.json"
@@ -166,24 +257,6 @@ class Base(ABC):
             json_data = json.load(json_file)
             return json_data
 
-    def __get_cache_dir(self, symbol, start, end):
-        cache_path = helper.create_directory("/data_cache")
-        start_str = start.strftime("%Y-%m-%d-%H-%M-%S")
-        end_str = end.strftime("%Y-%m-%d-%H-%M-%S")
-        filename = (
-            f"{self.args.ex_name}_{self.args.ex_class}_{symbol}_" f"{self.args.interval}_{start_str}_{end_str}.csv"
-        )
-        full_path = os.path.join(cache_path, filename)
-        return full_path
-
-    def __try_load_from_cache(self, symbol, start, end):
-        file_path = self.__get_cache_dir(symbol, start, end)
-        try:
-            return pd.read_csv(file_path)
-        except IOError:
-            self.logging.info(f"{symbol} No cache found. Trying to download from GCP.")
-            return None
-
     def __get_symbol(self, symbol):
         if symbol.lower() == "btcusdt":
             return "BTC/USDT"
@@ -196,32 +269,19 @@ class Base(ABC):
         return symbol
 
     def __load_from_sqllite(self, symbol, start, end):
-        db_name = None
-        if symbol == "btcusdt":
-            db_name = "argos_btc.db"
-        elif symbol == "ethusdt":
-            db_name = "argos_eth.db"
-        if db_name is None:
-            return None
-        table_name = "argos_data"
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        if cursor is None:
+        # 로컬 sqlite DB(python -m data.sqlmanager 로 생성)가 있으면 해당 구간을 먼저 읽는다.
+        db_name = sqlmanager.get_default_path()
+        if not os.path.exists(db_name):
             return None
 
-        start_date = pd.to_datetime(start).strftime('%Y-%m-%d')
-        end_date = pd.to_datetime(end).strftime('%Y-%m-%d')
-
-        query = f"SELECT * FROM {table_name} WHERE datetime BETWEEN ? AND ? ORDER BY timestamp ASC"
-        df = pd.read_sql_query(query, conn, params=(start_date, end_date))
-        df.to_csv(self.__get_cache_dir(symbol, start, end), index=False)
-        conn.close()
-        return df
+        columns = sqlmanager.get_manager(db_name).read(symbol, self.args.interval, start, end)
+        if len(columns["timestamp"]) == 0:
+            return None
+        return columns
 
     def __load_from_api_server(self, symbol, start, end):
         ccxt_symbol = self.__get_symbol(symbol)
         ms = 1000
-        one_minutes: int = 60 * ms
         limit = 1000
 
         # CCXT 클라이언트 초기화
@@ -237,20 +297,9 @@ class Base(ABC):
         if ccxt_symbol not in markets:
             raise ValueError(f"Unsupported symbol: {ccxt_symbol}")
 
-        # 시간 변환 (UTC 기준 및 초 단위)
-        if isinstance(start, datetime.datetime):
-            start_timestamp = int(start.timestamp() * ms)  # 밀리초 단위로 변환
-        else:
-            start_timestamp = int(
-                ArquesDateTime.convert_datetime_from_string(start, format="%Y-%m-%dT%H:%M:%S.%fZ").timestamp() * ms
-            )
-
-        if isinstance(end, datetime.datetime):
-            end_timestamp = int(end.timestamp() * ms)
-        else:
-            end_timestamp = int(
-                ArquesDateTime.convert_datetime_from_string(end, format="%Y-%m-%dT%H:%M:%S.%fZ").timestamp() * ms
-            )
+        # [start, end) 구간을 ms 단위로 받는다.
+        start_timestamp = self._to_timestamp(start)
+        end_timestamp = self._to_timestamp(end)
 
         # Interval 유효성 확인
         interval_map = { "1m": "1m", "3m": "3m", "5m": "5m", "15m": "15m", "1h": "1h", "1d": "1d", "1w": "1w", "1M": "1M" }
@@ -259,46 +308,24 @@ class Base(ABC):
         ccxt_interval = interval_map[self.args.interval]
 
         # 시간 범위 유효성 검사
-        now_timestamp = int(datetime.datetime.utcnow().timestamp() * ms)
+        now_timestamp = int(helper.now_ts())
         if start_timestamp < 0 or start_timestamp > now_timestamp:
             raise ValueError(f"Invalid start time: {start_timestamp}")
 
-        # 데이터프레임 초기화
-        data = pd.DataFrame(
-			columns=["timestamp", "datetime", "open", "high", "low", "close", "volume"], 
-			dtype="object"
-		)
-        # OHLCV 데이터 로드
-        while start_timestamp <= end_timestamp:
-            try:
-                ohlcv = (self.ccxt_client.fetch_ohlcv
-                         (ccxt_symbol,
-                          timeframe=ccxt_interval,
-                          since=start_timestamp,
-                          limit=limit))
-            except ccxt.NetworkError as err:
-                raise RuntimeError(f"Network error: {str(err)}")
-            except ccxt.ExchangeError as err:
-                raise RuntimeError(f"Exchange error: {str(err)}")
-            if not ohlcv:
-                break
-
-            chunk = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
-            chunk["datetime"] = pd.to_datetime(chunk["timestamp"], unit="ms", utc=True)
-            chunk = chunk[["timestamp", "datetime", "open", "high", "low", "close", "volume"]]
+        # 요청 구간 밖이거나 아직 닫히지 않은 캔들은 받지 않는다.
+        interval_ms = helper.interval_in_seconds(self.args.interval) * ms
+        end_timestamp = min(end_timestamp, (now_timestamp // interval_ms) * interval_ms)
 
-            if data.empty:
-                data = chunk
-            else:
-                data = pd.concat([data, chunk], ignore_index=True, copy=False)
-            start_timestamp = ohlcv[-1][0] + one_minutes
-
-            readable_start_time = datetime.datetime.fromtimestamp(start_timestamp / 1000).strftime("%Y-%m-%d %H:%M:%S")
-            readable_end_time = datetime.datetime.fromtimestamp(end_timestamp / 1000).strftime("%Y-%m-%d %H:%M:%S")
-            print(f"({symbol}) {ccxt_symbol} OHLCV data loaded from {readable_start_time} to {readable_end_time}")
-
-        data.to_csv(self.__get_cache_dir(symbol, start, end), header=True, index=False)
-        return data
+        # OHLCV 데이터 로드. 구간을 나눠 rate limit 내에서 동시에 받는다.
+        ohlcv_downloader = downloader.OhlcvDownloader(
+            self.ccxt_client, ccxt_symbol, ccxt_interval, interval_ms, limit, self.logging
+        )
+        try:
+            return ohlcv_downloader.download(start_timestamp, end_timestamp)
+        except ccxt.NetworkError as err:
+            raise RuntimeError(f"Network error: {str(err)}")
+        except ccxt.ExchangeError as err:
+            raise RuntimeError(f"Exchange error: {str(err)}")
 
     def __fill_missing_data(self, df):
         interval = self.args.interval
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class BarClock:
+    """
+    여러 심볼의 봉 시각(int64)을 하나의 시간축으로 합친 이벤트 시계.\n
+    심볼별 시각 배열을 이어붙여 stable 정렬하므로 같은 시각에서는 심볼 순서가 유지된다.
+    각 step의 (심볼 번호, 심볼 내 위치)는 CSR 형태(offsets)로 들고 있어서,
+    step 하나를 진행하는 비용은 그 시각에 봉이 있는 심볼 수에만 비례한다.
+    상장일이나 interval이 다른 심볼도 실제 시각 기준으로 정렬된다.
+    """
+
+    def __init__(self, timestamps):
+        """timestamps: 심볼별로 오름차순 정렬된 int64 시각 배열의 list"""
+        counts = [len(t) for t in timestamps]
+        total = sum(counts)
+
+        if total == 0:
+            self.axis = np.empty(0, dtype="int64")
+            self.offsets = np.zeros(1, dtype="int64")
+            self.symbol_indices = []
+            self.positions = []
+            return
+
+        merged = np.concatenate([np.asarray(t, dtype="int64") for t in timestamps])
+        symbol_indices = np.repeat(np.arange(len(timestamps)), counts)
+        positions = np.concatenate([np.arange(c) for c in counts])
+
+        order = np.argsort(merged, kind="stable")
+        merged = merged[order]
+
+        boundaries = np.flatnonzero(merged[1:] != merged[:-1]) + 1
+        self.offsets = np.concatenate(([0], boundaries, [total])).astype("int64")
+        self.axis = merged[self.offsets[:-1]]
+
+        # step마다 numpy 원소 접근을 하지 않도록 python list로 한 번만 변환한다.
+        self.symbol_indices = symbol_indices[order].tolist()
+        self.positions = positions[order].tolist()
+
+    def __len__(self):
+        return len(self.axis)
+
+    def __iter__(self):
+        """(시각, 해당 시각에 봉이 있는 심볼 번호 list, 심볼별 위치 list)"""
+        offsets = self.offsets.tolist()
+        axis = self.axis.tolist()
+        for step, timestamp in enumerate(axis):
+            begin, end = offsets[step], offsets[step + 1]
+            yield timestamp, self.symbol_indices[begin:end], self.positions[begin:end]
+
+
+def funding_schedule(bar_timestamps, funding_timestamps):
+    """
+    펀딩 이벤트를 봉 위치에 미리 배정한다. 반환값은 봉 위치별 펀딩 이벤트 번호 list(-1은 이벤트 없음).\n
+    이벤트는 시각이 같거나 지난 첫 봉에 배정하되 봉 하나에 하나씩만 반영하므로,
+    앞 이벤트가 밀리면 뒤 이벤트도 다음 봉으로 밀린다(assigned[i] = max(first[i], assigned[i - 1] + 1)).
+    같은 시각의 이벤트가 여러 개면 첫 번째만 사용하고, 봉 범위를 넘어서는 이벤트는 반영되지 않는다.
+    """
+    bar_timestamps = np.asarray(bar_timestamps, dtype="int64")
+    funding_timestamps = np.asarray(funding_timestamps, dtype="int64")
+    schedule = np.full(len(bar_timestamps), -1, dtype="int64")
+    if len(funding_timestamps) == 0 or len(bar_timestamps) == 0:
+        return schedule.tolist()
+
+    events = np.flatnonzero(np.r_[True, funding_timestamps[1:] != funding_timestamps[:-1]])
+    first = np.searchsorted(bar_timestamps, funding_timestamps[events], side="left")
+    order = np.arange(len(first))
+    assigned = np.maximum.accumulate(first - order) + order
+
+    valid = assigned < len(bar_timestamps)
+    schedule[assigned[valid]] = events[valid]
+    return schedule.tolist()
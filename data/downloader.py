@@ -0,0 +1,110 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+class RateLimiter:
+    """여러 스레드에서 호출해도 요청 간 간격이 rate_limit_ms 이상이 되도록 대기시킨다."""
+
+    def __init__(self, rate_limit_ms):
+        self.interval = rate_limit_ms / 1000.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+class OhlcvDownloader:
+    """
+    [start, end) 구간을 fetch_ohlcv 한 페이지 크기의 독립적인 shard로 나눠 동시에 받아온다.\n
+    exchange는 ccxt 거래소 객체(또는 rateLimit, fetch_ohlcv를 가진 동일한 인터페이스의 객체)이다.
+    요청 간격은 exchange.rateLimit(ms)을 지키고, 동시 요청 수는 응답 지연을 rateLimit으로 채울 수 있을 만큼만 사용한다.
+    받은 캔들은 미리 할당한 배열의 해당 위치에 바로 기록하고 마지막에 한 번만 DataFrame으로 만든다.
+    """
+
+    COLUMNS = ["open", "high", "low", "close", "volume"]
+
+    # 동시 요청 수 계산에 사용하는 예상 응답 지연(ms)과 최대 스레드 수
+    EXPECTED_LATENCY_MS = 1000
+    MAX_WORKERS = 8
+
+    def __init__(self, exchange, symbol, timeframe, interval_ms, limit=1000, logging=None):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.interval_ms = interval_ms
+        self.limit = limit
+        self.logging = logging
+        self.rate_limiter = RateLimiter(getattr(exchange, "rateLimit", 0) or 0)
+
+    def get_shards(self, start, end):
+        shard_size = self.limit * self.interval_ms
+        return [(s, min(s + shard_size, end)) for s in range(start, end, shard_size)]
+
+    def get_worker_count(self, shard_count):
+        rate_limit_ms = getattr(self.exchange, "rateLimit", 0) or 0
+        if rate_limit_ms <= 0:
+            workers = self.MAX_WORKERS
+        else:
+            workers = math.ceil(self.EXPECTED_LATENCY_MS / rate_limit_ms) + 1
+        return max(1, min(shard_count, self.MAX_WORKERS, workers))
+
+    def __fetch_shard(self, start, end, timestamps, values, filled, base):
+        since = start
+        while since < end:
+            self.rate_limiter.wait()
+            limit = min(self.limit, math.ceil((end - since) / self.interval_ms))
+            ohlcv = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, since=since, limit=limit)
+            if not ohlcv:
+                break
+
+            rows = np.asarray(ohlcv, dtype="float64")
+            ts = rows[:, 0].astype("int64")
+            in_range = (ts >= start) & (ts < end)
+            positions = (ts[in_range] - base) // self.interval_ms
+            timestamps[positions] = ts[in_range]
+            values[positions] = rows[in_range, 1:6]
+            filled[positions] = True
+
+            last_ts = int(ts[-1])
+            if last_ts < since:
+                break
+            since = last_ts + self.interval_ms
+
+    def download(self, start, end):
+        shards = self.get_shards(start, end)
+        count = max(0, math.ceil((end - start) / self.interval_ms))
+        timestamps = np.zeros(count, dtype="int64")
+        values = np.full((count, len(self.COLUMNS)), np.nan, dtype="float64")
+        filled = np.zeros(count, dtype=bool)
+
+        begin_ts = time.time()
+        if shards:
+            with ThreadPoolExecutor(max_workers=self.get_worker_count(len(shards))) as executor:
+                futures = [
+                    executor.submit(self.__fetch_shard, s, e, timestamps, values, filled, start) for s, e in shards
+                ]
+                for future in futures:
+                    # shard에서 발생한 예외는 여기서 다시 발생한다.
+                    future.result()
+
+        data = pd.DataFrame(values[filled], columns=self.COLUMNS)
+        data.insert(0, "timestamp", timestamps[filled])
+        data.insert(1, "datetime", pd.to_datetime(data["timestamp"], unit="ms", utc=True))
+
+        if self.logging:
+            self.logging.info(
+                f"({self.symbol}) {len(data)} candles downloaded in {len(shards)} shards, "
+                f"took {time.time() - begin_ts:.2f} seconds."
+            )
+        return data
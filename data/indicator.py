@@ -0,0 +1,163 @@
+import hashlib
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from common import helper
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def fingerprint(df):
+    """봉 시각과 OHLCV 값으로 만든 데이터 식별자. 같은 데이터면 프로세스가 달라도 같은 값이 나온다."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(pd.DatetimeIndex(df.index).as_unit("ms").asi8).tobytes())
+    for column in OHLCV_COLUMNS:
+        digest.update(np.ascontiguousarray(df[column].to_numpy(dtype="float64")).tobytes())
+    return digest.hexdigest()
+
+
+class Batch:
+    """
+    한 심볼 데이터에 대해 여러 지표를 한 번에 계산할 때 사용하는 입력.\n
+    shared(key, compute)로 만든 중간값(가격 차분, rolling 최고/최저가 등)은 같은 batch 안의 다른 파라미터 조합과 공유된다.
+    """
+
+    def __init__(self, df):
+        self.columns = {c: df[c].to_numpy(dtype="float64") for c in OHLCV_COLUMNS}
+        self.values = {}
+
+    def series(self, column):
+        return self.shared(("series", column), lambda: pd.Series(self.columns[column]))
+
+    def shared(self, key, compute):
+        if key not in self.values:
+            self.values[key] = compute()
+        return self.values[key]
+
+
+def _sma(batch, window, column="close"):
+    return batch.series(column).rolling(window).mean()
+
+
+def _ema(batch, span, column="close"):
+    return batch.series(column).ewm(span=span, adjust=False, min_periods=span).mean()
+
+
+def _highest(batch, window, column="high"):
+    return batch.shared(("highest", column, window), lambda: batch.series(column).rolling(window).max())
+
+
+def _lowest(batch, window, column="low"):
+    return batch.shared(("lowest", column, window), lambda: batch.series(column).rolling(window).min())
+
+
+def _rsi(batch, period):
+    """jg_indicator.get_rsi와 같은 식을 기본 봉에 적용한다."""
+    diff = batch.shared("diff", lambda: batch.series("close").diff(1))
+    up = batch.shared("up", lambda: pd.Series(np.where(diff > 0, diff, 0.0)))
+    dw = batch.shared("dw", lambda: pd.Series(np.where(diff < 0, diff * (-1), 0.0)))
+    avg_gain = up.ewm(span=period, adjust=False, min_periods=period).mean()
+    avg_loss = dw.ewm(span=period, adjust=False, min_periods=period).mean()
+    return 1.0 - 1.0 / (1 + avg_gain / avg_loss)
+
+
+def _stochastic(batch, period1, period2):
+    """jg_indicator.get_stochastic과 같은 식을 기본 봉에 적용한다. period1이 같은 조합은 rolling 최고/최저가를 공유한다."""
+    fast_k = batch.shared(
+        ("fast_k", period1),
+        lambda: (batch.series("close") - _lowest(batch, period1)) / (_highest(batch, period1) - _lowest(batch, period1)),
+    )
+    fast_d = batch.shared(("fast_d", period1, period2), lambda: fast_k.rolling(period2).mean())
+    return fast_d.rolling(period2).mean()
+
+
+# 지표 이름 -> 계산 함수(batch, **params). 결과는 입력 봉과 같은 길이여야 한다.
+INDICATORS = {
+    "sma": _sma,
+    "ema": _ema,
+    "highest": _highest,
+    "lowest": _lowest,
+    "rsi": _rsi,
+    "stochastic": _stochastic,
+}
+
+
+def register(name, compute):
+    """전략 전용 지표를 추가한다. compute(batch, **params)는 봉 길이의 배열(또는 Series)을 반환한다."""
+    INDICATORS[name] = compute
+
+
+def make_params_key(params):
+    return "_".join(f"{k}={params[k]}" for k in sorted(params))
+
+
+class IndicatorCache:
+    """
+    (심볼, interval, 데이터 fingerprint, 지표, 파라미터) 단위의 지표 계산 결과 캐시.\n
+    결과는 <root>/<심볼>_<interval>_<fingerprint>/<지표>_<파라미터>.npy 에 저장하고 memmap으로 읽으므로,
+    Multi 워커들은 같은 파일을 OS 페이지 캐시로 공유하며 파라미터 조합이 같은 지표는 한 번만 계산된다.
+    파일은 임시 파일을 쓴 뒤 교체하므로 여러 워커가 동시에 써도 읽는 쪽은 항상 완성된 파일만 본다.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or helper.create_directory("/data_cache/indicator")
+        self.arrays = {}
+
+    def __get_path(self, symbol, interval, data_fingerprint, name, params):
+        folder = os.path.join(self.root, f"{symbol.lower()}_{interval}_{data_fingerprint}")
+        return folder, os.path.join(folder, f"{name}_{make_params_key(params)}.npy")
+
+    def __load(self, key, path):
+        try:
+            array = np.load(path, mmap_mode="r")
+        except (IOError, ValueError):
+            return None
+        self.arrays[key] = array
+        return array
+
+    def __save(self, folder, path, values):
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}.npy"
+        np.save(tmp_path, values)
+        os.replace(tmp_path, path)
+
+    def get_many(self, symbol, interval, df, data_fingerprint, name, params_list):
+        """
+        params_list의 조합별 지표 배열(df와 같은 길이, 읽기 전용) list.\n
+        캐시에 없는 조합만 하나의 Batch로 묶어 계산한다.
+        """
+        compute = INDICATORS[name]
+        results = [None] * len(params_list)
+        missing = []
+        for i, params in enumerate(params_list):
+            key = (symbol.lower(), interval, data_fingerprint, name, make_params_key(params))
+            array = self.arrays.get(key)
+            if array is None:
+                folder, path = self.__get_path(symbol, interval, data_fingerprint, name, params)
+                array = self.__load(key, path)
+            if array is None:
+                missing.append((i, key, params))
+            results[i] = array
+
+        if missing:
+            batch = Batch(df)
+            for i, key, params in missing:
+                values = np.asarray(compute(batch, **params), dtype="float64")
+                if len(values) != len(df):
+                    raise ValueError(f"indicator {name} returned {len(values)} values for {len(df)} bars")
+
+                folder, path = self.__get_path(symbol, interval, data_fingerprint, name, params)
+                self.__save(folder, path, values)
+                results[i] = self.__load(key, path)
+        return results
+
+    def get(self, symbol, interval, df, data_fingerprint, name, **params):
+        return self.get_many(symbol, interval, df, data_fingerprint, name, [params])[0]
+
+    def clear(self):
+        self.arrays = {}
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
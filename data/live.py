@@ -1,4 +1,5 @@
 from collections import defaultdict
+from concurrent import futures
 import threading
 import datetime
 import time
@@ -6,32 +7,54 @@ import json
 
 import pandas as pd
 import redis
+import requests
 
 from library.binance import client
 from library.binance import websockets
 from library.binance import helpers
+from data import aggregator
+from data import barrier
 from data import base
+from data import window
 from common.config import Config as config
 from common import helper
 
+# 프로세스 안에서 REST client 하나를 공유한다.
+_rest_client = None
+_rest_client_lock = threading.Lock()
+
+
+def get_rest_client(pool_size=10):
+    """
+    프로세스에서 공유하는 거래소 REST client.\n
+    처음 호출할 때만 만들므로 ping, 서버 시간 offset 계산은 한 번만 하고, 이후 요청은 keep-alive 연결을 재사용한다.
+    pool_size는 동시에 유지할 연결 수이다.
+    """
+    global _rest_client
+    with _rest_client_lock:
+        if _rest_client is None:
+            # TODO sungmkim - get from api_key.json
+            rest_client = client.Client("api_key", "api_secret")
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            rest_client.session.mount("https://", adapter)
+            _rest_client = rest_client
+        return _rest_client
+
 
 class CandlestickWebsocketData(threading.Thread):
-    def __init__(self, exchange_class, strategy, symbol, interval, callback, load_history):
+    def __init__(self, exchange_class, strategy, symbol, interval, callback, rest_client):
         threading.Thread.__init__(self)
         self.exchange_class = exchange_class
         self.strategy = strategy
         self.symbol = symbol
         self.interval = interval
         self.callback = callback
-        self.load_history = load_history
-        self.history_end_ts = None
+        self.client = rest_client
         self._keepalive_timer = None
         self._last_data = None
         self._keepalive_interval = 60  # interval 1-min
 
     def run(self):
-        # TODO sungmkim - get from api_key.json
-        self.client = client.Client("api_key", "api_secret")
         self.__start_socket()
 
     def _start_keepalive_timer(self):
@@ -80,21 +103,95 @@ class CandlestickWebsocketData(threading.Thread):
             self.__restart_socket()
             return
 
-        # 최초로 도착하는 메시지의 시작 시간이 불러올 이전 기록의 종료 시간이 된다.
-        if self.history_end_ts is None:
-            self.history_end_ts = data["k"]["t"] - 1
-            self.load_history(self.symbol, self.history_end_ts)
-
         # x 가 True인 경우에는 지정된 기간의 캔들스틱이 닫혔다는 뜻이므로 콜백을 호출한다.
         if data["k"]["x"] is True:
             self.callback(self.symbol, data["k"])
 
 
+class MultiplexCandlestickWebsocketData(threading.Thread):
+    """
+    여러 심볼의 kline stream을 하나의 combined stream 연결로 받는다.\n
+    메시지는 reactor thread 하나에서 심볼별로 callback에 전달되며, keepalive timer와 재연결도 연결 하나에 대해서만 동작한다.
+    """
+
+    # combined stream 연결 하나에 구독할 수 있는 최대 stream 수
+    MAX_STREAMS = 200
+
+    def __init__(self, exchange_class, strategy, symbols, interval, callback, rest_client):
+        threading.Thread.__init__(self)
+        self.exchange_class = exchange_class
+        self.strategy = strategy
+        # 메시지의 심볼(대문자) -> 전략 심볼
+        self.symbols = {s.upper(): s for s in symbols}
+        self.interval = interval
+        self.callback = callback
+        self.client = rest_client
+        self._keepalive_timer = None
+        self._last_data = None
+        self._keepalive_interval = 60  # interval 1-min
+
+    def run(self):
+        self.__start_socket()
+
+    def _start_keepalive_timer(self):
+        self._keepalive_timer = helpers.RepeatTimer(self._keepalive_interval, self._keepalive_socket)
+        self._keepalive_timer.setDaemon(True)
+        self._keepalive_timer.start()
+
+    def _keepalive_socket(self):
+        interval = self._keepalive_interval * 1e3  # in milliseconds
+        now = round(time.time() * 1e3)
+        if self._last_data and (now - self._last_data["E"] > interval):
+            print("Restart MultiplexCandlestickWebsocketData")
+            self.__restart_socket()
+
+    def __start_socket(self):
+        self.socket = websockets.BinanceSocketManager(self.client)
+
+        streams = [f"{s.lower()}@kline_{self.interval}" for s in self.symbols]
+        if self.exchange_class == "futures":
+            self.connection_key = self.socket.start_futures_multiplex_socket(streams, self.__on_msg)
+        else:
+            self.connection_key = self.socket.start_multiplex_socket(streams, self.__on_msg)
+
+        self.socket.start()
+        self._start_keepalive_timer()
+
+    def __restart_socket(self):
+        self._keepalive_timer.cancel()
+        self.socket.stop_socket(self.connection_key)
+        self.__start_socket()
+
+    def __on_msg(self, msg):
+        data = msg.get("data")
+        self._last_data = data
+
+        if data is None:
+            data = msg
+
+        if data["e"] == "error":
+            msg = f"[{self.strategy}][{','.join(self.symbols.values())}] socket error: {data}"
+            print(msg)
+            helper.send_slack(msg)
+            self.__restart_socket()
+            return
+
+        symbol = self.symbols.get(data["s"])
+        if symbol is None:
+            return
+
+        # x 가 True인 경우에는 지정된 기간의 캔들스틱이 닫혔다는 뜻이므로 콜백을 호출한다.
+        if data["k"]["x"] is True:
+            self.callback(symbol, data["k"])
+
+
 class LiveData(base.Base):
     def __init__(self, args):
         base.Base.__init__(self, args)
         self.ws = defaultdict(lambda: None)
-        self.datas = defaultdict(lambda: None)
+        # 심볼별 최근 data_length개 봉의 aggregator.RingBuffer
+        self.datas = dict()
+        self.lock = threading.RLock()
         self.columns = [
             "datetime",
             "timestamp",
@@ -104,7 +201,19 @@ class LiveData(base.Base):
             "close",
             "volume",
         ]
+        self.bar_dtypes = {"timestamp": "int64"}
+        self.bar_dtypes.update({c: "float64" for c in self.columns[2:]})
         self.last_update_ts = 0
+        self.rest_client = None
+        # 직전 봉에서 모든 심볼이 도착하기까지 걸린 시간(ms). deadline으로 release된 경우 deadline까지의 시간이다.
+        self.last_bar_skew_ms = None
+        self.barrier = barrier.BarBarrier(
+            args.symbols,
+            helper.interval_in_seconds(args.interval) * 1000,
+            self.__on_bar_release,
+            deadline=args.bar_deadline_seconds,
+            on_timeout=self.__on_bar_timeout,
+        )
 
     def init(self, on_data):
         redis_conf = config.redis()
@@ -113,6 +222,34 @@ class LiveData(base.Base):
         self.__load_redis_variables_cache()
 
         self.on_data = on_data
+        self.rest_client = get_rest_client(max(10, len(self.args.symbols)))
+
+        # websocket을 열기 전에 모든 심볼의 history를 동시에 불러온다.
+        history_end_ts = self.__get_closed_end_ts()
+        with futures.ThreadPoolExecutor(max_workers=max(1, len(self.args.symbols))) as executor:
+            list(executor.map(lambda s: self.__load_history(s, history_end_ts), self.args.symbols))
+
+        for symbol in self.args.symbols:
+            # history를 불러오는 동안 닫힌 봉은 websocket 연결 전에 채운다.
+            self.__catch_up(symbol)
+
+        if self.args.use_multiplex_socket:
+            # 심볼들을 combined stream 연결 몇 개로 나눠 구독한다. self.ws[symbol]은 해당 심볼을 받는 연결이다.
+            size = MultiplexCandlestickWebsocketData.MAX_STREAMS
+            for i in range(0, len(self.args.symbols), size):
+                symbols = self.args.symbols[i: i + size]
+                ws = MultiplexCandlestickWebsocketData(
+                    self.args.ex_class,
+                    self.args.strategy,
+                    symbols,
+                    self.args.interval,
+                    self.__candlestick_callback,
+                    self.rest_client,
+                )
+                for symbol in symbols:
+                    self.ws[symbol] = ws
+                ws.start()
+            return
 
         for symbol in self.args.symbols:
             self.ws[symbol] = CandlestickWebsocketData(
@@ -121,7 +258,7 @@ class LiveData(base.Base):
                 symbol,
                 self.args.interval,
                 self.__candlestick_callback,
-                self.__load_history,
+                self.rest_client,
             )
 
             self.ws[symbol].start()
@@ -194,61 +331,69 @@ class LiveData(base.Base):
             float(data["c"]),
             float(data["v"]),
         ]
-        series = self.__build_series_from_ohlcv(ohlcv)
 
-        expected = self.datas[symbol].iloc[-1].name + datetime.timedelta(
-            seconds=helper.interval_in_seconds(self.args.interval)
-        )
-        while expected < series.name:
-            msg = f"[{self.args.strategy}][{symbol}] data missing. expected={expected}, received={series.name}"
-            self.logging.info(msg)
-            helper.send_slack(msg)
-            if isinstance(expected, pd.Timestamp):
-                int_expected = int(expected.timestamp() * 1000)
-            if isinstance(series.name, datetime.datetime):
-                int_series_name = int(series.name.timestamp() * 1000)
-
-            missing_df = self.__get_history_from_exchange(symbol, int_expected, int_series_name, 10)
-            df = missing_df.loc[expected, :]
-            if not df.empty:
-                self.logging.info(f"[{symbol}] new data={df.name}")
-                # self.datas[symbol] = self.datas[symbol].append(df)
-                self.datas[symbol] = pd.concat([self.datas[symbol], df.to_frame().T])
-
-                expected = self.datas[symbol].iloc[-1].name + datetime.timedelta(
-                    seconds=helper.interval_in_seconds(self.args.interval)
+        # 심볼마다 websocket thread가 다르므로 ring buffer 갱신과 on_data 호출은 한 번에 하나만 실행한다.
+        with self.lock:
+            bars = self.datas[symbol]
+            interval_ms = helper.interval_in_seconds(self.args.interval) * 1000
+            expected = bars.last("timestamp") + interval_ms
+            while expected < ohlcv[0]:
+                msg = (
+                    f"[{self.args.strategy}][{symbol}] data missing. "
+                    f"expected={self.__to_datetime(expected)}, received={self.__to_datetime(ohlcv[0])}"
                 )
-            else:
-                fail_msg = f"[{symbol}] failed to retrieve data"
-                self.logging.info(fail_msg)
-                helper.send_slack(fail_msg)
-                break
-
-        if expected > series.name:
-            warn_msg = f"[{symbol}] unexpected data. expected={expected}, received={series.name}"
-            self.logging.info(warn_msg)
-            helper.send_slack(warn_msg)
-            # 이 분봉에 대한 동작은 이미 완료하였으므로 callback을 건너뛴다
-            return
-
-        #self.datas[symbol] = self.datas[symbol].append(series)
-        self.datas[symbol] = pd.concat([self.datas[symbol], series.to_frame().T])
-
-        # self.logging.info(series.name)
-        self.__clear_old_df(symbol)
-
-        # 모든 symbol의 데이터가 일치하는지 확인.
-        datas = []
-        prev_date = None
-        for s, df in self.datas.items():
-            new_date = df.iloc[-1].name
-
-            if prev_date and prev_date != new_date:
-                # 다른 symbol의 데이터를 더 기다려야 하는 상황
+                self.logging.info(msg)
+                helper.send_slack(msg)
+
+                missing_df = self.__get_history_from_exchange(symbol, expected, ohlcv[0], 10)
+                df = missing_df[missing_df["timestamp"] == expected]
+                if not df.empty:
+                    row = [int(df["timestamp"].iloc[0])] + [float(df[c].iloc[0]) for c in self.columns[2:]]
+                    self.logging.info(f"[{symbol}] new data={self.__to_datetime(row[0])}")
+                    self.__append_bar(symbol, row)
+
+                    expected = row[0] + interval_ms
+                else:
+                    fail_msg = f"[{symbol}] failed to retrieve data"
+                    self.logging.info(fail_msg)
+                    helper.send_slack(fail_msg)
+                    break
+
+            if expected > ohlcv[0]:
+                warn_msg = (
+                    f"[{symbol}] unexpected data. "
+                    f"expected={self.__to_datetime(expected)}, received={self.__to_datetime(ohlcv[0])}"
+                )
+                self.logging.info(warn_msg)
+                helper.send_slack(warn_msg)
+                # 이 분봉에 대한 동작은 이미 완료하였으므로 callback을 건너뛴다
                 return
 
-            prev_date = new_date
-            datas.append((s, df, 0.0))  # 현재 live에서는 funding rate 정보를 주지 않는다.
+            self.__append_bar(symbol, ohlcv)
+
+    def __append_bar(self, symbol, row):
+        """self.lock을 잡은 상태에서 호출한다. 봉을 버퍼에 쓰고 barrier에 도착을 기록한다."""
+        # 다음 봉을 쓰기 전에 아직 기다리는 이전 봉이 있으면 도착한 심볼만으로 먼저 처리한다.
+        self.barrier.release_before(row[0])
+        self.datas[symbol].append(row)
+        self.__notify_bar(symbol, row[0], row[1:])
+        self.barrier.arrive(symbol, row[0])
+
+    def __on_bar_timeout(self, timestamp):
+        with self.lock:
+            self.barrier.expire(timestamp)
+
+    def __on_bar_release(self, timestamp, stale_symbols, skew_ms):
+        self.stale_symbols = stale_symbols
+        self.last_bar_skew_ms = skew_ms
+        if stale_symbols:
+            self.logging.info(
+                f"[{self.args.strategy}] bar {self.__to_datetime(timestamp)} dispatched without "
+                f"{sorted(stale_symbols)}. skew={skew_ms:.1f}ms"
+            )
+
+        # 현재 live에서는 funding rate 정보를 주지 않는다. stale 심볼은 직전 봉까지의 윈도우를 전달한다.
+        datas = [(s, self.__get_window(bars), 0.0) for s, bars in self.datas.items()]
 
         self.last_update_ts = helper.now_ts()
         try:
@@ -260,11 +405,57 @@ class LiveData(base.Base):
             err_msg = f"[{self.args.strategy}] Error\n{traceback.format_exc()}"
             helper.send_slack(err_msg, self.args.author)
 
-    def __build_series_from_ohlcv(self, ohlcv):
-        dt = datetime.datetime.fromtimestamp(ohlcv[0] / 1000, tz=datetime.timezone.utc)
-        series = pd.Series(ohlcv, self.columns[1:])
-        series.name = dt
-        return series
+    def __get_window(self, bars):
+        """
+        ring buffer의 최근 data_length개 봉.\n
+        live.use_window_view가 켜져 있으면 복사 없이 WindowFrame을 넘긴다. 이 윈도우는 같은 심볼의 다음 봉이 들어오기 전까지만 유효하다.
+        """
+        start, stop = bars.bounds()
+        frame = window.WindowFrame(window.EpochIndex(bars.data["timestamp"]), bars.data, start, stop)
+        if self.args.live.use_window_view:
+            return frame
+        return frame.to_frame()
+
+    def __get_closed_end_ts(self):
+        """마지막으로 닫힌 봉의 종료 시각(ms)"""
+        interval_ms = helper.interval_in_seconds(self.args.interval) * 1000
+        return int(helper.now_ts()) // interval_ms * interval_ms - 1
+
+    def __catch_up(self, symbol):
+        bars = self.datas[symbol]
+        start = bars.last("timestamp") + helper.interval_in_seconds(self.args.interval) * 1000
+        end = self.__get_closed_end_ts()
+        if start > end:
+            return
+
+        df = self.__get_history_from_exchange(symbol, start, end, 1500)
+        with self.lock:
+            for row in zip(df["timestamp"].tolist(), *[df[c].tolist() for c in self.columns[2:]]):
+                if row[0] > bars.last("timestamp"):
+                    bars.append(row)
+                    self.__notify_bar(symbol, row[0], row[1:])
+        self.logging.info(f"[{symbol}] caught up {len(df)} bars")
+
+    def __to_datetime(self, timestamp):
+        return datetime.datetime.fromtimestamp(timestamp / 1000, tz=datetime.timezone.utc)
+
+    def __notify_bar(self, symbol, timestamp, ohlcv):
+        listeners = self.bar_listeners.get(symbol)
+        if not listeners:
+            return
+
+        for listener in listeners:
+            try:
+                listener(symbol, timestamp, *[float(v) for v in ohlcv])
+            except Exception:
+                self.logging.error("caught in bar listener", exc_info=True)
+
+    def _get_listener_history(self, symbol):
+        bars = self.datas.get(symbol)
+        if bars is None:
+            return None
+        start, stop = bars.bounds()
+        return window.WindowFrame(window.EpochIndex(bars.data["timestamp"]), bars.data, start, stop).to_frame()
 
     def __load_history(self, symbol, history_end_ts):
         history_end_time = datetime.datetime.fromtimestamp(history_end_ts / 1000, tz=datetime.timezone.utc)
@@ -278,20 +469,29 @@ class LiveData(base.Base):
         today_start_ts = int(today_start_time.timestamp() * 1000)
 
         # 아퀴스 데이터에서 오늘 날짜 직전까지의 kline 정보를 받아온다.
-        self.datas[symbol] = self._get_data(symbol, history_start, today_start_time)
-        # self.logging.info(f'__get_data\n{self.datas[symbol]}')
+        # listener warm up이 중간 상태를 보지 않도록 history를 모두 받은 뒤 한 번에 교체한다.
+        history_df = self._get_data(symbol, history_start, today_start_time)
 
         # 거래소에서 직접 오늘 하루치 kline 정보를 받아온다.
         kline_dataframe = self.__get_history_from_exchange(symbol, today_start_ts, history_end_ts, 1500)
         # self.logging.info(f'__get_history_from_exchange\n{kline_dataframe}')
 
-        self.datas[symbol] = pd.concat([self.datas[symbol], kline_dataframe])
-        # self.logging.info(f'concated\n{self.datas[symbol]}')
+        df = pd.concat([history_df, kline_dataframe])
+        # self.logging.info(f'concated\n{df}')
 
-        self.logging.info(
-            f"[{symbol}] data loaded. total len={len(self.datas[symbol])}\n from kline len={len(kline_dataframe)}"
+        # 이후 봉은 data_length 크기의 ring buffer에 덮어쓴다. 봉마다 DataFrame을 새로 만들지 않는다.
+        bars = aggregator.RingBuffer(self.bar_dtypes, self.data_length)
+        bars.extend(
+            [df["timestamp"].to_numpy(dtype="int64")] + [df[c].to_numpy(dtype="float64") for c in self.columns[2:]]
         )
 
+        with self.lock:
+            self.datas[symbol] = bars
+            # history를 불러오기 전에 등록된 listener는 여기서 warm up 한다.
+            self._feed_bars(symbol, df, self.bar_listeners.get(symbol))
+
+        self.logging.info(f"[{symbol}] data loaded. total len={len(df)}\n from kline len={len(kline_dataframe)}")
+
     def __build_kline_df(self, kline_history):
         filtered_list = [
             [
@@ -309,18 +509,10 @@ class LiveData(base.Base):
         df.set_index("datetime", inplace=True)
         return df
 
-    def __clear_old_df(self, symbol):
-        df = self.datas[symbol]
-        if len(df) > self.data_length:
-            drop_length = len(df) - self.data_length
-            df.drop(df.index[:drop_length], inplace=True)
-
     def __get_history_from_exchange(self, symbol, start, end, limit):
-        # TODO sungmkim - get from api_key.json
-        self.client = client.Client("api_key", "api_secret")
         kline_history = None
         if self.args.ex_class == "futures":
-            kline_history = self.client.futures_klines(
+            kline_history = self.rest_client.futures_klines(
                 symbol=symbol.upper(),
                 interval=self.args.interval,
                 limit=limit,
@@ -328,7 +520,7 @@ class LiveData(base.Base):
                 endTime=end,
             )
         else:
-            kline_history = self.client.get_klines(
+            kline_history = self.rest_client.get_klines(
                 symbol=symbol.upper(),
                 interval=self.args.interval,
                 limit=limit,
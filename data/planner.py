@@ -0,0 +1,92 @@
+import json
+import os
+
+import numpy as np
+
+
+def merge_intervals(intervals):
+    """겹치거나 맞닿은 [start, end) 구간들을 하나로 합친다."""
+    merged = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_intervals(start, end, covered):
+    """[start, end) 에서 covered 구간들을 제외한 나머지 구간을 반환한다."""
+    missing = []
+    cursor = start
+    for c_start, c_end in merge_intervals(covered):
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            missing.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def contiguous_runs(timestamps, interval_ms, end=None):
+    """정렬된 캔들 시각들이 interval 간격으로 이어지는 [start, end) 구간 list. end가 있으면 마지막 구간을 end로 자른다."""
+    timestamps = np.asarray(timestamps, dtype="int64")
+    if len(timestamps) == 0:
+        return []
+
+    breaks = np.flatnonzero(np.diff(timestamps) != interval_ms)
+    starts = timestamps[np.r_[0, breaks + 1]].tolist()
+    ends = (timestamps[np.r_[breaks, len(timestamps) - 1]] + interval_ms).tolist()
+    if end is not None:
+        ends = [min(e, end) for e in ends]
+    return list(zip(starts, ends))
+
+
+class FetchPlanner:
+    """
+    저장소 키별로 이미 받아온 구간(coverage)을 기록하고, 요청 구간 중 빠진 부분만 계산한다.\n
+    coverage는 <root>/<key>.coverage.json 에 저장되며 항상 임시 파일을 쓴 뒤 교체한다.
+    데이터가 실제로 비어있는 구간(거래소 점검 등)도 한 번 받아온 뒤에는 다시 요청하지 않는다.
+    """
+
+    def __init__(self, column_store, key, interval_ms=1):
+        self.store = column_store
+        self.key = key
+        self.interval_ms = interval_ms
+        self.path = os.path.join(column_store.root, f"{key}.coverage.json")
+
+    def get_coverage(self):
+        try:
+            with open(self.path) as f:
+                return merge_intervals([tuple(x) for x in json.load(f)])
+        except (IOError, ValueError):
+            pass
+
+        # coverage 기록 이전에 저장된 데이터는 처음과 끝 사이를 모두 받은 것으로 본다.
+        bounds = self.store.get_bounds(self.key)
+        if bounds is None:
+            return []
+        return [(bounds[0], bounds[1] + self.interval_ms)]
+
+    def plan(self, start, end):
+        """[start, end) 중 받아와야 하는 구간 목록. 구간 경계는 interval 단위로 맞춘다."""
+        start = start - (start % self.interval_ms)
+        if end % self.interval_ms:
+            end = end + self.interval_ms - (end % self.interval_ms)
+        return subtract_intervals(start, end, self.get_coverage())
+
+    def record(self, start, end):
+        if start >= end:
+            return
+
+        coverage = merge_intervals(self.get_coverage() + [(start, end)])
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(coverage, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,195 @@
+import datetime
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from common import arg
+from . import backtest
+from . import indicator
+
+# 프로세스별로 attach한 공유 메모리. Pool 워커는 여러 작업을 처리하므로 한 번만 attach 한다.
+_attached = {}
+
+
+def _attach(name):
+    if name in _attached:
+        return _attached[name]
+
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python 3.13 미만에는 track 옵션이 없다.
+        # attach한 워커가 종료될 때 resource_tracker가 세그먼트를 지우지 않도록 등록을 막는다.
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+    _attached[name] = shm
+    return shm
+
+
+class SharedDataPlane:
+    """
+    Multi 실행 시 부모 프로세스가 심볼별 OHLCV를 한 번만 읽어 공유 메모리에 올려두고,
+    워커들은 복사 없이 같은 메모리를 DataFrame으로 읽는다.\n
+    심볼마다 세그먼트 하나를 사용한다. index(int64), float64가 아닌 컬럼, float64 컬럼 블록((컬럼 수, 행 수)) 순서로 저장한다.
+    pickle 시에는 manifest만 전달되므로 Pool 작업 인자로 그대로 넘길 수 있다.
+    """
+
+    def __init__(self):
+        self.manifest = {}
+        self.owned = []
+        self.frames = {}
+
+    def __getstate__(self):
+        return {"manifest": self.manifest}
+
+    def __setstate__(self, state):
+        self.manifest = state["manifest"]
+        self.owned = []
+        self.frames = {}
+
+    def publish(self, symbol, df, start_ts, end_ts):
+        """[start_ts, end_ts) 구간의 df를 공유 메모리에 올린다. 부모 프로세스에서만 호출한다."""
+        length = len(df)
+        if length == 0:
+            return
+
+        float_columns = [c for c in df.columns if df[c].dtype == np.float64]
+        other_columns = [c for c in df.columns if c not in float_columns]
+        for column in other_columns:
+            if df[column].dtype.kind not in "biu":
+                raise ValueError(f"unsupported column type for shared data: {column} {df[column].dtype}")
+
+        size = 8 * length * (1 + len(other_columns) + len(float_columns))
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self.owned.append(shm)
+
+        offset = 0
+        np.ndarray(length, dtype="int64", buffer=shm.buf, offset=offset)[:] = df.index.asi8
+        offset += 8 * length
+        for column in other_columns:
+            np.ndarray(length, dtype="int64", buffer=shm.buf, offset=offset)[:] = df[column].to_numpy()
+            offset += 8 * length
+        block = np.ndarray((len(float_columns), length), dtype="float64", buffer=shm.buf, offset=offset)
+        for i, column in enumerate(float_columns):
+            block[i] = df[column].to_numpy()
+
+        self.manifest[symbol.lower()] = {
+            "name": shm.name,
+            "length": length,
+            "columns": list(df.columns),
+            "other_columns": other_columns,
+            "float_columns": float_columns,
+            "index_unit": df.index.unit,
+            "index_tz": str(df.index.tz) if df.index.tz is not None else None,
+            "index_name": df.index.name,
+            "start_ts": start_ts,
+            "end_ts": end_ts,
+            "fingerprint": indicator.fingerprint(df),
+        }
+
+    def has(self, symbol, start_ts, end_ts):
+        entry = self.manifest.get(symbol.lower())
+        return entry is not None and entry["start_ts"] <= start_ts and end_ts <= entry["end_ts"]
+
+    def get(self, symbol):
+        """공유 메모리 위의 DataFrame. float64 컬럼은 복사 없이 읽기 전용 메모리를 그대로 사용한다."""
+        symbol = symbol.lower()
+        if symbol in self.frames:
+            return self.frames[symbol]
+
+        entry = self.manifest[symbol]
+        length = entry["length"]
+        shm = _attach(entry["name"])
+
+        offset = 0
+        index_values = np.ndarray(length, dtype="int64", buffer=shm.buf, offset=offset)
+        offset += 8 * length
+        others = {}
+        for column in entry["other_columns"]:
+            others[column] = np.ndarray(length, dtype="int64", buffer=shm.buf, offset=offset)
+            offset += 8 * length
+        block = np.ndarray((len(entry["float_columns"]), length), dtype="float64", buffer=shm.buf, offset=offset)
+        block.setflags(write=False)
+
+        index = pd.DatetimeIndex(index_values.view(f"M8[{entry['index_unit']}]"), name=entry["index_name"])
+        if entry["index_tz"]:
+            index = index.tz_localize(entry["index_tz"])
+
+        df = pd.DataFrame(block.T, columns=entry["float_columns"], index=index, copy=False)
+        for column, values in others.items():
+            df.insert(entry["columns"].index(column), column, values)
+
+        self.frames[symbol] = df
+        return df
+
+    def close(self):
+        """부모 프로세스에서 공유 메모리를 해제한다."""
+        self.frames = {}
+        for shm in self.owned:
+            shm.close()
+            shm.unlink()
+        self.owned = []
+        self.manifest = {}
+
+
+class SharedBacktestData(backtest.BacktestData):
+    """
+    SharedDataPlane에 올라간 구간은 공유 메모리에서 잘라서 사용하는 BacktestData.
+    공유되지 않은 심볼이나 구간은 기존처럼 저장소에서 읽는다.
+    """
+
+    def __init__(self, args: arg.Args, data_plane: SharedDataPlane):
+        backtest.BacktestData.__init__(self, args)
+        self.data_plane = data_plane
+
+    def __slice(self, df, start_ts, end_ts):
+        index = df.index
+        begin = index.searchsorted(pd.Timestamp(start_ts, unit="ms", tz="UTC"), side="left")
+        end = index.searchsorted(pd.Timestamp(end_ts, unit="ms", tz="UTC"), side="left")
+        return begin, end
+
+    def _get_data(self, symbol, start, end):
+        start_ts = self._to_timestamp(start)
+        end_ts = self._to_timestamp(end)
+        if not self.data_plane.has(symbol, start_ts, end_ts):
+            return backtest.BacktestData._get_data(self, symbol, start, end)
+
+        df = self.data_plane.get(symbol)
+        begin, stop = self.__slice(df, start_ts, end_ts)
+        return df.iloc[begin:stop]
+
+    def _load_data(self, symbol):
+        history_start = self.args.backtest.start_time - datetime.timedelta(days=self.args.history_days + 1)
+        history_start_ts = self._to_timestamp(history_start)
+        start_ts = self._to_timestamp(self.args.backtest.start_time)
+        end_ts = self._to_timestamp(self.args.backtest.end_time)
+        if not self.data_plane.has(symbol, history_start_ts, end_ts):
+            return backtest.BacktestData._load_data(self, symbol)
+
+        # history와 백테스트 구간은 공유 메모리에서 연속되어 있으므로 concat 없이 한 번에 자른다.
+        df = self.data_plane.get(symbol)
+        history_begin, begin = self.__slice(df, history_start_ts, start_ts)
+        _, stop = self.__slice(df, start_ts, end_ts)
+        history_begin = max(history_begin, begin - max(0, self.data_length - 1))
+        return df.iloc[history_begin:stop], df.iloc[begin:stop]
+
+    def _get_indicator_source(self, symbol):
+        # 공유 메모리에서 잘라낸 데이터면 공유된 전체 데이터 기준으로 지표를 계산해서 워커, 케이스끼리 같은 캐시를 사용한다.
+        entry = self.data_plane.manifest.get(symbol.lower())
+        df = self.datas[symbol].df
+        if entry is None or len(df) == 0:
+            return backtest.BacktestData._get_indicator_source(self, symbol)
+
+        shared_df = self.data_plane.get(symbol)
+        offset = shared_df.index.searchsorted(df.index[0], side="left")
+        end = offset + len(df)
+        if end > len(shared_df) or shared_df.index[offset] != df.index[0] or shared_df.index[end - 1] != df.index[-1]:
+            return backtest.BacktestData._get_indicator_source(self, symbol)
+        return shared_df, entry["fingerprint"], offset
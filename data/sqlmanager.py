@@ -1,51 +1,199 @@
+import argparse
 import os
 import sqlite3
+import threading
+import time
+
+import numpy as np
 import pandas as pd
 
+from common import helper
+
+TABLE_NAME = "ohlcv"
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# 프로세스 안에서 DB 파일마다 SqlManager 하나를 공유한다.
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_default_path():
+    return os.path.join(helper.create_directory("/data_cache"), "argos.db")
+
+
+def get_manager(db_name=None):
+    db_name = os.path.realpath(db_name or get_default_path())
+    with _managers_lock:
+        if db_name not in _managers:
+            _managers[db_name] = SqlManager(db_name)
+        return _managers[db_name]
+
+
 class SqlManager:
-    def __init__(self):
-        # TODO: 테스트 필요
-
-        # SQLite 데이터베이스 파일명
-        self.db_name = "argos_eth.db"
-        
-        # SQLite 연결 생성
-        self.conn = sqlite3.connect(self.db_name)
-        self.cursor = self.conn.cursor()
-
-    def create_table(self, table_name):
-        self.table_name = table_name
-        self.cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} (timestamp TEXT PRIMARY KEY, datetime TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL)")
-        self.conn.commit()
-
-    def insert_data_from_csv(self, csv_folder):
-        for file in os.listdir(csv_folder):
-            if file.endswith(".csv"):
-                file_path = os.path.join(csv_folder, file)
-                # CSV 파일 읽기
-                df = pd.read_csv(file_path)
-                if "timestamp" not in df.columns:
-                    print(f"Skipping {file}, no timestamp column found.")
-                    continue
-
-                timestamp_col = df["timestamp"]
-                datetime_col = df["datetime"]
-                open_col = df["open"]
-                high_col = df["high"]
-                low_col = df["low"]
-                close_col = df["close"]
-                volume_col = df["volume"]
-
-                for timestamp, datetime, open, high, low, close, volume in zip(timestamp_col, datetime_col, open_col, high_col,
-                                                                               low_col, close_col, volume_col):
-                    self.cursor.execute(f"INSERT OR IGNORE INTO {self.table_name} (timestamp, datetime, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                   (timestamp, datetime, open, high, low, close, volume))
-                self.conn.commit()
+    """
+    모든 심볼/인터벌의 OHLCV를 저장하는 sqlite DB.\n
+    (symbol, interval, ts(epoch ms)) 를 기본키로 하는 WITHOUT ROWID 테이블 하나를 사용하므로 범위 조회는 기본키 인덱스로 처리된다.
+    WAL 모드를 사용하며 연결은 스레드마다 하나씩 만들어 재사용한다.
+    """
+
+    def __init__(self, db_name=None):
+        self.db_name = db_name or get_default_path()
+        self.local = threading.local()
+        self.create_table()
+
+    def get_connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def create_table(self):
+        conn = self.get_connection()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} ("
+            "symbol TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL, "
+            "open REAL, high REAL, low REAL, close REAL, volume REAL, "
+            "PRIMARY KEY (symbol, interval, ts)) WITHOUT ROWID"
+        )
+        conn.commit()
+
+    def insert_df(self, symbol, interval, df):
+        """timestamp(ms) 또는 datetime 컬럼과 OHLCV 컬럼을 가진 df를 저장한다. 이미 있는 캔들은 무시한다."""
+        if df is None or len(df) == 0:
+            return 0
+
+        if "timestamp" in df.columns:
+            timestamps = pd.to_numeric(df["timestamp"]).to_numpy(dtype="int64")
+        elif "datetime" in df.columns:
+            timestamps = pd.to_datetime(df["datetime"], utc=True).to_numpy(dtype="datetime64[ms]").astype("int64")
+        else:
+            raise ValueError("timestamp or datetime column is required")
+
+        values = [pd.to_numeric(df[column]).to_numpy(dtype="float64").tolist() for column in COLUMNS]
+        rows = zip([symbol.lower()] * len(df), [interval] * len(df), timestamps.tolist(), *values)
+
+        conn = self.get_connection()
+        before = conn.total_changes
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {TABLE_NAME} (symbol, interval, ts, open, high, low, close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return conn.total_changes - before
+
+    def import_file(self, symbol, interval, file_path):
+        if file_path.endswith(".parquet"):
+            df = pd.read_parquet(file_path)
+        else:
+            df = pd.read_csv(file_path)
+        return self.insert_df(symbol, interval, df)
+
+    def import_directory(self, symbol, interval, folder):
+        """folder 안의 csv, parquet 파일을 모두 저장한다."""
+        count = 0
+        for file in sorted(os.listdir(folder)):
+            if not file.endswith((".csv", ".parquet")):
+                continue
+            try:
+                count += self.import_file(symbol, interval, os.path.join(folder, file))
+            except ValueError as e:
+                print(f"Skipping {file}, {e}")
+        return count
+
+    def import_legacy_db(self, symbol, interval, legacy_db_name, table_name="argos_data"):
+        """심볼별 DB(argos_btc.db 등)의 argos_data 테이블을 옮긴다."""
+        legacy_conn = sqlite3.connect(legacy_db_name)
+        try:
+            df = pd.read_sql_query(
+                f"SELECT timestamp, open, high, low, close, volume FROM {table_name}", legacy_conn
+            )
+        finally:
+            legacy_conn.close()
+        return self.insert_df(symbol, interval, df)
+
+    def read(self, symbol, interval, start_ts, end_ts):
+        """[start_ts, end_ts) 범위의 컬럼 배열. {"timestamp": int64, "open": float64, ...}"""
+        rows = self.get_connection().execute(
+            f"SELECT ts, open, high, low, close, volume FROM {TABLE_NAME} "
+            "WHERE symbol = ? AND interval = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (symbol.lower(), interval, int(start_ts), int(end_ts)),
+        ).fetchall()
+
+        if not rows:
+            columns = {"timestamp": np.empty(0, dtype="int64")}
+            columns.update({column: np.empty(0, dtype="float64") for column in COLUMNS})
+            return columns
+
+        # epoch ms는 2^53보다 작으므로 float64를 거쳐도 값이 바뀌지 않는다.
+        values = np.array(rows, dtype="float64")
+        columns = {"timestamp": values[:, 0].astype("int64")}
+        columns.update({column: values[:, i + 1] for i, column in enumerate(COLUMNS)})
+        return columns
+
+    def get_summary(self):
+        """[(symbol, interval, 캔들 수, 첫 ts, 마지막 ts)]"""
+        return self.get_connection().execute(
+            f"SELECT symbol, interval, COUNT(*), MIN(ts), MAX(ts) FROM {TABLE_NAME} GROUP BY symbol, interval"
+        ).fetchall()
 
     def close_db(self):
-        self.conn.close()
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+def main():
+    """
+    python -m data.sqlmanager import --symbol ethusdt --interval 1m ../sql_data/eth\n
+    python -m data.sqlmanager import-legacy --symbol btcusdt --interval 1m argos_btc.db\n
+    python -m data.sqlmanager summary
+    """
+    parser = argparse.ArgumentParser(description="Local OHLCV sqlite store")
+    parser.add_argument("--db", default=None, help="DB path (default: data_cache/argos.db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="import csv/parquet files or directories")
+    import_parser.add_argument("--symbol", required=True)
+    import_parser.add_argument("--interval", required=True)
+    import_parser.add_argument("paths", nargs="+")
+
+    legacy_parser = subparsers.add_parser("import-legacy", help="import a per-symbol argos_*.db")
+    legacy_parser.add_argument("--symbol", required=True)
+    legacy_parser.add_argument("--interval", default="1m")
+    legacy_parser.add_argument("--table", default="argos_data")
+    legacy_parser.add_argument("path")
+
+    subparsers.add_parser("summary", help="print stored symbols and ranges")
+
+    args = parser.parse_args()
+    manager = SqlManager(args.db)
+    begin_ts = time.time()
+
+    if args.command == "import":
+        count = 0
+        for path in args.paths:
+            if os.path.isdir(path):
+                count += manager.import_directory(args.symbol, args.interval, path)
+            else:
+                count += manager.import_file(args.symbol, args.interval, path)
+        print(f"{count} rows imported in {time.time() - begin_ts:.1f} seconds.")
+    elif args.command == "import-legacy":
+        count = manager.import_legacy_db(args.symbol, args.interval, args.path, args.table)
+        print(f"{count} rows imported in {time.time() - begin_ts:.1f} seconds.")
+    else:
+        for symbol, interval, count, first_ts, last_ts in manager.get_summary():
+            print(
+                f"{symbol} {interval} {count} rows "
+                f"{pd.to_datetime(first_ts, unit='ms')} ~ {pd.to_datetime(last_ts, unit='ms')}"
+            )
+
+    manager.close_db()
+
 
-sqlmanager = SqlManager()
-sqlmanager.create_table("argos_data")
-sqlmanager.insert_data_from_csv("../sql_data/eth")
-sqlmanager.close_db()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from common import helper
+
+
+class ColumnStore:
+    """
+    심볼/인터벌 단위의 append-only 컬럼 저장소.\n
+    키마다 디렉토리 하나를 사용하며 컬럼별로 raw binary 파일(<컬럼>.bin)을 둔다.
+    timestamp(ms, int64) 컬럼은 항상 정렬되어 있으므로 범위 조회는 이진 탐색으로 처리한다.\n
+    같은 캔들은 한 번만 저장된다.
+    """
+
+    def __init__(self, name, schema, root=None):
+        # schema = {컬럼명: dtype}. timestamp는 항상 포함된다.
+        self.schema = {"timestamp": np.dtype("int64")}
+        self.schema.update({k: np.dtype(v) for k, v in schema.items()})
+        self.root = root or helper.create_directory(f"/data_cache/{name}")
+
+    def get_path(self, key):
+        return os.path.join(self.root, key)
+
+    def __column_path(self, key, column):
+        return os.path.join(self.get_path(key), f"{column}.bin")
+
+    def __recover(self, key):
+        # 디렉토리 교체 도중 종료된 경우 이전 디렉토리를 되살린다.
+        path = self.get_path(key)
+        old_path = f"{path}.old"
+        if not os.path.isdir(path) and os.path.isdir(old_path):
+            os.rename(old_path, path)
+
+    def __row_count(self, key):
+        # 컬럼 파일 간 길이가 다르면(쓰는 도중 종료) 가장 짧은 길이를 기준으로 한다.
+        count = None
+        for column, dtype in self.schema.items():
+            file_path = self.__column_path(key, column)
+            size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            rows = size // dtype.itemsize
+            count = rows if count is None else min(count, rows)
+        return count or 0
+
+    def __read_column(self, key, column, count):
+        if count == 0:
+            return np.empty(0, dtype=self.schema[column])
+        return np.memmap(self.__column_path(key, column), dtype=self.schema[column], mode="r", shape=(count,))
+
+    def read_all(self, key):
+        self.__recover(key)
+        count = self.__row_count(key)
+        return {column: self.__read_column(key, column, count) for column in self.schema}
+
+    def read(self, key, start_ts, end_ts):
+        """[start_ts, end_ts) 범위의 컬럼 배열을 반환한다."""
+        columns = self.read_all(key)
+        timestamps = columns["timestamp"]
+        begin = np.searchsorted(timestamps, start_ts, side="left")
+        end = np.searchsorted(timestamps, end_ts, side="left")
+        return {column: np.array(values[begin:end]) for column, values in columns.items()}
+
+    def get_bounds(self, key):
+        """저장된 첫 timestamp와 마지막 timestamp. 비어있으면 None."""
+        timestamps = self.read_all(key)["timestamp"]
+        if len(timestamps) == 0:
+            return None
+        return int(timestamps[0]), int(timestamps[-1])
+
+    def write(self, key, columns):
+        """
+        새 데이터를 저장한다. 기존 마지막 timestamp 이후의 데이터면 파일 끝에 덧붙이고,
+        그렇지 않으면 기존 데이터와 병합한 뒤 디렉토리를 통째로 교체한다.
+        """
+        new = {column: np.asarray(columns[column], dtype=dtype) for column, dtype in self.schema.items()}
+        if len(new["timestamp"]) == 0:
+            return 0
+
+        order = np.argsort(new["timestamp"], kind="stable")
+        _, unique_index = np.unique(new["timestamp"][order], return_index=True)
+        new = {column: values[order][unique_index] for column, values in new.items()}
+
+        existing = self.read_all(key)
+        count = len(existing["timestamp"])
+        if count == 0 or new["timestamp"][0] > existing["timestamp"][-1]:
+            self.__append(key, new, count)
+            return len(new["timestamp"])
+
+        # 기존 데이터가 우선한다.
+        is_new = ~np.isin(new["timestamp"], existing["timestamp"])
+        if not is_new.any():
+            return 0
+
+        merged = {column: np.concatenate([existing[column], new[column][is_new]]) for column in self.schema}
+        order = np.argsort(merged["timestamp"], kind="stable")
+        merged = {column: values[order] for column, values in merged.items()}
+        del existing
+        self.__replace(key, merged)
+        return int(is_new.sum())
+
+    def __append(self, key, columns, count):
+        path = self.get_path(key)
+        os.makedirs(path, exist_ok=True)
+        for column, dtype in self.schema.items():
+            file_path = self.__column_path(key, column)
+            with open(file_path, "ab") as f:
+                # 이전에 쓰다 만 데이터가 있으면 잘라낸 뒤 덧붙인다.
+                f.truncate(count * dtype.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(columns[column]).tobytes())
+
+    def __replace(self, key, columns):
+        path = self.get_path(key)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        old_path = f"{path}.old"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for column in self.schema:
+            with open(os.path.join(tmp_path, f"{column}.bin"), "wb") as f:
+                f.write(np.ascontiguousarray(columns[column]).tobytes())
+
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.isdir(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+class OhlcvStore(ColumnStore):
+    COLUMNS = ["open", "high", "low", "close", "volume"]
+
+    def __init__(self, root=None):
+        ColumnStore.__init__(self, "ohlcv", {c: "float64" for c in self.COLUMNS}, root)
+
+    @staticmethod
+    def make_key(ex_name, ex_class, symbol, interval):
+        return f"{ex_name}_{ex_class}_{symbol.lower()}_{interval}"
+
+    def write_df(self, key, df):
+        if df is None or len(df) == 0:
+            return 0
+        columns = {"timestamp": pd.to_numeric(df["timestamp"]).to_numpy(dtype="int64")}
+        for column in self.COLUMNS:
+            columns[column] = pd.to_numeric(df[column]).to_numpy(dtype="float64")
+        return self.write(key, columns)
+
+    def read_df(self, key, start_ts, end_ts):
+        columns = self.read(key, start_ts, end_ts)
+        index = pd.DatetimeIndex(pd.to_datetime(columns["timestamp"], unit="ms", utc=True), name="datetime")
+        return pd.DataFrame(columns, index=index)
+
+
+class FundingRateStore(ColumnStore):
+    def __init__(self, root=None):
+        ColumnStore.__init__(self, "funding_rate", {"funding_rate": "float64"}, root)
+
+    @staticmethod
+    def make_key(ex_name, ex_class, symbol):
+        return f"{ex_name}_{ex_class}_{symbol.lower()}"
+
+    def read_df(self, key, start_ts, end_ts):
+        columns = self.read(key, start_ts, end_ts)
+        index = pd.DatetimeIndex(pd.to_datetime(columns["timestamp"], unit="ms", utc=True), name="datetime")
+        return pd.DataFrame({"funding_rate": columns["funding_rate"]}, index=index)
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+
+class EpochIndex:
+    """
+    epoch ms 배열을 DatetimeIndex처럼 사용하기 위한 index.\n
+    정수 위치는 pd.Timestamp(UTC)로, slice는 pd.DatetimeIndex로 변환해 반환하므로 변환 비용은 실제로 읽을 때만 든다.
+    """
+
+    __slots__ = ("_values", "name")
+
+    def __init__(self, values, name="datetime"):
+        self._values = values
+        self.name = name
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return pd.DatetimeIndex(pd.to_datetime(self._values[key], unit="ms", utc=True), name=self.name)
+        return pd.Timestamp(int(self._values[key]), unit="ms", tz="UTC")
+
+
+class WindowRow:
+    """
+    WindowFrame의 한 행. pandas Series 처럼 row["close"], row.close, row.name 으로 접근한다.
+    """
+
+    __slots__ = ("_frame", "_pos")
+
+    def __init__(self, frame, pos):
+        self._frame = frame
+        self._pos = pos
+
+    @property
+    def name(self):
+        return self._frame._index[self._pos]
+
+    @property
+    def index(self):
+        return self._frame.columns
+
+    def keys(self):
+        return self._frame.columns
+
+    def __getitem__(self, key):
+        return self._frame._columns[key][self._pos]
+
+    def __getattr__(self, key):
+        if key.startswith("_"):
+            raise AttributeError(key)
+        try:
+            return self._frame._columns[key][self._pos]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __contains__(self, key):
+        return key in self._frame._columns
+
+    def get(self, key, default=None):
+        if key not in self._frame._columns:
+            return default
+        return self[key]
+
+    def to_series(self):
+        series = pd.Series({k: v[self._pos] for k, v in self._frame._columns.items()})
+        series.name = self.name
+        return series
+
+    def __repr__(self):
+        return repr(self.to_series())
+
+
+class _ILocIndexer:
+    __slots__ = ("_frame",)
+
+    def __init__(self, frame):
+        self._frame = frame
+
+    def __getitem__(self, key):
+        frame = self._frame
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(frame))
+            if step != 1:
+                raise IndexError("WindowFrame.iloc does not support step slicing")
+            return WindowFrame(frame._index, frame._columns, frame._start + start, frame._start + max(start, stop))
+
+        pos = int(key)
+        if pos < 0:
+            pos += len(frame)
+        if pos < 0 or pos >= len(frame):
+            raise IndexError(f"index {key} is out of bounds for window of length {len(frame)}")
+        return WindowRow(frame, frame._start + pos)
+
+
+class WindowFrame:
+    """
+    미리 할당된 numpy 컬럼 배열 위의 읽기 전용 슬라이딩 윈도우.\n
+    매 봉마다 DataFrame을 잘라내는 대신 [start, stop) 범위만 기록하므로 생성 비용이 윈도우 길이와 무관하다.\n
+    df.close, df["close"]는 numpy view를, df.iloc[-1]은 WindowRow를 반환한다.
+    pandas 기능(resample, rolling 등)이 필요하면 to_frame()으로 DataFrame을 만든다.
+    """
+
+    __slots__ = ("_index", "_columns", "_start", "_stop", "_frame_cache")
+
+    def __init__(self, index, columns, start, stop):
+        self._index = index
+        self._columns = columns
+        self._start = start
+        self._stop = stop
+        self._frame_cache = None
+
+    @staticmethod
+    def build_columns(df):
+        """DataFrame의 각 컬럼을 연속된 읽기 전용 numpy 배열로 복사한다. 데이터 로드 시 한 번만 호출한다."""
+        columns = {}
+        for col in df.columns:
+            values = np.ascontiguousarray(df[col].to_numpy())
+            values.setflags(write=False)
+            columns[col] = values
+        return columns
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def empty(self):
+        return self._stop <= self._start
+
+    @property
+    def shape(self):
+        return (len(self), len(self._columns))
+
+    @property
+    def columns(self):
+        return list(self._columns.keys())
+
+    @property
+    def index(self):
+        return self._index[self._start:self._stop]
+
+    @property
+    def iloc(self):
+        return _ILocIndexer(self)
+
+    def __getitem__(self, key):
+        return self._columns[key][self._start:self._stop]
+
+    def __getattr__(self, key):
+        if key.startswith("_"):
+            raise AttributeError(key)
+        try:
+            return self._columns[key][self._start:self._stop]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def to_frame(self):
+        """pandas DataFrame으로 변환한다. 같은 윈도우에서 여러 번 호출해도 한 번만 생성한다."""
+        if self._frame_cache is None:
+            self._frame_cache = pd.DataFrame(
+                {k: v[self._start:self._stop] for k, v in self._columns.items()},
+                index=self.index,
+            )
+        return self._frame_cache
+
+    def __repr__(self):
+        return repr(self.to_frame())
@@ -233,8 +233,10 @@ class Client(object):
             kwargs['params'] = '&'.join('%s=%s' % (data[0], data[1]) for data in kwargs['data'])
             del(kwargs['data'])
 
-        self.response = getattr(self.session, method)(uri, **kwargs)
-        return self._handle_response()
+        # keep the response local so a client shared between threads handles its own response
+        response = getattr(self.session, method)(uri, **kwargs)
+        self.response = response
+        return self._handle_response(response)
 
     def _request_api(self, method, path, signed=False, version=PUBLIC_API_VERSION, **kwargs):
         uri = self._create_api_uri(path, signed, version)
@@ -276,17 +278,19 @@ class Client(object):
 
         return self._request(method, uri, signed, True, **kwargs)
 
-    def _handle_response(self):
+    def _handle_response(self, response=None):
         """Internal helper for handling API responses from the Binance server.
         Raises the appropriate exceptions when necessary; otherwise, returns the
         response.
         """
-        if not (200 <= self.response.status_code < 300):
-            raise BinanceAPIException(self.response)
+        if response is None:
+            response = self.response
+        if not (200 <= response.status_code < 300):
+            raise BinanceAPIException(response)
         try:
-            return self.response.json()
+            return response.json()
         except ValueError:
-            raise BinanceRequestException('Invalid Response: %s' % self.response.text)
+            raise BinanceRequestException('Invalid Response: %s' % response.text)
 
     def _get(self, path, signed=False, version=PUBLIC_API_VERSION, **kwargs):
         return self._request_api('get', path, signed, version, **kwargs)
@@ -649,6 +649,21 @@ class BinanceSocketManager(threading.Thread):
         stream_path = 'streams={}'.format('/'.join(streams))
         return self._start_socket(stream_path, callback, 'stream?')
 
+    def start_futures_multiplex_socket(self, streams, callback):
+        """Start a multiplexed futures socket using a list of socket names.
+
+        Combined stream events are wrapped as follows: {"stream":"<streamName>","data":<rawPayload>}
+
+        :param streams: list of stream names in lower case i.e btcusdt@kline_1m
+        :type streams: list
+        :param callback: callback function to handle messages
+        :type callback: function
+
+        :returns: connection key string if successful, False otherwise
+
+        """
+        return self._start_futures_socket('/'.join(streams), callback)
+
     def start_user_socket(self, callback):
         """Start a websocket for user data
 
@@ -1,7 +1,24 @@
+import math
+from collections import deque
+
 import numpy as np
 import pandas as pd
 
 
+def _wilder_sum(values, period):
+    """
+    첫 period개의 합에서 시작해 s = s * (period - 1) / period + x 로 누적한다.
+    반환값은 period - 1 번째 원소부터의 list.
+    """
+    if len(values) < period:
+        return []
+
+    smoothed = [float(np.sum(values[:period]))]
+    for x in values[period:].tolist():
+        smoothed.append(smoothed[-1] * (period - 1) / period + x)
+    return smoothed
+
+
 def get_force_index(df, interval, period):
     """
     추세를 측정하는데 거래량이라는 지표를 추가, 거래량이 강할수록 추세가 크다고 가정
@@ -54,26 +71,10 @@ def get_adx(df, interval, period):
     dm_plus = dm_plus.where(dm_plus > 0, 0)
     dm_minus = dm_minus.where(dm_minus > 0, 0)
     tr = (high - low).iloc[1:]
-    index = dm_plus.index
-    smoothed_dm_plus, smoothed_dm_minus, smoothed_tr = (
-        pd.Series(index=index),
-        pd.Series(index=index),
-        pd.Series(index=index),
-    )
-    for i in range(period - 1, len(dm_plus)):
-        if i == period - 1:
-            smoothed_dm_plus[i] = dm_plus[0 : i + 1].sum()
-            smoothed_dm_minus[i] = dm_minus[0 : i + 1].sum()
-            smoothed_tr[i] = tr[0 : i + 1].sum()
-        else:
-            smoothed_dm_plus[i] = smoothed_dm_plus[i - 1] * (period - 1) / period + dm_plus[i]
-            smoothed_dm_minus[i] = smoothed_dm_minus[i - 1] * (period - 1) / period + dm_minus[i]
-            smoothed_tr[i] = smoothed_tr[i - 1] * (period - 1) / period + tr[i]
-    smoothed_dm_plus, smoothed_dm_minus, smoothed_tr = (
-        smoothed_dm_plus.dropna(),
-        smoothed_dm_minus.dropna(),
-        smoothed_tr.dropna(),
-    )
+    index = dm_plus.index[period - 1:]
+    smoothed_dm_plus = pd.Series(_wilder_sum(dm_plus.to_numpy(dtype="float64"), period), index=index)
+    smoothed_dm_minus = pd.Series(_wilder_sum(dm_minus.to_numpy(dtype="float64"), period), index=index)
+    smoothed_tr = pd.Series(_wilder_sum(tr.to_numpy(dtype="float64"), period), index=index)
     di_plus = 100 * smoothed_dm_plus / smoothed_tr
     di_minus = 100 * smoothed_dm_minus / smoothed_tr
     dx = 100 * abs(di_plus - di_minus) / abs(di_plus + di_minus)
@@ -115,6 +116,246 @@ def get_trend(df, interval, period):
 
     close = df.close.resample("{}min".format(interval), origin="start").last().iloc[-period:]
     open = df.open.resample("{}min".format(interval), origin="start").first().iloc[-period:]
-    trend = 100 * abs(close[-1] - open[0]) / abs(close - open).sum()
+    trend = 100 * abs(close.iloc[-1] - open.iloc[0]) / abs(close - open).sum()
 
     return trend
+
+
+class _Ewm:
+    """pandas의 ewm(adjust=False).mean()과 같은 순서로 계산하는 누적기. NaN 입력은 관측으로 세지 않는다."""
+
+    def __init__(self, span=None, alpha=None, min_periods=0):
+        com = (span - 1) / 2 if span is not None else (1.0 - alpha) / alpha
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - self.alpha
+        self.min_periods = max(min_periods, 1)
+        self.old_wt = 1.0
+        self.weighted = math.nan
+        self.nobs = 0
+
+    def update(self, x):
+        is_observation = x == x
+        self.nobs += is_observation
+        if self.weighted == self.weighted:
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                if self.weighted != x:
+                    self.weighted = (self.old_wt * self.weighted + self.alpha * x) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = x
+
+        return self.weighted if self.nobs >= self.min_periods else math.nan
+
+
+class _RollingExtreme:
+    """monotonic deque로 최근 period개의 최대(또는 최소)값을 O(1)에 구한다. period개가 모이기 전에는 NaN."""
+
+    def __init__(self, period, is_max):
+        self.period = period
+        self.is_max = is_max
+        self.count = 0
+        self.values = deque()
+
+    def update(self, x):
+        values = self.values
+        if self.is_max:
+            while values and values[-1][1] <= x:
+                values.pop()
+        else:
+            while values and values[-1][1] >= x:
+                values.pop()
+        values.append((self.count, x))
+        self.count += 1
+
+        if values[0][0] <= self.count - 1 - self.period:
+            values.popleft()
+        return values[0][1] if self.count >= self.period else math.nan
+
+
+class _RollingMean:
+    """최근 period개의 평균. 구간에 NaN이 있으면 NaN. 누적 오차가 쌓이지 않도록 period마다 합을 다시 계산한다."""
+
+    def __init__(self, period):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.nan_count = 0
+        self.updates = 0
+
+    def update(self, x):
+        values = self.values
+        if len(values) == self.period:
+            old = values[0]
+            if old != old:
+                self.nan_count -= 1
+            else:
+                self.total -= old
+        values.append(x)
+        if x != x:
+            self.nan_count += 1
+        else:
+            self.total += x
+
+        self.updates += 1
+        if self.updates % self.period == 0:
+            self.total = math.fsum(v for v in values if v == v)
+
+        if len(values) < self.period or self.nan_count > 0:
+            return math.nan
+        return self.total / self.period
+
+
+def _divide(a, b):
+    # numpy/pandas와 같이 0으로 나누면 inf 또는 NaN을 반환한다.
+    if b == 0.0:
+        if a != a or a == 0.0:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class StreamIndicator:
+    """
+    닫힌 봉 하나마다 update로 O(1)에 갱신되는 지표. value는 마지막으로 계산된 값이다.\n
+    get_* 함수에서 resample된 봉을 그대로 넣었을 때의 마지막 값과 같다.
+    data handler의 add_bar_listener에 on_bar를 등록하면 history로 warm up 한 뒤 매 봉마다 갱신된다.
+    """
+
+    value = math.nan
+
+    def update(self, open, high, low, close, volume):
+        raise NotImplementedError
+
+    def on_bar(self, symbol, timestamp, open, high, low, close, volume):
+        self.update(open, high, low, close, volume)
+
+    def warmup(self, df):
+        """df(open, high, low, close, volume 컬럼)의 봉을 순서대로 반영한다."""
+        columns = [df[c].to_numpy(dtype="float64").tolist() for c in ["open", "high", "low", "close", "volume"]]
+        for open, high, low, close, volume in zip(*columns):
+            self.update(open, high, low, close, volume)
+        return self.value
+
+
+class ForceIndexStream(StreamIndicator):
+    def __init__(self, period):
+        self.ewm = _Ewm(span=period, min_periods=period)
+
+    def update(self, open, high, low, close, volume):
+        self.value = self.ewm.update((close - open) * volume)
+        return self.value
+
+
+class RsiStream(StreamIndicator):
+    def __init__(self, period):
+        self.gain = _Ewm(span=period, min_periods=period)
+        self.loss = _Ewm(span=period, min_periods=period)
+        self.prev_close = None
+
+    def update(self, open, high, low, close, volume):
+        # 첫 봉의 diff는 NaN이므로 get_rsi와 같이 상승/하락 모두 0으로 반영한다.
+        diff = close - self.prev_close if self.prev_close is not None else math.nan
+        self.prev_close = close
+
+        avg_gain = self.gain.update(diff if diff > 0 else 0.0)
+        avg_loss = self.loss.update(diff * (-1) if diff < 0 else 0.0)
+        rs = _divide(avg_gain, avg_loss)
+        self.value = 1.0 - 1.0 / (1 + rs)
+        return self.value
+
+
+class StochasticStream(StreamIndicator):
+    def __init__(self, period1, period2):
+        self.high = _RollingExtreme(period1, True)
+        self.low = _RollingExtreme(period1, False)
+        self.fast_d = _RollingMean(period2)
+        self.slow_d = _RollingMean(period2)
+
+    def update(self, open, high, low, close, volume):
+        high = self.high.update(high)
+        low = self.low.update(low)
+        fast_k = _divide(close - low, high - low)
+        self.value = self.slow_d.update(self.fast_d.update(fast_k))
+        return self.value
+
+
+class AdxStream(StreamIndicator):
+    """value는 adx, dx는 마지막 dx."""
+
+    def __init__(self, period):
+        self.period = period
+        self.ewm = _Ewm(alpha=1 / period, min_periods=period)
+        self.prev = None
+        self.initial = []
+        self.smoothed = None
+        self.dx = math.nan
+
+    def update(self, open, high, low, close, volume):
+        prev, self.prev = self.prev, (high, low)
+        if prev is None:
+            return self.value
+
+        high_diff, low_diff = high - prev[0], -(low - prev[1])
+        dm_plus = high_diff if high_diff > low_diff else 0.0
+        dm_minus = low_diff if low_diff > high_diff else 0.0
+        dm_plus = dm_plus if dm_plus > 0 else 0.0
+        dm_minus = dm_minus if dm_minus > 0 else 0.0
+        tr = high - low
+
+        period = self.period
+        if self.smoothed is None:
+            self.initial.append((dm_plus, dm_minus, tr))
+            if len(self.initial) < period:
+                return self.value
+            self.smoothed = [float(v) for v in np.sum(np.array(self.initial), axis=0)]
+            self.initial = None
+        else:
+            self.smoothed = [s * (period - 1) / period + x for s, x in zip(self.smoothed, (dm_plus, dm_minus, tr))]
+
+        smoothed_dm_plus, smoothed_dm_minus, smoothed_tr = self.smoothed
+        di_plus = _divide(100 * smoothed_dm_plus, smoothed_tr)
+        di_minus = _divide(100 * smoothed_dm_minus, smoothed_tr)
+        self.dx = _divide(100 * abs(di_plus - di_minus), abs(di_plus + di_minus))
+        adx = self.ewm.update(self.dx)
+        if adx == adx:
+            self.value = adx
+        return self.value
+
+
+class MacdStream(StreamIndicator):
+    """value는 fast macd, signal은 signal macd."""
+
+    def __init__(self, ma_period1, ma_period2, signal_period):
+        assert ma_period1 < ma_period2
+        self.ma1 = _Ewm(span=ma_period1, min_periods=ma_period1)
+        self.ma2 = _Ewm(span=ma_period2, min_periods=ma_period2)
+        self.signal_ewm = _Ewm(span=signal_period, min_periods=signal_period)
+        self.signal = math.nan
+
+    def update(self, open, high, low, close, volume):
+        self.value = self.ma1.update(close) - self.ma2.update(close)
+        self.signal = self.signal_ewm.update(self.value)
+        return self.value
+
+
+class TrendStream(StreamIndicator):
+    def __init__(self, period):
+        self.period = period
+        self.bars = deque(maxlen=period)
+        self.total = 0.0
+        self.updates = 0
+
+    def update(self, open, high, low, close, volume):
+        bars = self.bars
+        if len(bars) == self.period:
+            self.total -= abs(bars[0][1] - bars[0][0])
+        bars.append((open, close))
+        self.total += abs(close - open)
+
+        self.updates += 1
+        if self.updates % self.period == 0:
+            self.total = math.fsum(abs(c - o) for o, c in bars)
+
+        self.value = _divide(100 * abs(close - bars[0][0]), self.total)
+        return self.value
@@ -313,18 +313,19 @@ class KAMAIndicator(IndicatorMixin):
             (efficiency_ratio * (2.0 / (self._pow1 + 1) - 2.0 / (self._pow2 + 1.0)) + 2 / (self._pow2 + 1.0)) ** 2.0
         ).values
 
-        self._kama = np.zeros(smoothing_constant.size)
-        len_kama = len(self._kama)
+        kama = [0.0] * smoothing_constant.size
+        closes = np.asarray(close_values, dtype="float64").tolist()
         first_value = True
 
-        for i in range(len_kama):
-            if np.isnan(smoothing_constant[i]):
-                self._kama[i] = np.nan
+        for i, constant in enumerate(smoothing_constant.tolist()):
+            if constant != constant:
+                kama[i] = np.nan
             elif first_value:
-                self._kama[i] = close_values[i]
+                kama[i] = closes[i]
                 first_value = False
             else:
-                self._kama[i] = self._kama[i - 1] + smoothing_constant[i] * (close_values[i] - self._kama[i - 1])
+                kama[i] = kama[i - 1] + constant * (closes[i] - kama[i - 1])
+        self._kama = np.array(kama, dtype="float64")
 
     def kama(self) -> pd.Series:
         """Kaufman's Adaptive Moving Average (KAMA)
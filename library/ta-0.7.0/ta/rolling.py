@@ -0,0 +1,128 @@
+"""
+.. module:: rolling
+   :synopsis: Sliding-window kernels shared by the indicators.
+
+Every function takes a 1-D array and returns a float64 array of the same length,
+aligned like ``pandas.Series.rolling(window, min_periods).<op>``: output ``i`` covers
+``values[max(0, i - window + 1) : i + 1]`` and is NaN when that window holds fewer
+than ``min_periods`` non-NaN values.
+
+"""
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# rows of full windows reduced at once, to bound the temporary (rows x window) arrays
+_CHUNK_ROWS = 65536
+
+
+def rolling_count(values: np.ndarray, window: int) -> np.ndarray:
+    """Number of non-NaN values in each window."""
+    valid = np.cumsum(~np.isnan(values), dtype="int64")
+    counts = valid.copy()
+    counts[window:] -= valid[:-window]
+    return counts
+
+
+def _apply_min_periods(output: np.ndarray, values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    if min_periods is None:
+        min_periods = window
+    output[rolling_count(values, window) < min_periods] = np.nan
+    return output
+
+
+def _reduce(values: np.ndarray, window: int, reduce_full, reduce_one) -> np.ndarray:
+    """reduce_full((rows, window)) -> (rows,) for full windows, reduce_one(1-D) for the leading partial ones."""
+    values = np.asarray(values, dtype="float64")
+    output = np.empty(len(values), dtype="float64")
+    for i in range(min(window - 1, len(values))):
+        output[i] = reduce_one(values[: i + 1])
+
+    if len(values) >= window:
+        windows = sliding_window_view(values, window)
+        for begin in range(0, len(windows), _CHUNK_ROWS):
+            chunk = windows[begin : begin + _CHUNK_ROWS]
+            output[window - 1 + begin : window - 1 + begin + len(chunk)] = reduce_full(chunk)
+    return output
+
+
+def _rolling_extreme_index(values: np.ndarray, window: int, is_max: bool) -> np.ndarray:
+    """Position of the first max (or min) inside each window, relative to the window start.
+
+    Monotonic deque, O(n). NaN wins over any number, like np.argmax / np.argmin.
+    """
+    candidates = deque()
+    positions = [0] * len(values)
+    for i, x in enumerate(values.tolist()):
+        if x != x:
+            while candidates and candidates[-1][1] == candidates[-1][1]:
+                candidates.pop()
+        elif is_max:
+            while candidates and candidates[-1][1] < x:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] > x:
+                candidates.pop()
+        candidates.append((i, x))
+
+        start = i - window + 1
+        if candidates[0][0] < start:
+            candidates.popleft()
+        positions[i] = candidates[0][0] - (start if start > 0 else 0)
+    return np.array(positions, dtype="float64")
+
+
+def rolling_argmax(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    values = np.asarray(values, dtype="float64")
+    return _apply_min_periods(_rolling_extreme_index(values, window, True), values, window, min_periods)
+
+
+def rolling_argmin(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    values = np.asarray(values, dtype="float64")
+    return _apply_min_periods(_rolling_extreme_index(values, window, False), values, window, min_periods)
+
+
+def rolling_max(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    values = np.asarray(values, dtype="float64")
+    positions = _rolling_extreme_index(values, window, True).astype("int64")
+    starts = np.maximum(np.arange(len(values)) - window + 1, 0)
+    return _apply_min_periods(values[starts + positions], values, window, min_periods)
+
+
+def rolling_min(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    values = np.asarray(values, dtype="float64")
+    positions = _rolling_extreme_index(values, window, False).astype("int64")
+    starts = np.maximum(np.arange(len(values)) - window + 1, 0)
+    return _apply_min_periods(values[starts + positions], values, window, min_periods)
+
+
+def rolling_sum(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """Exact per-window sum (no running-sum drift). NaN inside a window gives NaN."""
+    values = np.asarray(values, dtype="float64")
+    output = _reduce(values, window, lambda w: np.sum(w, axis=1), np.sum)
+    return _apply_min_periods(output, values, window, min_periods)
+
+
+def rolling_wma(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """sum(weights * window) for every full window, weights[0] applying to the oldest value."""
+    values = np.asarray(values, dtype="float64")
+    weights = np.asarray(weights, dtype="float64")
+    window = len(weights)
+    output = np.full(len(values), np.nan)
+    if len(values) >= window:
+        output[window - 1 :] = np.convolve(values, weights[::-1], mode="valid")
+    return _apply_min_periods(output, values, window, window)
+
+
+def rolling_mad(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """Mean absolute deviation around the window mean."""
+    values = np.asarray(values, dtype="float64")
+
+    def _full(w):
+        return np.mean(np.abs(w - np.mean(w, axis=1, keepdims=True)), axis=1)
+
+    def _one(x):
+        return np.mean(np.abs(x - np.mean(x)))
+
+    return _apply_min_periods(_reduce(values, window, _full, _one), values, window, min_periods)
@@ -8,7 +8,8 @@
 import numpy as np
 import pandas as pd
 
-from ta.utils import IndicatorMixin, _ema, _get_min_max, _sma
+from ta.rolling import rolling_argmax, rolling_argmin, rolling_mad, rolling_wma
+from ta.utils import IndicatorMixin, _ema, _get_min_max, _sma, _wilder_accumulate
 
 
 class AroonIndicator(IndicatorMixin):
@@ -36,9 +37,13 @@ class AroonIndicator(IndicatorMixin):
 
     def _run(self):
         min_periods = 0 if self._fillna else self._window
-        rolling_close = self._close.rolling(self._window, min_periods=min_periods)
-        self._aroon_up = rolling_close.apply(lambda x: float(np.argmax(x) + 1) / self._window * 100, raw=True)
-        self._aroon_down = rolling_close.apply(lambda x: float(np.argmin(x) + 1) / self._window * 100, raw=True)
+        close = self._close.to_numpy(dtype="float64")
+        self._aroon_up = pd.Series(
+            (rolling_argmax(close, self._window, min_periods) + 1) / self._window * 100, index=self._close.index
+        )
+        self._aroon_down = pd.Series(
+            (rolling_argmin(close, self._window, min_periods) + 1) / self._window * 100, index=self._close.index
+        )
 
     def aroon_up(self) -> pd.Series:
         """Aroon Up Channel
@@ -203,15 +208,8 @@ class WMAIndicator(IndicatorMixin):
         self._run()
 
     def _run(self):
-        _weight = pd.Series([i * 2 / (self._window * (self._window + 1)) for i in range(1, self._window + 1)])
-
-        def weighted_average(weight):
-            def _weighted_average(x):
-                return (weight * x).sum()
-
-            return _weighted_average
-
-        self._wma = self._close.rolling(self._window).apply(weighted_average(_weight), raw=True)
+        _weight = np.array([i * 2 / (self._window * (self._window + 1)) for i in range(1, self._window + 1)])
+        self._wma = pd.Series(rolling_wma(self._close.to_numpy(dtype="float64"), _weight), index=self._close.index)
 
     def wma(self) -> pd.Series:
         """Weighted Moving Average (WMA)
@@ -599,13 +597,13 @@ class CCIIndicator(IndicatorMixin):
         self._run()
 
     def _run(self):
-        def _mad(x):
-            return np.mean(np.abs(x - np.mean(x)))
-
         min_periods = 0 if self._fillna else self._window
         typical_price = (self._high + self._low + self._close) / 3.0
+        mad = pd.Series(
+            rolling_mad(typical_price.to_numpy(dtype="float64"), self._window, min_periods), index=typical_price.index
+        )
         self._cci = (typical_price - typical_price.rolling(self._window, min_periods=min_periods).mean()) / (
-            self._constant * typical_price.rolling(self._window, min_periods=min_periods).apply(_mad, True)
+            self._constant * mad
         )
 
     def cci(self) -> pd.Series:
@@ -670,14 +668,8 @@ class ADXIndicator(IndicatorMixin):
         self._trs_initial = np.zeros(self._window - 1)
         self._trs = np.zeros(len(self._close) - (self._window - 1))
         self._trs[0] = diff_directional_movement.dropna()[0 : self._window].sum()
-        diff_directional_movement = diff_directional_movement.reset_index(drop=True)
-
-        for i in range(1, len(self._trs) - 1):
-            self._trs[i] = (
-                self._trs[i - 1]
-                - (self._trs[i - 1] / float(self._window))
-                + diff_directional_movement[self._window + i]
-            )
+        diff_directional_movement = diff_directional_movement.to_numpy(dtype="float64")
+        self._trs = _wilder_accumulate(self._trs, diff_directional_movement, self._window, self._window)
 
         diff_up = self._high - self._high.shift(1)
         diff_down = self._low.shift(1) - self._low
@@ -687,18 +679,12 @@ class ADXIndicator(IndicatorMixin):
         self._dip = np.zeros(len(self._close) - (self._window - 1))
         self._dip[0] = pos.dropna()[0 : self._window].sum()
 
-        pos = pos.reset_index(drop=True)
-
-        for i in range(1, len(self._dip) - 1):
-            self._dip[i] = self._dip[i - 1] - (self._dip[i - 1] / float(self._window)) + pos[self._window + i]
+        self._dip = _wilder_accumulate(self._dip, pos.to_numpy(dtype="float64"), self._window, self._window)
 
         self._din = np.zeros(len(self._close) - (self._window - 1))
         self._din[0] = neg.dropna()[0 : self._window].sum()
 
-        neg = neg.reset_index(drop=True)
-
-        for i in range(1, len(self._din) - 1):
-            self._din[i] = self._din[i - 1] - (self._din[i - 1] / float(self._window)) + neg[self._window + i]
+        self._din = _wilder_accumulate(self._din, neg.to_numpy(dtype="float64"), self._window, self._window)
 
     def adx(self) -> pd.Series:
         """Average Directional Index (ADX)
@@ -706,21 +692,20 @@ class ADXIndicator(IndicatorMixin):
         Returns:
             pandas.Series: New feature generated.tr
         """
-        dip = np.zeros(len(self._trs))
-        for i in range(len(self._trs)):
-            dip[i] = 100 * (self._dip[i] / self._trs[i])
-
-        din = np.zeros(len(self._trs))
-        for i in range(len(self._trs)):
-            din[i] = 100 * (self._din[i] / self._trs[i])
+        dip = 100 * (self._dip / self._trs)
+        din = 100 * (self._din / self._trs)
 
         directional_index = 100 * np.abs((dip - din) / (dip + din))
 
         adx_series = np.zeros(len(self._trs))
         adx_series[self._window] = directional_index[0 : self._window].mean()
 
-        for i in range(self._window + 1, len(adx_series)):
-            adx_series[i] = ((adx_series[i - 1] * (self._window - 1)) + directional_index[i - 1]) / float(self._window)
+        adx_values = adx_series.tolist()
+        directional_values = directional_index.tolist()
+        window = float(self._window)
+        for i in range(self._window + 1, len(adx_values)):
+            adx_values[i] = ((adx_values[i - 1] * (self._window - 1)) + directional_values[i - 1]) / window
+        adx_series = np.array(adx_values, dtype="float64")
 
         adx_series = np.concatenate((self._trs_initial, adx_series), axis=0)
         adx_series = pd.Series(data=adx_series, index=self._close.index)
@@ -735,8 +720,9 @@ class ADXIndicator(IndicatorMixin):
             pandas.Series: New feature generated.
         """
         dip = np.zeros(len(self._close))
-        for i in range(1, len(self._trs) - 1):
-            dip[i + self._window] = 100 * (self._dip[i] / self._trs[i])
+        last = len(self._trs) - 1
+        if last > 1:
+            dip[1 + self._window : last + self._window] = 100 * (self._dip[1:last] / self._trs[1:last])
 
         adx_pos_series = self._check_fillna(pd.Series(dip, index=self._close.index), value=20)
         return pd.Series(adx_pos_series, name="adx_pos")
@@ -748,8 +734,9 @@ class ADXIndicator(IndicatorMixin):
             pandas.Series: New feature generated.
         """
         din = np.zeros(len(self._close))
-        for i in range(1, len(self._trs) - 1):
-            din[i + self._window] = 100 * (self._din[i] / self._trs[i])
+        last = len(self._trs) - 1
+        if last > 1:
+            din[1 + self._window : last + self._window] = 100 * (self._din[1:last] / self._trs[1:last])
 
         adx_neg_series = self._check_fillna(pd.Series(din, index=self._close.index), value=20)
         return pd.Series(adx_neg_series, name="adx_neg")
@@ -869,24 +856,25 @@ class PSARIndicator(IndicatorMixin):
         up_trend_high = self._high.iloc[0]
         down_trend_low = self._low.iloc[0]
 
-        self._psar = self._close.copy()
-        self._psar_up = pd.Series(index=self._psar.index)
-        self._psar_down = pd.Series(index=self._psar.index)
+        # path dependent loop over plain floats instead of per-element pandas access
+        high = self._high.to_numpy(dtype="float64").tolist()
+        low = self._low.to_numpy(dtype="float64").tolist()
+        psar = self._close.to_numpy(dtype="float64").tolist()
+        psar_up = [np.nan] * len(psar)
+        psar_down = [np.nan] * len(psar)
 
-        for i in range(2, len(self._close)):
+        for i in range(2, len(psar)):
             reversal = False
 
-            max_high = self._high.iloc[i]
-            min_low = self._low.iloc[i]
+            max_high = high[i]
+            min_low = low[i]
 
             if up_trend:
-                self._psar.iloc[i] = self._psar.iloc[i - 1] + (
-                    acceleration_factor * (up_trend_high - self._psar.iloc[i - 1])
-                )
+                psar[i] = psar[i - 1] + (acceleration_factor * (up_trend_high - psar[i - 1]))
 
-                if min_low < self._psar.iloc[i]:
+                if min_low < psar[i]:
                     reversal = True
-                    self._psar.iloc[i] = up_trend_high
+                    psar[i] = up_trend_high
                     down_trend_low = min_low
                     acceleration_factor = self._step
                 else:
@@ -894,20 +882,18 @@ class PSARIndicator(IndicatorMixin):
                         up_trend_high = max_high
                         acceleration_factor = min(acceleration_factor + self._step, self._max_step)
 
-                    low1 = self._low.iloc[i - 1]
-                    low2 = self._low.iloc[i - 2]
-                    if low2 < self._psar.iloc[i]:
-                        self._psar.iloc[i] = low2
-                    elif low1 < self._psar.iloc[i]:
-                        self._psar.iloc[i] = low1
+                    low1 = low[i - 1]
+                    low2 = low[i - 2]
+                    if low2 < psar[i]:
+                        psar[i] = low2
+                    elif low1 < psar[i]:
+                        psar[i] = low1
             else:
-                self._psar.iloc[i] = self._psar.iloc[i - 1] - (
-                    acceleration_factor * (self._psar.iloc[i - 1] - down_trend_low)
-                )
+                psar[i] = psar[i - 1] - (acceleration_factor * (psar[i - 1] - down_trend_low))
 
-                if max_high > self._psar.iloc[i]:
+                if max_high > psar[i]:
                     reversal = True
-                    self._psar.iloc[i] = down_trend_low
+                    psar[i] = down_trend_low
                     up_trend_high = max_high
                     acceleration_factor = self._step
                 else:
@@ -915,19 +901,23 @@ class PSARIndicator(IndicatorMixin):
                         down_trend_low = min_low
                         acceleration_factor = min(acceleration_factor + self._step, self._max_step)
 
-                    high1 = self._high.iloc[i - 1]
-                    high2 = self._high.iloc[i - 2]
-                    if high2 > self._psar.iloc[i]:
-                        self._psar[i] = high2
-                    elif high1 > self._psar.iloc[i]:
-                        self._psar.iloc[i] = high1
+                    high1 = high[i - 1]
+                    high2 = high[i - 2]
+                    if high2 > psar[i]:
+                        psar[i] = high2
+                    elif high1 > psar[i]:
+                        psar[i] = high1
 
             up_trend = up_trend != reversal  # XOR
 
             if up_trend:
-                self._psar_up.iloc[i] = self._psar.iloc[i]
+                psar_up[i] = psar[i]
             else:
-                self._psar_down.iloc[i] = self._psar.iloc[i]
+                psar_down[i] = psar[i]
+
+        self._psar = pd.Series(psar, index=self._close.index, name=self._close.name, dtype="float64")
+        self._psar_up = pd.Series(psar_up, index=self._close.index, dtype="float64")
+        self._psar_down = pd.Series(psar_down, index=self._close.index, dtype="float64")
 
     def psar(self) -> pd.Series:
         """PSAR value
@@ -76,3 +76,19 @@ def _get_min_max(series1: pd.Series, series2: pd.Series, function: str = "min"):
         raise ValueError('"f" variable value should be "min" or "max"')
 
     return pd.Series(output)
+
+
+def _wilder_accumulate(output: np.ndarray, values: np.ndarray, window: int, offset: int) -> np.ndarray:
+    """Wilder smoothing recurrence over plain floats.
+
+    output[i] = output[i - 1] - output[i - 1] / window + values[offset + i] for i in [1, len(output) - 1),
+    keeping output[0] and the last element as given.
+    """
+    out = output.tolist()
+    vals = values.tolist()
+    window = float(window)
+    prev = out[0]
+    for i in range(1, len(out) - 1):
+        prev = prev - (prev / window) + vals[offset + i]
+        out[i] = prev
+    return np.array(out, dtype="float64")
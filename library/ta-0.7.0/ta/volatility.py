@@ -8,6 +8,7 @@
 import numpy as np
 import pandas as pd
 
+from ta.rolling import rolling_sum
 from ta.utils import IndicatorMixin
 
 
@@ -48,9 +49,12 @@ class AverageTrueRange(IndicatorMixin):
         true_range = self._true_range(self._high, self._low, close_shift)
         atr = np.zeros(len(self._close))
         atr[self._window - 1] = true_range[0 : self._window].mean()
+        atr = atr.tolist()
+        true_ranges = true_range.to_numpy(dtype="float64").tolist()
+        window = float(self._window)
         for i in range(self._window, len(atr)):
-            atr[i] = (atr[i - 1] * (self._window - 1) + true_range.iloc[i]) / float(self._window)
-        self._atr = pd.Series(data=atr, index=true_range.index)
+            atr[i] = (atr[i - 1] * (self._window - 1) + true_ranges[i]) / window
+        self._atr = pd.Series(data=np.array(atr, dtype="float64"), index=true_range.index)
 
     def average_true_range(self) -> pd.Series:
         """Average True Range (ATR)
@@ -422,13 +426,8 @@ class UlcerIndex(IndicatorMixin):
         _ui_max = self._close.rolling(self._window, min_periods=1).max()
         _r_i = 100 * (self._close - _ui_max) / _ui_max
 
-        def ui_function():
-            def _ui_function(x):
-                return np.sqrt((x**2 / self._window).sum())
-
-            return _ui_function
-
-        self._ulcer_idx = _r_i.rolling(self._window).apply(ui_function(), raw=True)
+        squared = (_r_i**2 / self._window).to_numpy(dtype="float64")
+        self._ulcer_idx = pd.Series(np.sqrt(rolling_sum(squared, self._window)), index=self._close.index)
 
     def ulcer_index(self) -> pd.Series:
         """Ulcer Index (UI)
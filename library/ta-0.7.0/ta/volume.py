@@ -9,6 +9,7 @@
 import numpy as np
 import pandas as pd
 
+from ta.rolling import rolling_count, rolling_sum
 from ta.utils import IndicatorMixin, _ema
 
 
@@ -302,13 +303,10 @@ class NegativeVolumeIndexIndicator(IndicatorMixin):
     def _run(self):
         price_change = self._close.pct_change()
         vol_decrease = self._volume.shift(1) > self._volume
-        self._nvi = pd.Series(data=np.nan, index=self._close.index, dtype="float64", name="nvi")
-        self._nvi.iloc[0] = 1000
-        for i in range(1, len(self._nvi)):
-            if vol_decrease.iloc[i]:
-                self._nvi.iloc[i] = self._nvi.iloc[i - 1] * (1.0 + price_change.iloc[i])
-            else:
-                self._nvi.iloc[i] = self._nvi.iloc[i - 1]
+        # nvi[i] = nvi[i - 1] * factor[i] is a running product, evaluated left to right like the loop it replaces
+        factors = np.where(vol_decrease.to_numpy(), 1.0 + price_change.to_numpy(dtype="float64"), 1.0)
+        factors[0] = 1000
+        self._nvi = pd.Series(data=np.cumprod(factors), index=self._close.index, dtype="float64", name="nvi")
 
     def negative_volume_index(self) -> pd.Series:
         """Negative Volume Index (NVI)
@@ -368,15 +366,16 @@ class MFIIndicator(IndicatorMixin):
         mfr = typical_price * self._volume * up_down
 
         # Positive and negative money flow with n periods
+        # NaN flows add nothing to either sum and do not count toward min_periods.
         min_periods = 0 if self._fillna else self._window
-        n_positive_mf = mfr.rolling(self._window, min_periods=min_periods).apply(
-            lambda x: np.sum(np.where(x >= 0.0, x, 0.0)), raw=True
-        )
-        n_negative_mf = abs(
-            mfr.rolling(self._window, min_periods=min_periods).apply(
-                lambda x: np.sum(np.where(x < 0.0, x, 0.0)), raw=True
-            )
-        )
+        values = mfr.to_numpy(dtype="float64")
+        too_short = rolling_count(values, self._window) < min_periods
+        n_positive_mf = rolling_sum(np.where(values >= 0.0, values, 0.0), self._window, 0)
+        n_negative_mf = np.abs(rolling_sum(np.where(values < 0.0, values, 0.0), self._window, 0))
+        n_positive_mf[too_short] = np.nan
+        n_negative_mf[too_short] = np.nan
+        n_positive_mf = pd.Series(n_positive_mf, index=mfr.index)
+        n_negative_mf = pd.Series(n_negative_mf, index=mfr.index)
 
         # n_positive_mf = np.where(mf.rolling(self._window).sum() >= 0.0, mf, 0.0)
         # n_negative_mf = abs(np.where(mf.rolling(self._window).sum() < 0.0, mf, 0.0))
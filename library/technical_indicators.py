@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 import math
 
 
@@ -24,20 +23,14 @@ def stochastic_oscillator(data, fastk_period=14, slowk_period=1, slowd_period=3)
     if sz < fastk_period:
         # show error message
         raise SystemExit("short of input data history")
-    tempSto_K = []
-    for i in range(sz):
-        if i >= fastk_period - 1:
-            tempUp = df_temp["Close"][i] - min(df_temp["Low"][i - fastk_period + 1 : i + 1])
-            tempDown = max(df_temp["High"][i - fastk_period + 1 : i + 1]) - min(
-                df_temp["Low"][i - fastk_period + 1 : i + 1]
-            )
-            tempSto_K.append(tempUp / tempDown)
-        else:
-            tempSto_K.append(0)  # initialize 0 for the period of earlier than 'fastk_period'
-    df_temp["Sto_K"] = pd.Series(tempSto_K, index=df_temp.index)
-
-    df_temp["Sto_SlowK"] = pd.Series(pd.rolling_mean(df_temp["Sto_K"], slowk_period))
-    df_temp["Sto_SlowD"] = pd.Series(pd.rolling_mean(df_temp["Sto_D"], slowd_period))
+    lowest = df_temp["Low"].rolling(fastk_period).min()
+    highest = df_temp["High"].rolling(fastk_period).max()
+    # initialize 0 for the period of earlier than 'fastk_period'
+    df_temp["Sto_K"] = (df_temp["Close"] - lowest) / (highest - lowest)
+    df_temp.iloc[: fastk_period - 1, df_temp.columns.get_loc("Sto_K")] = 0
+
+    df_temp["Sto_SlowK"] = df_temp["Sto_K"].rolling(slowk_period).mean()
+    df_temp["Sto_SlowD"] = df_temp["Sto_SlowK"].rolling(slowd_period).mean()
 
     return df_temp
 
@@ -1,5 +1,4 @@
 import time
-import os
 import importlib
 from datetime import datetime, timedelta
 import logging
@@ -13,29 +12,47 @@ from common import helper
 from common import enum
 from common import log
 from . import base as mode
+from . import sink
+from . import stop
 from data import backtest as data
+from data import shared
 from order import backtest as order
 
 
 class BacktestMode(mode.Base):
-    def __init__(self, strategy_name: str, is_simple: bool, symbols_to_override=list()):
+    def __init__(
+        self, strategy_name: str, is_simple: bool, symbols_to_override=list(), data_plane=None, result_sink=None
+    ):
         mode.Base.__init__(self, strategy_name, False)
 
         # 간단한 결과만 확인하는 심플 모드 설정
         self.is_simple = is_simple
 
-        # 백테스트 결과를 저장할 디렉토리 생성
-        self.excel_out_directory = helper.create_directory("/backtest_result")
+        # 결과 저장 방식. 지정하지 않으면 심플 모드는 json, 그 외에는 엑셀로 저장한다.
+        if result_sink is None:
+            result_sink = sink.ColumnarSink("json") if is_simple else sink.ExcelSink()
+        self.sink = result_sink
 
         if symbols_to_override:
             self.args.symbols = symbols_to_override
 
         # 백테스트에서 사용할 데이터, 주문 핸들러
-        self.data_handler = data.BacktestData(self.args)
+        # data_plane이 주어지면 (Multi) 부모 프로세스가 공유 메모리에 올려둔 데이터를 사용한다.
+        if data_plane is not None:
+            self.data_handler = shared.SharedBacktestData(self.args, data_plane)
+        else:
+            self.data_handler = data.BacktestData(self.args)
         self.order_handler = order.BacktestOrder(self.args)
 
-        # 백테스트 분석 모듈 로드
-        self.analyzer = analyzer.Analyzer(self.args, self.order_handler)
+        # 백테스트 분석 모듈 로드. detail 결과를 사용하지 않는 sink면 detail analyzer를 만들지 않는다.
+        self.analyzer = analyzer.Analyzer(self.args, self.order_handler, self.sink.needs_detail)
+
+        # 조기 종료 규칙. 중단되면 stop_reason에 사유가 기록된다.
+        self.stop_rules = []
+        self.stop_reason = None
+
+    def add_stop_rule(self, rule: stop.StopRule):
+        self.stop_rules.append(rule)
 
     def __on_data(self, datas):
         # 로깅 형태를 데이터 시간 - 전략 - 메시지로 변경한다.
@@ -53,14 +70,15 @@ class BacktestMode(mode.Base):
         # analyzer.on_data는 order_handler.on_data 이후에 불려야 한다.
         self.analyzer.on_data(datas_wo_funding_rate)
 
+        for rule in self.stop_rules:
+            if reason := rule.on_data(self.order_handler, datas):
+                raise stop.StopBacktest(reason)
+
     def __on_order_done(self, order):
         self.strategy.on_order_done(order)
         self.analyzer.on_order_done(order)
 
-    def run(self, variables=list()):
-        self.data_handler.init(self.__on_data)
-        self.order_handler.init(self.__on_order_done)
-
+    def _load_strategy(self, variables):
         strategy = importlib.import_module("strategies." + self.args.strategy)
         self.strategy = getattr(strategy, self.args.strategy)(self.data_handler, self.order_handler, self.logging)
 
@@ -71,122 +89,54 @@ class BacktestMode(mode.Base):
                 for name, value in variables:
                     self.data_handler.set_variable(symbol, name, value)
 
+    def run(self, variables=list()):
+        self.data_handler.init(self.__on_data)
+        self.order_handler.init(self.__on_order_done)
+        self._load_strategy(variables)
+
         begin_ts = time.time()
         # 전략 실행
-        self.data_handler.run(self.strategy.on_start)
+        try:
+            self.data_handler.run(self.strategy.on_start)
+        except stop.StopBacktest as e:
+            # 중단된 시점까지의 결과로 요약을 만든다.
+            self.stop_reason = str(e)
+            self.logging.warning(f"Backtest stopped: {self.stop_reason}")
         self.logging.info(f"Backtest took {time.time() - begin_ts} seconds.")
+        return self._finish(variables)
 
+    def _finish(self, variables):
+        """analyzer를 마무리하고 요약, 주문 내역을 만들어 sink에 저장한다."""
         # 전략이 모두 실행된 후 analyzers의 finalize를 실행한다.
         self.analyzer.finalize()
 
-        summaries = self.__build_summary(variables)
+        summaries = self._build_summary(variables)
         for symbol, summary in summaries.items():
             self.logging.info(symbol)
             self.logging.info(summary)
 
-        order_histories = self._build_order_history()
-        for symbol, history in order_histories.items():
-            self.logging.info(symbol)
-            self.logging.info(history)
+        # 주문 내역, detail은 sink에서 필요할 때만 만든다.
+        order_histories = {}
+        if self.sink.needs_order_history:
+            order_histories = self._build_order_history()
+            for symbol, history in order_histories.items():
+                self.logging.info(symbol)
+                self.logging.info(history)
 
-        symbols_str = ""
         detail_datas = {}
-
-        for symbol in self.args.symbols:
-            if symbols_str != "":
-                symbols_str += "-"
-            symbols_str += symbol
-
-            if self.args.backtest.use_analyze_per_dataframe:
-                detail_data = self.__update_and_get_entire_df(symbol)
-                # logging.info(detail_data)
-                detail_datas[symbol] = detail_data
+        if self.sink.needs_detail and self.args.backtest.use_analyze_per_dataframe:
+            for symbol in self.args.symbols:
+                detail_datas[symbol] = self.__update_and_get_entire_df(symbol)
 
         # TODO: Create detail_ALL sheet in backtest result
         # if self.args.backtest.use_analyze_per_dataframe:
         # detail_datas['ALL'] = self.__update_and_get_entire_df_ALL()
 
-        if len(self.args.symbols) > 4:
-            symbols_str = f"{len(self.args.symbols)}symbols"
-
-        extra_filename = ""
-        if summaries and variables:
-            first_summary = summaries["ALL"]["total"]
-            sharpe = "{:.3f}".format(first_summary["Sharpe"]).replace(".", "_")
-            mdd = "{:.3f}".format(first_summary["Max Drawdown(%)"]).replace(".", "_")
-            extra_filename = f"sharpe_{sharpe}_mdd_{mdd}_"
-
-        variables_string, is_shortened = helper.variable_to_filename(variables)
-        filename = (
-            f"{self.args.strategy}_{self.args.ex_class}_{extra_filename}"
-            f"{variables_string}"
-            f'{self.args.backtest.start_time.strftime("%Y-%m-%d")}_'
-            f'{self.args.backtest.end_time.strftime("%Y-%m-%d")}_'
-            f"{symbols_str}_{self.args.interval}_{time.time()}.xlsx"
-        )
-
-        excel_path = os.path.join(self.excel_out_directory, filename)
-
-        if summaries:
-            begin_ts = time.time()
-            if self.is_simple:
-                json_file = (
-                    f"{self.args.ex_class}_"
-                    f'{self.args.backtest.start_time.strftime("%Y-%m-%d")}_'
-                    f'{self.args.backtest.end_time.strftime("%Y-%m-%d")}_'
-                    f"{self.args.interval}.json"
-                )
-                for symbol, summary in summaries.items():
-                    json_summary = f"backtest_result/{symbol}_{self.args.strategy}_summary_{json_file}"
-                    summary.to_json(json_summary, orient="columns")
-
-                for symbol, order_history in order_histories.items():
-                    json_order = f"backtest_result/{symbol}_{self.args.strategy}_order_{json_file}"
-                    order_history.to_json(json_order, orient="records")
-            else:
-                with pd.ExcelWriter(
-                    excel_path, engine="xlsxwriter"
-                ) as writer:  # pylint: disable=abstract-class-instantiated
-                    if is_shortened:
-                        var_df = pd.DataFrame(variables, columns=["variable", "value"])
-                        var_df.to_excel(writer, sheet_name="variables", index=False)
-
-                    for symbol, summary in summaries.items():
-                        summary.to_excel(writer, sheet_name=f"summary_{symbol}")
-
-                    if order_histories:
-                        total_orders = pd.concat(order_histories.values(), axis=0)
-                        total_orders.sort_values(by=["Open Date"], inplace=True)
-                        total_orders.to_excel(writer, sheet_name="orders")
-
-                    for symbol, order_history in order_histories.items():
-                        order_history.to_excel(writer, sheet_name=f"order_{symbol}")
-
-                    if detail_datas:
-                        is_chart_added = False
-                        for symbol, _data in detail_datas.items():
-                            if _data is not None:
-                                _data.to_excel(writer, sheet_name=f"detail_{symbol}")
-
-                                # Add cum PnL chart
-                                if not is_chart_added:
-                                    workbook = writer.book  # pylint: disable=no-member
-                                    worksheet = writer.sheets["summary_ALL"]
-                                    chart = workbook.add_chart({"type": "line"})
-                                    chart.add_series(
-                                        {
-                                            "values": f"=detail_{symbol}!$O$2:$O${len(_data)+1}",
-                                            "categories": f"detail_{symbol}!$A$2:$A${len(_data)+1}",
-                                        }
-                                    )
-                                    worksheet.insert_chart(f'B{len(summaries["ALL"])+3}', chart)
-                                    is_chart_added = True
-
-            self.logging.info(f"Writing excel took {time.time() - begin_ts} seconds.")
+        self.sink.write(self, variables, summaries, order_histories, detail_datas)
 
         return summaries
 
-    def __build_summary(self, variables):
+    def _build_summary(self, variables):
         from typing import Dict
 
         begin_ts = time.time()
@@ -37,7 +37,11 @@ class ApiHandler(BaseHTTPRequestHandler):
             print(msg)
             helper.send_slack(msg)
 
-        result = {"result": status}
+        result = {
+            "result": status,
+            "bar_skew_ms": self.data_handler.last_bar_skew_ms,
+            "stale_symbols": sorted(self.data_handler.stale_symbols),
+        }
 
         self.send_response(200)
         self.send_header("Content-type", "text/plain")
@@ -0,0 +1,153 @@
+import os
+import time
+
+import pandas as pd
+
+from common import helper
+
+
+class ResultSink:
+    """
+    BacktestMode.run이 만든 결과를 저장하는 곳.\n
+    needs_order_history, needs_detail이 False면 BacktestMode는 해당 결과를 만들지 않는다.
+    """
+
+    needs_order_history = False
+    needs_detail = False
+
+    def write(self, mode, variables, summaries, order_histories, detail_datas):
+        pass
+
+
+class MemorySink(ResultSink):
+    """파일을 쓰지 않고 summaries만 메모리에 들고 있는다. Multi 등 파라미터 최적화의 기본값."""
+
+    def __init__(self):
+        self.summaries = None
+
+    def write(self, mode, variables, summaries, order_histories, detail_datas):
+        self.summaries = summaries
+
+
+class ColumnarSink(ResultSink):
+    """
+    요약과 주문 내역을 심볼별 json 또는 parquet 파일로 저장한다.
+    json은 기존 simple 모드와 같은 파일명, 같은 형식으로 저장한다.
+    """
+
+    needs_order_history = True
+
+    def __init__(self, file_format="json"):
+        if file_format not in ("json", "parquet"):
+            raise ValueError(f"Invalid columnar format: {file_format}")
+        self.file_format = file_format
+
+    def write(self, mode, variables, summaries, order_histories, detail_datas):
+        if not summaries:
+            return
+
+        args = mode.args
+        out_directory = helper.create_directory("/backtest_result")
+        file_suffix = (
+            f"{args.ex_class}_"
+            f'{args.backtest.start_time.strftime("%Y-%m-%d")}_'
+            f'{args.backtest.end_time.strftime("%Y-%m-%d")}_'
+            f"{args.interval}.{self.file_format}"
+        )
+
+        begin_ts = time.time()
+        for symbol, summary in summaries.items():
+            path = os.path.join(out_directory, f"{symbol}_{args.strategy}_summary_{file_suffix}")
+            if self.file_format == "json":
+                summary.to_json(path, orient="columns")
+            else:
+                # 요약은 컬럼(기간)마다 타입이 섞여있으므로 기간을 행으로 바꿔서 저장한다.
+                table = summary.T
+                table.index = table.index.astype(str)
+                table.to_parquet(path)
+
+        for symbol, order_history in order_histories.items():
+            path = os.path.join(out_directory, f"{symbol}_{args.strategy}_order_{file_suffix}")
+            if self.file_format == "json":
+                order_history.to_json(path, orient="records")
+            else:
+                order_history.to_parquet(path)
+
+        mode.logging.info(f"Writing {self.file_format} took {time.time() - begin_ts} seconds.")
+
+
+class ExcelSink(ResultSink):
+    """요약, 주문 내역, detail 시트와 Cum PnL 차트를 포함한 엑셀 파일을 만든다. 단일 백테스트의 기본값."""
+
+    needs_order_history = True
+    needs_detail = True
+
+    def __init__(self, detail=True):
+        """detail이 False면 detail 시트와 Cum PnL 차트 없이 저장한다."""
+        self.needs_detail = detail
+
+    def write(self, mode, variables, summaries, order_histories, detail_datas):
+        if not summaries:
+            return
+
+        args = mode.args
+        symbols_str = "-".join(args.symbols)
+        if len(args.symbols) > 4:
+            symbols_str = f"{len(args.symbols)}symbols"
+
+        extra_filename = ""
+        if variables:
+            first_summary = summaries["ALL"]["total"]
+            sharpe = "{:.3f}".format(first_summary["Sharpe"]).replace(".", "_")
+            mdd = "{:.3f}".format(first_summary["Max Drawdown(%)"]).replace(".", "_")
+            extra_filename = f"sharpe_{sharpe}_mdd_{mdd}_"
+
+        variables_string, is_shortened = helper.variable_to_filename(variables)
+        filename = (
+            f"{args.strategy}_{args.ex_class}_{extra_filename}"
+            f"{variables_string}"
+            f'{args.backtest.start_time.strftime("%Y-%m-%d")}_'
+            f'{args.backtest.end_time.strftime("%Y-%m-%d")}_'
+            f"{symbols_str}_{args.interval}_{time.time()}.xlsx"
+        )
+
+        excel_path = os.path.join(helper.create_directory("/backtest_result"), filename)
+
+        begin_ts = time.time()
+        with pd.ExcelWriter(excel_path, engine="xlsxwriter") as writer:  # pylint: disable=abstract-class-instantiated
+            if is_shortened:
+                var_df = pd.DataFrame(variables, columns=["variable", "value"])
+                var_df.to_excel(writer, sheet_name="variables", index=False)
+
+            for symbol, summary in summaries.items():
+                summary.to_excel(writer, sheet_name=f"summary_{symbol}")
+
+            if order_histories:
+                total_orders = pd.concat(order_histories.values(), axis=0)
+                total_orders.sort_values(by=["Open Date"], inplace=True)
+                total_orders.to_excel(writer, sheet_name="orders")
+
+            for symbol, order_history in order_histories.items():
+                order_history.to_excel(writer, sheet_name=f"order_{symbol}")
+
+            if detail_datas:
+                is_chart_added = False
+                for symbol, _data in detail_datas.items():
+                    if _data is not None:
+                        _data.to_excel(writer, sheet_name=f"detail_{symbol}")
+
+                        # Add cum PnL chart
+                        if not is_chart_added:
+                            workbook = writer.book  # pylint: disable=no-member
+                            worksheet = writer.sheets["summary_ALL"]
+                            chart = workbook.add_chart({"type": "line"})
+                            chart.add_series(
+                                {
+                                    "values": f"=detail_{symbol}!$O$2:$O${len(_data)+1}",
+                                    "categories": f"detail_{symbol}!$A$2:$A${len(_data)+1}",
+                                }
+                            )
+                            worksheet.insert_chart(f'B{len(summaries["ALL"])+3}', chart)
+                            is_chart_added = True
+
+        mode.logging.info(f"Writing excel took {time.time() - begin_ts} seconds.")
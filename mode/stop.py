@@ -0,0 +1,35 @@
+class StopBacktest(Exception):
+    """StopRule이 백테스트를 중단시킬 때 발생한다. BacktestMode.run에서 처리한다."""
+
+    pass
+
+
+class StopRule:
+    """
+    백테스트 루프에서 매 봉마다 호출되는 조기 종료 규칙.\n
+    on_data가 문자열(중단 사유)을 반환하면 해당 케이스는 중단된다.
+    규칙은 상태를 가지므로 케이스마다 새 객체를 사용해야 한다.
+    """
+
+    def on_data(self, order_handler, datas):
+        return None
+
+
+class MaxDrawdownStop(StopRule):
+    """가치의 최고점 대비 하락률(%)이 threshold를 넘으면 중단한다. symbol이 없으면 전체 가치를 사용한다."""
+
+    def __init__(self, threshold, symbol=None):
+        self.threshold = threshold
+        self.symbol = symbol
+        self.max_value = 0.0
+
+    def on_data(self, order_handler, datas):
+        value = order_handler.get_value(self.symbol) if self.symbol else order_handler.get_value()
+        self.max_value = max(self.max_value, value)
+        if self.max_value <= 0.0:
+            return None
+
+        drawdown = 100 * (self.max_value - value) / self.max_value
+        if drawdown > self.threshold:
+            return f"max drawdown {drawdown:.2f}% exceeded {self.threshold}% at {datas[0][1].iloc[-1].name}"
+        return None
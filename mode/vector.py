@@ -0,0 +1,254 @@
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import enum
+from order import order as o
+from . import backtest
+from . import sink
+
+
+class VectorBacktestMode(backtest.BacktestMode):
+    """
+    목표 포지션 컬럼으로 표현되는 전략을 봉 단위 이벤트 루프 없이 실행하는 백테스트.\n
+    전략은 on_start에서 data_handler.update_entire_df(symbol, "target", values)로 봉마다 목표 포지션을 기록한다.
+    target은 -1.0 ~ 1.0 사이의 값으로, 부호는 방향(+ BUY, - SELL), 크기는 BALANCE 기준 rate이다. NaN은 0(포지션 없음)으로 본다.
+
+    봉 i의 target이 직전 봉과 달라지면 다음 봉 시가에 기존 포지션을 MARKET으로 close하고 새 target으로 open한다.
+    이는 BacktestMode에서 전략이 매 봉 종가에 같은 close/open MARKET 주문을 내는 것과 같은 결과를 만든다.
+    봉마다 바뀌는 값은 배열 연산으로 계산하고, 주문 체결, 펀딩비, 일 단위 analyzer 호출처럼 드물게 일어나는 이벤트만 순서대로 처리한다.
+    결과는 BacktestMode.run과 같은 summary, 주문 내역 형식으로 만들어진다.
+    전략의 on_data, on_order_done과 조기 종료 규칙, detail analyzer는 사용하지 않는다.
+    """
+
+    TARGET_COLUMN = "target"
+
+    def __init__(
+        self, strategy_name: str, is_simple: bool, symbols_to_override=list(), data_plane=None, result_sink=None
+    ):
+        # 봉마다 포지션 평가 금액을 갱신하지 않으므로 detail 결과는 만들지 않는다.
+        if result_sink is None and not is_simple:
+            result_sink = sink.ExcelSink(detail=False)
+        if result_sink is not None and result_sink.needs_detail:
+            raise ValueError("VectorBacktestMode does not support detail results.")
+        super().__init__(strategy_name, is_simple, symbols_to_override, data_plane, result_sink)
+
+    def run(self, variables=list()):
+        self.data_handler.init(lambda datas: None)
+        self.order_handler.init(self.analyzer.on_order_done)
+        self._load_strategy(variables)
+
+        begin_ts = time.time()
+        self.strategy.on_start()
+        self.__simulate()
+        self.logging.info(f"Vector backtest took {time.time() - begin_ts} seconds.")
+        return self._finish(variables)
+
+    def __get_targets(self, symbol, count):
+        entire_df = self.data_handler.get_entire_df(symbol)
+        if self.TARGET_COLUMN not in entire_df.columns:
+            raise ValueError(f"{symbol} has no '{self.TARGET_COLUMN}' column. Set it in on_start.")
+
+        targets = entire_df[self.TARGET_COLUMN].to_numpy(dtype="float64")[:count]
+        return np.where(np.isnan(targets), 0.0, targets)
+
+    def __build_events(self, clock, data_list):
+        """
+        ([(정렬 키, 이벤트 종류, 심볼 번호, 심볼 내 위치 또는 step)], 심볼별 target list).\n
+        정렬 키는 clock의 entry 번호이므로 같은 step 안에서도 BacktestMode와 같은 심볼 순서로 처리된다.
+        같은 entry에서는 펀딩비(0), 주문 체결(1) 순서이고 analyzer 호출(2)은 step의 마지막 entry 뒤에 온다.
+        """
+        offsets = clock.offsets
+        entry_symbols = np.asarray(clock.symbol_indices, dtype="int64")
+        entry_positions = np.asarray(clock.positions, dtype="int64")
+        entries = np.arange(len(entry_symbols))
+
+        events = []
+        all_targets = []
+        for symbol_index, data in enumerate(data_list):
+            mask = entry_symbols == symbol_index
+            count = int(mask.sum())
+            entry_of = np.empty(count, dtype="int64")
+            entry_of[entry_positions[mask]] = entries[mask]
+
+            # 봉 p의 target이 바뀌면 p + 1 번째 봉에서 체결된다. 마지막 봉의 변경은 체결되지 않는다.
+            targets = self.__get_targets(data.symbol, count)
+            changed = np.flatnonzero(targets != np.r_[0.0, targets[:-1]])
+            fills = changed[changed + 1 < count] + 1
+            events.extend(zip(entry_of[fills].tolist(), [1] * len(fills), [symbol_index] * len(fills), fills.tolist()))
+
+            schedule = np.asarray(data.funding_schedule, dtype="int64")
+            fundings = np.flatnonzero(schedule >= 0)
+            events.extend(
+                zip(entry_of[fundings].tolist(), [0] * len(fundings), [symbol_index] * len(fundings), fundings.tolist())
+            )
+            all_targets.append(targets.tolist())
+
+        # analyzer는 첫 심볼 봉의 날짜(일)나 연도가 바뀌는 step에서만 실제로 동작한다.
+        index = pd.DatetimeIndex(clock.axis.view("M8[ns]"))
+        tz = data_list[0].df.index.tz if data_list else None
+        if tz is not None:
+            index = index.tz_localize("UTC").tz_convert(tz)
+        days = index.day.to_numpy()
+        years = index.year.to_numpy()
+        changed = np.r_[True, (days[1:] != days[:-1]) | (years[1:] != years[:-1])] if len(days) else days
+        samples = np.flatnonzero(changed)
+        last_entries = offsets[samples + 1] - 1
+        events.extend(zip(last_entries.tolist(), [2] * len(samples), [-1] * len(samples), samples.tolist()))
+
+        events.sort()
+        return events, all_targets
+
+    def __make_order(self, symbol, opt, side, rate, price):
+        order = o.Order(
+            ex_alias=self.args.ex_alias,
+            strategy_name=self.args.nickname,
+            symbol=symbol.upper(),
+            opt=opt,
+            side=side,
+            order_type=enum.OrderType.MARKET,
+            rate=rate,
+            rate_base=enum.RateBase.BALANCE if opt is enum.OrderOpt.OPEN else None,
+            price=price,
+            stop_price=price,
+            reduce_only=opt is enum.OrderOpt.CLOSE,
+        )
+        order.order_ids = [self.order_handler.order_seq]
+        order.open_order_ids = order.order_ids[:]
+        self.order_handler.order_seq += 1
+        return order
+
+    def __simulate(self):
+        handler = self.order_handler
+        commission = handler.commission
+        clock = self.data_handler.clock
+        data_list = list(self.data_handler.datas.values())
+        first_row = self.data_handler.data_length - 1
+
+        # 이벤트 처리에서 읽는 값은 python list로 한 번만 변환한다.
+        opens = [d.df["open"].to_numpy(dtype="float64").tolist() for d in data_list]
+        closes = [d.df["close"].to_numpy(dtype="float64").tolist() for d in data_list]
+        symbols = [d.symbol for d in data_list]
+
+        usd = handler.usd
+        symbol_usd = handler.symbol_usd
+        positions = handler.pos
+
+        events, all_targets = self.__build_events(clock, data_list)
+        for _, kind, symbol_index, position in events:
+            if kind == 2:
+                # analyzer 호출 시점의 평가 금액. BacktestOrder.__update_value와 같은 순서로 더한다.
+                begin, end = clock.offsets[position], clock.offsets[position + 1]
+                total_profit = 0.0
+                datas = []
+                for entry in range(begin, end):
+                    i = clock.symbol_indices[entry]
+                    row = first_row + clock.positions[entry]
+                    symbol = symbols[i]
+                    profit = 0.0
+                    if pos := positions[symbol]:
+                        if pos.side is enum.OrderSide.BUY:
+                            profit = (pos.quantity * closes[i][row]) - (pos.quantity * pos.open_price)
+                        else:
+                            profit = (pos.quantity * pos.open_price) - (pos.quantity * closes[i][row])
+                    handler.symbol_profit[symbol] = profit
+                    handler.symbol_value[symbol] = symbol_usd[symbol] + profit
+                    total_profit += profit
+                    datas.append((symbol, data_list[i].df.iloc[row: row + 1]))
+
+                handler.usd = usd
+                handler.total_profit = total_profit
+                handler.total_value = usd + total_profit
+                self.analyzer.on_data(datas)
+                continue
+
+            data = data_list[symbol_index]
+            symbol = data.symbol
+            row = first_row + position
+            bar_time = data.df.index[row]
+            pos = positions[symbol]
+
+            if kind == 0:
+                funding_rate = data.funding_rates[data.funding_schedule[position]]
+                if not funding_rate:
+                    continue
+                funding_rate = round(funding_rate, 8)
+                handler.funding_rate[symbol] = funding_rate
+                if pos:
+                    close_price = closes[symbol_index][row]
+                    fee = pos.quantity * close_price * funding_rate
+                    if pos.side == enum.OrderSide.SELL:
+                        fee *= -1
+                    usd -= fee
+                    symbol_usd[symbol] -= fee
+                    pos.funding_fee += fee
+                    handler.funding_ledger.append(
+                        symbol, bar_time, funding_rate, close_price, pos.quantity, pos.side == enum.OrderSide.SELL, fee
+                    )
+                continue
+
+            price = opens[symbol_index][row]
+            decision_close = closes[symbol_index][row - 1]
+            target = all_targets[symbol_index][position - 1]
+
+            if pos:
+                order = self.__make_order(
+                    symbol,
+                    enum.OrderOpt.CLOSE,
+                    enum.OrderSide.BUY if pos.side is enum.OrderSide.SELL else enum.OrderSide.SELL,
+                    1.0,
+                    decision_close,
+                )
+                order.quantity = round(order.rate * pos.quantity, 10)
+                if pos.side is enum.OrderSide.BUY:
+                    profit = (order.quantity * price) - (order.quantity * pos.open_price)
+                else:
+                    profit = (order.quantity * pos.open_price) - (order.quantity * price)
+                usd += profit
+                symbol_usd[symbol] += profit
+
+                order.cost = price * order.quantity
+                usd -= order.cost * commission
+                symbol_usd[symbol] -= order.cost * commission
+                positions[symbol] = None
+
+                order.open_price = pos.open_price
+                order.open_time = pos.open_time
+                order.open_type = pos.open_type
+                order.funding_fee = pos.funding_fee
+                order.close_time = bar_time
+                order.close_price = price
+                order.close_type = order.order_type
+                order.pnl = profit
+                open_commission = (pos.open_price * order.quantity) * commission
+                close_commission = order.cost * commission
+                order.pnl_w_comm = profit - open_commission - close_commission
+
+                handler.dones[symbol].append(order)
+                handler.usd = usd
+                handler.order_done_cb(order)
+
+            if target:
+                side = enum.OrderSide.BUY if target > 0 else enum.OrderSide.SELL
+                order = self.__make_order(symbol, enum.OrderOpt.OPEN, side, abs(target), decision_close)
+                order.quantity = round((order.rate * usd) / (price * (1.0 + commission)), 10)
+                sym_quantity = round((order.rate * symbol_usd[symbol]) / (price * (1.0 + commission)), 10)
+
+                order.open_price = price
+                order.cost = price * order.quantity
+                order.open_time = bar_time
+                order.open_type = order.order_type
+
+                usd -= order.quantity * price * commission
+                symbol_usd[symbol] -= (sym_quantity or order.quantity) * price * commission
+
+                positions[symbol] = copy.deepcopy(order)
+                order.is_rate_added = True
+                handler.dones[symbol].append(order)
+                handler.usd = usd
+                if order.cost:
+                    handler.order_done_cb(order)
+
+        handler.usd = usd
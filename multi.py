@@ -12,6 +12,15 @@ if __name__ == "__main__":
                       ["ethusdt"], ["ethusdt", "xrpusdt"]
                    ])
 
+    Early stop rules (mode/stop.py) abort a case while it is running:
+    >>> multi.add_stop_rule(MaxDrawdownStop(50))
+
+    Indicators computed by the strategy through data_handler.get_indicator can be
+    precomputed once per unique parameter value before the workers start:
+    >>> multi.add_indicator("sma", window="long_period_mapping")
+
+    Finished cases are stored in backtest_result/<strategy>_multi_<start>_<end>_<interval>_<symbols>_results.db,
+    so changing the backtest range, interval or symbols starts a new store. Running again skips them. Use Multi(name, resume=False) to start over.
     """
 
     multi = Multi("skim_005_2")
@@ -0,0 +1,20 @@
+from common.optimizer import Optimizer, sharpe_mdd_objective
+
+if __name__ == "__main__":
+    """
+    Multi와 같은 방식으로 변수를 추가하고, 전체 그리드 대신 optimizer로 실행한다.
+
+    1. Successive halving: 모든 케이스를 짧은 기간으로 실행하고 상위 1/eta만 더 긴 기간으로 올린다.
+    >>> optimizer.run_halving(eta=3, min_days=30)
+
+    2. Surrogate: RandomForest + UCB로 다음에 실행할 케이스를 고른다.
+    >>> optimizer.run_surrogate(n_trials=100)
+    """
+
+    optimizer = Optimizer("skim_005_2", objective=sharpe_mdd_objective)
+    optimizer.add_variable("symbols", [["btcusdt", "ethusdt"]])
+    optimizer.add_variable("long_period_mapping", [7 * 24 * 60, 12 * 24 * 60, 15 * 24 * 60])
+    optimizer.add_variable("short_period_mapping", [100, 150])
+    optimizer.add_variable("stoch_mapping", [100, 150])
+    optimizer.add_variable("profit_cut", [0.01, 0.02])
+    optimizer.run_halving()
@@ -2,6 +2,8 @@ import sys
 from collections import defaultdict
 
 from . import base
+from . import fill
+from . import funding
 from order import order as o
 from common import enum
 from common import arg
@@ -27,6 +29,17 @@ class BacktestOrder(base.Base):
         self.max_position_count = sys.maxsize
         self.position_count = 0
 
+        # 주문 체결 계산 및 평가 금액 갱신용
+        self.fill_engine = fill.FillEngine()
+        self.all_pos_cost = 0.0
+        self.value_closes = {}
+        self.value_profits = {}
+        self.value_pos_costs = {}
+        self.value_dirty = set()
+
+        # 적용된 펀딩피 내역. funding.FundingLedger.audit으로 배열 연산으로 다시 계산해볼 수 있다.
+        self.funding_ledger = funding.FundingLedger()
+
     def _send_order_to_exchange(self, order: o.Order) -> int:
         # 백테스트에서는 실제 전송을 하지 않고 seq를 orderId로 사용한다.
         order_id = self.order_seq
@@ -42,79 +55,50 @@ class BacktestOrder(base.Base):
 
         return True
 
-    def __get_order_done_price(self, order, ohlcv) -> float:
-        if order.order_type is enum.OrderType.MARKET:
-            return ohlcv["open"]
-        elif order.order_type is enum.OrderType.STOP or order.order_type is enum.OrderType.STOP_MARKET:
-            if order.side is enum.OrderSide.BUY:
-                if ohlcv["open"] > order.price:
-                    # STOP BUY 주문이 오픈가 보다 낮을 경우 "already triggered"로 마켓 가격으로 사진다.
-                    return ohlcv["open"]
-                elif ohlcv["high"] >= order.price:
-                    # 지정가 보다 높게 가격이 올라갔다면 지정가로 구입한다.
-                    return order.price
-            else:  # SELL
-                if ohlcv["open"] < order.price:
-                    # STOP SELL 주문이 오픈가보다 높을 경우 "already triggered"로 마켓 가격으로 팔아진다.
-                    return ohlcv["open"]
-                elif ohlcv["low"] <= order.price:
-                    # 지정가 보다 낮게 가격이 내려갔다면 지정가로 판매한다.
-                    return order.price
-        elif order.order_type is enum.OrderType.TAKE_PROFIT or order.order_type is enum.OrderType.TAKE_PROFIT_MARKET:
-            if order.side is enum.OrderSide.BUY:
-                if ohlcv["open"] < order.price:
-                    # PROFIT BUY 주문이 오픈가 보다 높을 경우 "already triggered"로 마켓 가격으로 사진다.
-                    return ohlcv["open"]
-                elif ohlcv["low"] <= order.price:
-                    # 지정가 보다 낮게 가격이 내려갔다면 지정가로 구입한다.
-                    return order.price
-            else:  # SELL
-                if ohlcv["open"] > order.price:
-                    # PROFIT SELL 주문이 오픈가보다 낮을 경우 "already triggered"로 마켓 가격으로 팔아진다.
-                    return ohlcv["open"]
-                elif ohlcv["high"] >= order.price:
-                    # 지정가 보다 높게 가격이 올라갔다면 내려갔다면 지정가로 판매한다.
-                    return order.price
-        elif order.order_type is enum.OrderType.LIMIT:
+    def __get_order_done_price(self, order, bar, fill_code) -> float:
+        # MARKET, STOP, TAKE_PROFIT, LIMIT 주문의 체결 여부는 FillEngine에서 한 번에 계산한다.
+        if fill_code == fill.FILL_AT_OPEN:
+            return bar.open
+        elif fill_code == fill.FILL_AT_PRICE:
+            return order.price
+        elif fill_code == fill.FILL_TRAILING:
+            return self.__get_trailing_stop_price(order, bar)
+
+        return 0.0
+
+    def __get_trailing_stop_price(self, order, bar) -> float:
+        # trailing stop이 시작되지 않았다면, 시작 여부를 검사한다.
+        if not order.is_trailing_activated:
+            # activation price가 주어지지 않았다면, 항상 MARKET 가격으로 발동한다.
+            if not order.activation_price:
+                order.is_trailing_activated = True
+                order.activation_price = bar.open
+            # activation price가 주어졌다면, 발동 여부를 검사한다.
+            elif order.activation_price:
+                if order.activation_price >= bar.low and order.activation_price <= bar.high:
+                    order.is_trailing_activated = True
+
+        # trailing stop이 시작되었다면, 방향에 따라 가격을 설정한다.
+        if order.is_trailing_activated:
+            trailing_price = 0.0
             if order.side is enum.OrderSide.BUY:
-                if ohlcv["low"] <= order.price:
-                    return order.price
+                trailing_price = bar.low * (1.0 + order.callback_rate / 100)
+                if order.trailing_price == 0.0 or order.trailing_price > trailing_price:
+                    order.trailing_price = trailing_price
+                    # self.logging.info(f'Trailing price set: {trailing_price}, act: {order.activation_price},  h: {bar.high}, l: {bar.low}')  # noqa: E501
+
+                # 설정한 가격을 초과했었다면 해당 가격으로 거래한다.
+                if bar.high >= order.trailing_price:
+                    return order.trailing_price
             else:
-                if ohlcv["high"] >= order.price:
-                    return order.price
-        elif order.order_type is enum.OrderType.TRAILING_STOP_MARKET:
-            # trailing stop이 시작되지 않았다면, 시작 여부를 검사한다.
-            if not order.is_trailing_activated:
-                # activation price가 주어지지 않았다면, 항상 MARKET 가격으로 발동한다.
-                if not order.activation_price:
-                    order.is_trailing_activated = True
-                    order.activation_price = ohlcv["open"]
-                # activation price가 주어졌다면, 발동 여부를 검사한다.
-                elif order.activation_price:
-                    if order.activation_price >= ohlcv["low"] and order.activation_price <= ohlcv["high"]:
-                        order.is_trailing_activated = True
-
-            # trailing stop이 시작되었다면, 방향에 따라 가격을 설정한다.
-            if order.is_trailing_activated:
-                trailing_price = 0.0
-                if order.side is enum.OrderSide.BUY:
-                    trailing_price = ohlcv["low"] * (1.0 + order.callback_rate / 100)
-                    if order.trailing_price == 0.0 or order.trailing_price > trailing_price:
-                        order.trailing_price = trailing_price
-                        # self.logging.info(f'Trailing price set: {trailing_price}, act: {order.activation_price},  h: {ohlcv["high"]}, l: {ohlcv["low"]}')  # noqa: E501
-
-                    # 설정한 가격을 초과했었다면 해당 가격으로 거래한다.
-                    if ohlcv["high"] >= order.trailing_price:
-                        return order.trailing_price
-                else:
-                    trailing_price = ohlcv["high"] * (1.0 - order.callback_rate / 100)
-                    if order.trailing_price == 0.0 or order.trailing_price < trailing_price:
-                        order.trailing_price = trailing_price
-                        # self.logging.info(f'Trailing price set: {trailing_price}, act: {order.activation_price}, h: {ohlcv["high"]}, l: {ohlcv["low"]}')  # noqa: E501
+                trailing_price = bar.high * (1.0 - order.callback_rate / 100)
+                if order.trailing_price == 0.0 or order.trailing_price < trailing_price:
+                    order.trailing_price = trailing_price
+                    # self.logging.info(f'Trailing price set: {trailing_price}, act: {order.activation_price}, h: {bar.high}, l: {bar.low}')  # noqa: E501
 
-                    # 설정한 가격을 초과했었다면 해당 가격으로 거래한다.
-                    if ohlcv["low"] <= order.trailing_price:
-                        return order.trailing_price
+                # 설정한 가격을 초과했었다면 해당 가격으로 거래한다.
+                if bar.low <= order.trailing_price:
+                    return order.trailing_price
 
         return 0.0
 
@@ -154,8 +138,8 @@ class BacktestOrder(base.Base):
             self.logging.error(f"Invalid symbol rate base type: {rate_base}")
             return self.get_value(symbol)
 
-    def __process_open_order_done(self, order: o.Order, ohlcv) -> bool:
-        price = self.__get_order_done_price(order, ohlcv)
+    def __process_open_order_done(self, order: o.Order, bar, fill_code) -> bool:
+        price = self.__get_order_done_price(order, bar, fill_code)
         if not price:
             return False
 
@@ -173,7 +157,7 @@ class BacktestOrder(base.Base):
 
         order.open_price = price
         order.cost = price * order.quantity
-        order.open_time = ohlcv.name
+        order.open_time = bar.name
         order.open_type = order.order_type
 
         # 거래 금액 만큼 수수료 차감.
@@ -204,7 +188,7 @@ class BacktestOrder(base.Base):
         else:
             return (quantity * pos.open_price) - (quantity * close_price)
 
-    def __process_close_order_done(self, order: o.Order, ohlcv) -> bool:
+    def __process_close_order_done(self, order: o.Order, bar, fill_code) -> bool:
         pos = self.pos[order.symbol]
         if not pos:
             # 여러 close 주문을 동시에 넣은 경우 하나가 체결되면 다른 close 주문은 취소한다.
@@ -213,7 +197,7 @@ class BacktestOrder(base.Base):
             )
             return True
 
-        price = self.__get_order_done_price(order, ohlcv)
+        price = self.__get_order_done_price(order, bar, fill_code)
         if not price:
             return False
 
@@ -244,7 +228,7 @@ class BacktestOrder(base.Base):
         order.funding_fee = pos.funding_fee
 
         # close 주문 정보 업데이트
-        order.close_time = ohlcv.name
+        order.close_time = bar.name
         order.close_price = price
         order.close_type = order.order_type
 
@@ -259,31 +243,55 @@ class BacktestOrder(base.Base):
         self.position_count -= 1
         return True
 
-    def __process_order_done(self, order, ohlcv):
+    def __process_order_done(self, order, bar, fill_code):
         if order.opt is enum.OrderOpt.OPEN:
-            return self.__process_open_order_done(order, ohlcv)
+            return self.__process_open_order_done(order, bar, fill_code)
         elif order.opt is enum.OrderOpt.CLOSE:
-            return self.__process_close_order_done(order, ohlcv)
+            return self.__process_close_order_done(order, bar, fill_code)
         return False
 
-    def __update_value(self, datas):
-        self.total_profit = 0.0
+    def __begin_valuation(self, datas, bars):
+        # 이번 봉의 종가로 모든 심볼의 평가 금액을 다시 계산해야 한다.
+        self.value_closes = {symbol: bar.close for (symbol, _, _), bar in zip(datas, bars)}
+        self.value_profits = dict.fromkeys(self.value_closes, 0.0)
+        self.value_pos_costs = dict.fromkeys(self.value_closes, 0.0)
+        self.value_dirty = set(self.value_closes)
 
-        self.all_pos_cost = 0.0
-        for symbol, df, _ in datas:
-            # get all pos cost for calculating all_cash_values
-            if self.get_position(symbol):
-                self.all_pos_cost += self.get_position(symbol).cost
+    def __update_value(self):
+        """
+        변경된 심볼의 평가 금액만 다시 계산한다.
+        합계는 datas 순서대로 더하므로 모든 심볼을 매번 다시 계산할 때와 같은 값이 나온다.
+        """
+        if not self.value_dirty:
+            return
 
-            self.total_profit += self.__calculate_close_profit(symbol, df.iloc[-1]["close"])
+        for symbol in self.value_dirty:
+            close = self.value_closes.get(symbol)
+            if close is None:
+                continue
 
-            sym_profit = self.__calculate_close_profit(symbol, df.iloc[-1]["close"])
+            # get all pos cost for calculating all_cash_values
+            pos = self.get_position(symbol)
+            self.value_pos_costs[symbol] = pos.cost if pos else 0.0
+
+            sym_profit = self.__calculate_close_profit(symbol, close)
+            self.value_profits[symbol] = sym_profit
             self.symbol_profit[symbol] = sym_profit
             self.symbol_value[symbol] = self.symbol_usd[symbol] + sym_profit
+        self.value_dirty.clear()
+
+        self.total_profit = 0.0
+        for sym_profit in self.value_profits.values():
+            self.total_profit += sym_profit
+
+        self.all_pos_cost = 0.0
+        for pos_cost in self.value_pos_costs.values():
+            self.all_pos_cost += pos_cost
 
         self.total_value = self.usd + self.total_profit
 
-    def __update_funding_rate(self, symbol, funding_rate, close_price):
+    def __update_funding_rate(self, symbol, funding_rate, bar):
+        close_price = bar.close
         funding_rate = round(funding_rate, 8)
         self.funding_rate[symbol] = funding_rate
 
@@ -297,6 +305,9 @@ class BacktestOrder(base.Base):
             self.usd -= fee
             self.symbol_usd[symbol] -= fee
             pos.funding_fee += fee
+            self.funding_ledger.append(
+                symbol, bar.name, funding_rate, close_price, pos.quantity, pos.side == enum.OrderSide.SELL, fee
+            )
             self.logging.info(f"funding fee applied. symbol={symbol} fee={fee:.6f}, rate={funding_rate:.8f}")
 
     def init(self, order_done_cb):
@@ -308,39 +319,57 @@ class BacktestOrder(base.Base):
         """
         self.last_data = datas
 
-        for symbol, df, funding_rate in datas:
-            ohlcv = df.iloc[-1]
+        bars = [fill.Bar.from_df(df) for _, df, _ in datas]
+
+        # 모든 심볼의 미체결 주문 체결 여부를 한 번에 계산한다.
+        fill_codes = self.fill_engine.evaluate(bars, [self.opens[symbol] for symbol, _, _ in datas])
+        self.__begin_valuation(datas, bars)
 
+        for (symbol, _, funding_rate), bar in zip(datas, bars):
             # 펀딩피 업데이트 및 적용.
             # 이전 포지션에 대해 적용하므로 주문 처리 전에 수행.
             if funding_rate:
-                self.__update_funding_rate(symbol, funding_rate, ohlcv["close"])
+                self.__update_funding_rate(symbol, funding_rate, bar)
+                self.value_dirty.add(symbol)
 
             open_orders = [o for o in self.opens[symbol]]
             done_order_ids = []
 
             for order in open_orders:
-                if self.__process_order_done(order, ohlcv):
+                fill_code = fill_codes.get(id(order))
+                if fill_code is None or fill_code[0] is not order:
+                    # 이번 봉 처리 중에 콜백에서 새로 추가된 주문
+                    fill_code = self.fill_engine.evaluate_one(bar, order)
+                else:
+                    fill_code = fill_code[1]
+
+                if fill_code == fill.FILL_NONE and not (order.opt is enum.OrderOpt.CLOSE and self.pos[symbol] is None):
+                    # 체결되지 않는 주문. 포지션이 없는 close 주문은 취소 처리를 위해 아래에서 처리한다.
+                    continue
+
+                if self.__process_order_done(order, bar, fill_code):
                     done_order_ids.extend(order.order_ids)
+                    self.value_dirty.add(symbol)
 
                     if not order.cost:
                         # 이미 포지션이 있거나 close가 되어 자동 취소되는 주문.
-                        self.logging.warning(f"[{ohlcv.name}] order cancel: {order.to_json()}")
+                        self.logging.warning(f"[{bar.name}] order cancel: {order.to_json()}")
                         continue
 
                     self.logging.info(f"done: {order.to_json()}")
 
                     # 포지션 변화에 의한 profit 업데이트
-                    self.__update_value(datas)
+                    self.__update_value()
                     self.order_done_cb(order)
 
             # 체결된 주문이 없어도 profit은 계속 변한다.
-            self.__update_value(datas)
+            self.__update_value()
 
             # 완료 처리된 주문을 목록에서 제거한다.
-            self.opens[symbol] = [
-                o for o in self.opens[symbol] if not all(elem in done_order_ids for elem in o.order_ids)
-            ]
+            if done_order_ids:
+                self.opens[symbol] = [
+                    o for o in self.opens[symbol] if not all(elem in done_order_ids for elem in o.order_ids)
+                ]
 
     def get_value(self, symbol=None):
         if symbol is None:
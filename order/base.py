@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
 import logging
+import contextlib
 import copy
+import threading
 import time
 from collections import defaultdict
+from concurrent import futures
 
 from common import enum
 from common import arg
@@ -10,7 +13,26 @@ from common import log
 from order import order as o
 
 
+class OrderFuture(futures.Future):
+    """
+    batch() 안에서 open, close, cancel이 반환하는 future. result()는 batch 밖에서의 반환값(주문 id 또는 성공 여부)이다.\n
+    if not order_id: 처럼 참/거짓으로 검사하면 응답을 기다린 뒤 result()로 판단하므로 기존 전략 코드의 실패 검사가 그대로 동작한다.
+    """
+
+    def __bool__(self):
+        return bool(self.result())
+
+    @staticmethod
+    def resolved(value):
+        future = OrderFuture()
+        future.set_result(value)
+        return future
+
+
 class Base(ABC):
+    # 주문 전에 이전 cancel의 완료를 기다리는 최대 시간(초)
+    CANCEL_WAIT_TIMEOUT = 5.0
+
     def __init__(self, args: arg.Args):
         self.args = args
         self.last_data = None
@@ -21,6 +43,17 @@ class Base(ABC):
         self.dones = defaultdict(list[o.Order])
         self.totals = defaultdict(list[o.Order])
         self.cancel_cnts = defaultdict(int)
+        # cancel_cnts가 바뀔 때마다 notify 한다. 주문 전에 이전 cancel이 모두 CANCELED 될 때까지 기다리는 데 사용한다.
+        self.cancel_cond = threading.Condition()
+        # 심볼별 마지막 주문이 cancel 완료를 기다린 시간(ms)
+        self.cancel_wait_ms = defaultdict(float)
+
+        # batch() 안에서 반환한 OrderFuture list, 심볼별 batch cancel future list, 심볼별로 전송 중인 주문 list
+        self.batch_requests = None
+        self.batch_cancels = defaultdict(list)
+        self.sending = defaultdict(list[o.Order])
+        # opens, sending을 함께 바꾸거나 읽을 때 잡는다. batch 주문은 응답을 받은 thread에서 opens로 옮겨진다.
+        self.order_lock = threading.RLock()
 
         # 현재 펀딩피
         self.funding_rate = defaultdict(lambda: 0.0)
@@ -56,6 +89,53 @@ class Base(ABC):
     def _send_cancel_to_exchange(self, cancel: o.Cancel) -> bool:
         pass
 
+    def _submit_order_to_exchange(self, order: o.Order) -> futures.Future:
+        """batch() 안에서 사용하는 주문 전송. 기본 구현은 바로 전송하고 완료된 future를 반환한다."""
+        return self.__completed(self._send_order_to_exchange, order)
+
+    def _submit_cancel_to_exchange(self, cancel: o.Cancel) -> futures.Future:
+        """batch() 안에서 사용하는 취소 전송. 기본 구현은 바로 전송하고 완료된 future를 반환한다."""
+        return self.__completed(self._send_cancel_to_exchange, cancel)
+
+    @staticmethod
+    def __completed(send, request):
+        future = futures.Future()
+        try:
+            future.set_result(send(request))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        with 블록 안의 open, close, cancel 요청을 응답을 기다리지 않고 전송하고, 블록이 끝날 때 모든 응답을 기다린다.\n
+        블록 안에서 open, close, cancel은 항상 OrderFuture를 반환하며, with ... as pending 으로 반환된 OrderFuture 전체 list를 받는다.
+        같은 심볼의 cancel 뒤에 오는 주문은 그 cancel의 응답을 받은 뒤에 전송한다.
+        ex) with self.order_handler.batch() as pending:
+                for symbol in symbols: self.order_handler.open(symbol, ...)
+            order_ids = [f.result() for f in pending]
+        """
+        if self.batch_requests is not None:
+            # 이미 batch 안이면 바깥 batch에 합친다.
+            yield self.batch_requests
+            return
+
+        self.batch_requests = []
+        try:
+            yield self.batch_requests
+        finally:
+            pending, self.batch_requests = self.batch_requests, None
+            self.batch_cancels = defaultdict(list)
+            futures.wait(pending)
+
+    @staticmethod
+    def __chain(source, target):
+        if source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+
     def _add_position(self, order: o.Order) -> bool:
         current_pos = self.pos[order.symbol]
         # 포지션이 있는 상태에서도 포지션을 더 늘릴 수 있다.
@@ -83,24 +163,44 @@ class Base(ABC):
         
         return True
 
-    def __process_open_order(self, order) -> int | list[int]:
+    def _add_cancels(self, symbol, count):
+        """거래소가 접수한 cancel 수를 더한다."""
+        with self.cancel_cond:
+            self.cancel_cnts[symbol] += count
+            self.cancel_cond.notify_all()
+
+    def _ack_cancel(self, symbol):
+        """
+        cancel 하나가 CANCELED 되었음을 기록하고 기다리는 주문을 깨운다.\n
+        기다리다 timeout으로 0이 된 뒤에 늦게 도착한 CANCELED는 음수로 만들지 않고 무시한다.
+        """
+        with self.cancel_cond:
+            if self.cancel_cnts[symbol] <= 0:
+                self.logging.warning(f"CANCELED received with no pending cancel. symbol={symbol}")
+                return
+            self.cancel_cnts[symbol] -= 1
+            self.cancel_cond.notify_all()
+
+    def __process_open_order(self, order) -> bool:
         # open 주문은 reduce_only를 true로 보낸다.
         order.reduce_only = False
 
         self.logging.info(f"open: {order.to_json()}")
-        return self._send_order_to_exchange(order)
+        return True
 
-    def __process_close_order(self, order) -> int | list[int]:
+    def __process_close_order(self, order) -> bool:
         pos = self.pos[order.symbol]
         if not pos:
             self.logging.error(f"No position to close. order={order}")
-            return 0
+            return False
 
         order.side = enum.OrderSide.BUY if pos.side is enum.OrderSide.SELL else enum.OrderSide.SELL
 
-        # close 주문은 rate로 보내지 않는다.
+        # close 주문은 rate로 보내지 않는다. 아직 응답을 받지 못한 batch 주문도 이미 나간 주문으로 본다.
         quantity = round(order.rate * pos.quantity, 10)
-        for open_order in self.opens[order.symbol]:
+        with self.order_lock:
+            sent_orders = self.opens[order.symbol] + self.sending[order.symbol]
+        for open_order in sent_orders:
             if open_order.opt is order.opt and open_order.order_type is order.order_type:
                 quantity = round(quantity - open_order.quantity, 10)
         order.quantity = quantity
@@ -110,25 +210,62 @@ class Base(ABC):
         order.reduce_only = True
 
         self.logging.info(f"close: {order.to_json()}")
-        return self._send_order_to_exchange(order)
-
-    def __process_order(self, order: o.Order) -> int | list[int]:     
-        # cancel 주문이 CANCELED 될 때까지 기다린다.
-        cnt = 0
-        self.logging.info(f"self.cancel_cnts[cancel.symbol]: {self.cancel_cnts[order.symbol]}")
-        while self.cancel_cnts[order.symbol] > 0 and cnt < 500:
-            if cnt % 100 == 0:
-                self.logging.info(f"waiting for previous order to be CANCELED")
-            cnt += 1
-            time.sleep(0.01)
-        else:
-            self.cancel_cnts[order.symbol] = 0
+        return True
+
+    def __process_order(self, order: o.Order) -> int | list[int] | OrderFuture:     
+        if self.batch_requests is not None:
+            # 같은 심볼에 대해 batch 안에서 먼저 보낸 cancel의 응답을 기다린다.
+            futures.wait(self.batch_cancels[order.symbol])
+
+        # cancel 주문이 CANCELED 될 때까지(최대 CANCEL_WAIT_TIMEOUT초) 기다린다. 마지막 cancel이 완료되는 즉시 깨어난다.
+        with self.cancel_cond:
+            if self.cancel_cnts[order.symbol] > 0:
+                self.logging.info(f"waiting for previous order to be CANCELED. count={self.cancel_cnts[order.symbol]}")
+                begin = time.perf_counter()
+                if not self.cancel_cond.wait_for(lambda: self.cancel_cnts[order.symbol] <= 0, self.CANCEL_WAIT_TIMEOUT):
+                    # 응답을 받지 못한 cancel은 더 기다리지 않는다. 이후에 늦게 오는 CANCELED는 _ack_cancel에서 무시된다.
+                    self.logging.warning(f"timed out waiting for CANCELED. count={self.cancel_cnts[order.symbol]}")
+                    self.cancel_cnts[order.symbol] = 0
+                self.cancel_wait_ms[order.symbol] = (time.perf_counter() - begin) * 1000
+                self.logging.info(f"waited {self.cancel_wait_ms[order.symbol]:.1f}ms for CANCELED")
 
         if order.opt is enum.OrderOpt.OPEN:
-            order_id = self.__process_open_order(order)
+            ready = self.__process_open_order(order)
         elif order.opt is enum.OrderOpt.CLOSE:
-            order_id = self.__process_close_order(order)
-
+            ready = self.__process_close_order(order)
+
+        if not ready:
+            if self.batch_requests is None:
+                return 0
+            future = OrderFuture.resolved(0)
+            self.batch_requests.append(future)
+            return future
+
+        if self.batch_requests is None:
+            return self.__register_order(order, self._send_order_to_exchange(order))
+
+        # 응답을 받는 즉시(전송한 thread에서) 주문을 등록하고, 등록이 끝난 뒤에 반환한 future가 완료된다.
+        with self.order_lock:
+            self.sending[order.symbol].append(order)
+        registered = OrderFuture()
+        self._submit_order_to_exchange(order).add_done_callback(
+            lambda f: registered.set_result(self.__on_order_sent(order, f))
+        )
+        self.batch_requests.append(registered)
+        return registered
+
+    def __on_order_sent(self, order, future) -> int | list[int]:
+        # close 수량 계산에서 빠지지 않도록 opens에 등록한 뒤에 sending에서 제거한다.
+        with self.order_lock:
+            try:
+                if future.exception() is not None:
+                    self.logging.error(f"Failed to send order. order={order}", exc_info=future.exception())
+                    return 0
+                return self.__register_order(order, future.result())
+            finally:
+                self.sending[order.symbol].remove(order)
+
+    def __register_order(self, order, order_id) -> int | list[int]:
         if not order_id:
             self.logging.error(f"Failed to process order. order={order}")
             return 0
@@ -140,7 +277,8 @@ class Base(ABC):
             order.order_ids = [order_id]
             order.open_order_ids = [order_id]
 
-        self.opens[order.symbol].append(order)
+        with self.order_lock:
+            self.opens[order.symbol].append(order)
         return order_id
 
     def __send_order(
@@ -158,7 +296,7 @@ class Base(ABC):
         working_type,
         activation_price,
         callback_rate,
-    ) -> int | list[int]:
+    ) -> int | list[int] | OrderFuture:
         order: o.Order = o.Order(
             ex_alias=ex_alias,
             strategy_name=self.args.nickname,
@@ -181,7 +319,7 @@ class Base(ABC):
 
         return self.__process_order(order)
 
-    def __send_cancel(self, ex_alias, symbol, order_id) -> bool:
+    def __send_cancel(self, ex_alias, symbol, order_id) -> bool | OrderFuture:
         cancel: o.Cancel = o.Cancel(
             ex_alias=ex_alias,
             strategy_name=self.args.nickname,
@@ -190,11 +328,21 @@ class Base(ABC):
         )
 
         # True면 성공, False면 실패 (2052b85c3ea386f2ee0121851be40ba653fbf5e2 에서 변경됨)
-        return self._send_cancel_to_exchange(cancel)
-
-    def open(self, symbol, side, order_type, price, rate, rate_base, quantity, working_type) -> int | list[int]:
+        if self.batch_requests is None:
+            return self._send_cancel_to_exchange(cancel)
+
+        future = OrderFuture()
+        self._submit_cancel_to_exchange(cancel).add_done_callback(lambda f: self.__chain(f, future))
+        self.batch_requests.append(future)
+        self.batch_cancels[cancel.symbol].append(future)
+        return future
+
+    def open(
+        self, symbol, side, order_type, price, rate, rate_base, quantity, working_type
+    ) -> int | list[int] | OrderFuture:
         """
-        새로운 주문을 추가한다.
+        새로운 주문을 추가한다. 주문 id(분할 주문이면 id list)를 반환하고 실패하면 0을 반환한다.\n
+        batch() 안에서는 같은 값을 결과로 갖는 OrderFuture를 반환한다.
         """
         # slippage 기록을 위해 MARKET 주문일 때에도 최근가로 price를 채운다.
         if order_type is enum.OrderType.MARKET and self.last_data:
@@ -227,9 +375,10 @@ class Base(ABC):
         working_type,
         activation_price,
         callback_rate,
-    ) -> int | list[int]:
+    ) -> int | list[int] | OrderFuture:
         """
-        잡고 있던 포지션을 청산한다.
+        잡고 있던 포지션을 청산한다. 주문 id(분할 주문이면 id list)를 반환하고 실패하면 0을 반환한다.\n
+        batch() 안에서는 같은 값을 결과로 갖는 OrderFuture를 반환한다.
         """
 
         # slippage 기록을 위해 MARKET 주문일 때에도 최근가로 price를 채운다.
@@ -254,7 +403,11 @@ class Base(ABC):
             callback_rate=callback_rate,
         )
 
-    def cancel(self, symbol, order_id) -> bool:
+    def cancel(self, symbol, order_id) -> bool | OrderFuture:
+        """
+        주문을 취소한다. 성공 여부를 반환한다.\n
+        batch() 안에서는 같은 값을 결과로 갖는 OrderFuture를 반환한다.
+        """
         return self.__send_cancel(
             ex_alias=self.args.ex_alias,
             symbol=symbol,
@@ -0,0 +1,122 @@
+import numpy as np
+
+from common import enum
+
+# 주문 타입별 체결 조건 코드
+TYPE_NONE = 0
+TYPE_MARKET = 1
+TYPE_STOP = 2
+TYPE_TAKE_PROFIT = 3
+TYPE_LIMIT = 4
+TYPE_TRAILING_STOP = 5
+
+TYPE_CODES = {
+    enum.OrderType.MARKET: TYPE_MARKET,
+    enum.OrderType.STOP: TYPE_STOP,
+    enum.OrderType.STOP_MARKET: TYPE_STOP,
+    enum.OrderType.TAKE_PROFIT: TYPE_TAKE_PROFIT,
+    enum.OrderType.TAKE_PROFIT_MARKET: TYPE_TAKE_PROFIT,
+    enum.OrderType.LIMIT: TYPE_LIMIT,
+    enum.OrderType.TRAILING_STOP_MARKET: TYPE_TRAILING_STOP,
+}
+
+# 체결 결과 코드
+FILL_NONE = 0  # 체결되지 않음
+FILL_AT_OPEN = 1  # 시가로 체결 (MARKET, 이미 trigger 된 STOP/TAKE_PROFIT)
+FILL_AT_PRICE = 2  # 주문 가격으로 체결
+FILL_TRAILING = 3  # trailing stop. 상태가 있으므로 주문마다 따로 계산한다.
+
+
+class Bar:
+    """체결 계산에 사용하는 봉 하나의 값. 매 주문마다 pandas Series를 읽지 않도록 한 번만 꺼내둔다."""
+
+    __slots__ = ("open", "high", "low", "close", "name")
+
+    def __init__(self, open, high, low, close, name):
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.name = name
+
+    @staticmethod
+    def from_df(df):
+        ohlcv = df.iloc[-1]
+        return Bar(ohlcv["open"], ohlcv["high"], ohlcv["low"], ohlcv["close"], ohlcv.name)
+
+
+class FillEngine:
+    """
+    모든 심볼의 미체결 주문을 타입/방향/가격 배열로 모아 한 번의 numpy 연산으로 체결 여부를 계산한다.\n
+    체결 조건은 기존 BacktestOrder의 조건과 동일하다.
+    """
+
+    @staticmethod
+    def evaluate_codes(type_codes, is_buy, prices, opens, highs, lows):
+        t = type_codes
+        buy = is_buy
+        sell = ~is_buy
+
+        conditions = [
+            t == TYPE_MARKET,
+            t == TYPE_TRAILING_STOP,
+            # STOP BUY 주문이 오픈가 보다 낮을 경우 "already triggered"로 마켓 가격으로 사진다.
+            (t == TYPE_STOP) & buy & (opens > prices),
+            (t == TYPE_STOP) & buy & (highs >= prices),
+            (t == TYPE_STOP) & sell & (opens < prices),
+            (t == TYPE_STOP) & sell & (lows <= prices),
+            (t == TYPE_TAKE_PROFIT) & buy & (opens < prices),
+            (t == TYPE_TAKE_PROFIT) & buy & (lows <= prices),
+            (t == TYPE_TAKE_PROFIT) & sell & (opens > prices),
+            (t == TYPE_TAKE_PROFIT) & sell & (highs >= prices),
+            (t == TYPE_LIMIT) & buy & (lows <= prices),
+            (t == TYPE_LIMIT) & sell & (highs >= prices),
+        ]
+        choices = [
+            FILL_AT_OPEN,
+            FILL_TRAILING,
+            FILL_AT_OPEN,
+            FILL_AT_PRICE,
+            FILL_AT_OPEN,
+            FILL_AT_PRICE,
+            FILL_AT_OPEN,
+            FILL_AT_PRICE,
+            FILL_AT_OPEN,
+            FILL_AT_PRICE,
+            FILL_AT_PRICE,
+            FILL_AT_PRICE,
+        ]
+        return np.select(conditions, choices, default=FILL_NONE)
+
+    def evaluate(self, bars, order_lists):
+        """
+        bars[i]와 order_lists[i]는 같은 심볼이다.\n
+        return: {id(order): (order, 체결 결과 코드)}
+        """
+        orders = []
+        symbol_indices = []
+        for i, order_list in enumerate(order_lists):
+            orders.extend(order_list)
+            symbol_indices.extend([i] * len(order_list))
+
+        count = len(orders)
+        if count == 0:
+            return {}
+
+        type_codes = np.fromiter((TYPE_CODES.get(o.order_type, TYPE_NONE) for o in orders), dtype=np.int8, count=count)
+        is_buy = np.fromiter((o.side is enum.OrderSide.BUY for o in orders), dtype=bool, count=count)
+        prices = np.fromiter(
+            (o.price if o.price is not None else np.nan for o in orders), dtype=np.float64, count=count
+        )
+
+        symbol_indices = np.asarray(symbol_indices)
+        opens = np.array([b.open for b in bars], dtype=np.float64)[symbol_indices]
+        highs = np.array([b.high for b in bars], dtype=np.float64)[symbol_indices]
+        lows = np.array([b.low for b in bars], dtype=np.float64)[symbol_indices]
+
+        codes = self.evaluate_codes(type_codes, is_buy, prices, opens, highs, lows)
+        return {id(o): (o, int(c)) for o, c in zip(orders, codes.tolist())}
+
+    def evaluate_one(self, bar, order):
+        return self.evaluate([bar], [[order]])[id(order)][1]
+
@@ -1,4 +1,5 @@
 import json
+import queue
 import redis
 import threading
 import requests
@@ -7,6 +8,7 @@ import copy
 
 from datetime import datetime
 from collections import defaultdict
+from concurrent import futures
 
 from . import base
 from common import enum
@@ -37,17 +39,61 @@ class Listener(threading.Thread):
                 pass
 
 
+class OrderDispatcher:
+    """
+    주문 서버로 요청을 보내는 worker thread들.\n
+    모든 요청은 keep-alive session 하나를 공유하므로 요청마다 연결을 새로 맺지 않는다.
+    submit()으로 보낸 요청은 크기가 제한된 queue를 거쳐 worker들이 동시에 전송하고, 결과는 future로 받는다.
+    """
+
+    def __init__(self, base_url, worker_count=4, queue_size=256):
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=worker_count, pool_maxsize=worker_count)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        for _ in range(worker_count):
+            threading.Thread(target=self.__run, daemon=True).start()
+
+    def request(self, method, path, payload):
+        """요청을 바로 보내고 응답을 반환한다."""
+        return getattr(self.session, method)(self.base_url + path, json=payload)
+
+    def submit(self, method, path, payload, handle) -> futures.Future:
+        """handle(응답)의 반환값을 결과로 갖는 future. queue가 가득 차 있으면 자리가 날 때까지 기다린다."""
+        future = futures.Future()
+        self.queue.put((future, method, path, payload, handle))
+        return future
+
+    def __run(self):
+        while True:
+            future, method, path, payload, handle = self.queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(handle(self.request(method, path, payload)))
+            except Exception as e:
+                future.set_exception(e)
+
+
 class LiveOrder(base.Base):
     def __init__(self, args):
         base.Base.__init__(self, args)
         self.funding_rate_next_ts = defaultdict(lambda: 0)
         self.account_info = {}
+        self.dispatcher = None
 
     def _send_order_to_exchange(self, order: o.Order) -> int | list[int]:
-        order_config = config.order()
-        url = f'http://{order_config["Url"]}:{order_config["Port"]}/order'
+        return self.__handle_order_response(order, self.dispatcher.request("post", "/order", order.to_json()))
 
-        res = requests.post(url, json=order.to_json())
+    def _submit_order_to_exchange(self, order: o.Order) -> futures.Future:
+        return self.dispatcher.submit(
+            "post", "/order", order.to_json(), lambda res: self.__handle_order_response(order, res)
+        )
+
+    def __handle_order_response(self, order: o.Order, res) -> int | list[int]:
         data = res.json()
         self.logging.info(f"_send_order_to_exchange: order={order.to_json()}, res={data}")
 
@@ -73,10 +119,14 @@ class LiveOrder(base.Base):
             return None
 
     def _send_cancel_to_exchange(self, cancel: o.Cancel) -> bool:
-        order_config = config.order()
-        url = f'http://{order_config["Url"]}:{order_config["Port"]}/cancel'
+        return self.__handle_cancel_response(cancel, self.dispatcher.request("post", "/cancel", cancel.to_json()))
 
-        res = requests.post(url, json=cancel.to_json())
+    def _submit_cancel_to_exchange(self, cancel: o.Cancel) -> futures.Future:
+        return self.dispatcher.submit(
+            "post", "/cancel", cancel.to_json(), lambda res: self.__handle_cancel_response(cancel, res)
+        )
+
+    def __handle_cancel_response(self, cancel: o.Cancel, res) -> bool:
         data = res.json()
         self.logging.info(f"_send_cancel_to_exchange: cancel={cancel.to_json()}, res={data}")
 
@@ -95,7 +145,7 @@ class LiveOrder(base.Base):
         self.logging.info(f"_send_cancel_to_exchange: orderIds={orderIdList}")
 
         self.logging.info(f"self.cancel_cnts[cancel.symbol]: {self.cancel_cnts[cancel.symbol]} + {len(orderIdList)}")
-        self.cancel_cnts[cancel.symbol] += len(orderIdList)
+        self._add_cancels(cancel.symbol, len(orderIdList))
         return True
         
     def __process_open_order_done(self, order: o.Order, msg):
@@ -217,30 +267,32 @@ class LiveOrder(base.Base):
         self.logging.info(f'order_id info: {order_id}')
         self.logging.info(f'open info: {self.opens[symbol]}')
 
-        done_order = None
-        remain_orders = []
-        for order in self.opens[symbol]:
-            self.logging.info(f'order info: {order}')
-            self.logging.info(f'order_ids info: {order.order_ids}')
-            self.logging.info(f'open_order_ids info: {order.open_order_ids}')
-            if order_id in order.order_ids:
-                order.open_order_ids.remove(order_id)
-                done_order = order
-                self.logging.info(f'length of order.open_order_ids: {len(order.open_order_ids)}')
-            if len(order.open_order_ids) > 0:
-                remain_orders.append(order)
-
-        if done_order is None:
-            # 비정상적인 상황.
-            self.logging.error(f'open orders: {self.opens[symbol]}')
-            self.logging.error(f'Unexpected order received. order_id={order_id}')
-            return None
-
-        self.logging.info(f"status info: {status}")
-        self.logging.info(f"Remain_orders: {remain_orders}")
-        self.logging.info(f"Done_orders: {done_order}")
-
-        self.opens[symbol] = remain_orders
+        # batch 주문 응답 thread가 opens에 추가하는 것과 겹치지 않도록 lock을 잡고 갱신한다.
+        with self.order_lock:
+            done_order = None
+            remain_orders = []
+            for order in self.opens[symbol]:
+                self.logging.info(f'order info: {order}')
+                self.logging.info(f'order_ids info: {order.order_ids}')
+                self.logging.info(f'open_order_ids info: {order.open_order_ids}')
+                if order_id in order.order_ids:
+                    order.open_order_ids.remove(order_id)
+                    done_order = order
+                    self.logging.info(f'length of order.open_order_ids: {len(order.open_order_ids)}')
+                if len(order.open_order_ids) > 0:
+                    remain_orders.append(order)
+
+            if done_order is None:
+                # 비정상적인 상황.
+                self.logging.error(f'open orders: {self.opens[symbol]}')
+                self.logging.error(f'Unexpected order received. order_id={order_id}')
+                return None
+
+            self.logging.info(f"status info: {status}")
+            self.logging.info(f"Remain_orders: {remain_orders}")
+            self.logging.info(f"Done_orders: {done_order}")
+
+            self.opens[symbol] = remain_orders
         self.logging.info(f"Processing order done: {done_order.to_json()}")
 
         if status == 'FILLED':
@@ -250,7 +302,7 @@ class LiveOrder(base.Base):
             # 주문 취소는 open_orders에서 제거한 것으로 끝.
             # TODO: 만약 주문 cancel을 받아서 동작하는 전략이 있다면 수정 필요.
             self.logging.info(f"self.cancel_cnts[cancel.symbol]: {self.cancel_cnts[symbol]} - 1")
-            self.cancel_cnts[symbol] -= 1
+            self._ack_cancel(symbol)
             return None
         else:
             self.logging.error(f"unexpected order status: order={msg}")
@@ -271,18 +323,14 @@ class LiveOrder(base.Base):
 
     def __update_author(self):
         req = self.__create_req_common()
-        url = f"{self.__get_order_url()}/update_author"
-
-        res = requests.post(url, json=req)
+        res = self.dispatcher.request("post", "/update_author", req)
         if not res.ok:
             # 호환성을 위해, 또 critical한 설정이 아니므로 로그만 남긴다
             self.logging.info(f"Could not set author: err={res.json()}")
 
     def __get_account(self):
         req = self.__create_req_common()
-        url = f"{self.__get_order_url()}/account"
-
-        res = requests.get(url, json=req)
+        res = self.dispatcher.request("get", "/account", req)
         if res.status_code != 200:
             self.logging.error(f"Failed to get account info: err={res.json()}")
             return
@@ -291,9 +339,7 @@ class LiveOrder(base.Base):
 
     def __load_positions(self):
         req = self.__create_req_common()
-        url = f"{self.__get_order_url()}/positions"
-
-        res = requests.get(url, json=req)
+        res = self.dispatcher.request("get", "/positions", req)
         if res.status_code != 200:
             raise Exception(f"Failed to load positions: err={res.json()}")
 
@@ -332,9 +378,7 @@ class LiveOrder(base.Base):
 
     def __load_open_orders(self):
         req = self.__create_req_common()
-        url = f"{self.__get_order_url()}/open_orders"
-
-        res = requests.get(url, json=req)
+        res = self.dispatcher.request("get", "/open_orders", req)
         if res.status_code != 200:
             raise Exception(f"Failed to load open orders: err={res.json()}")
 
@@ -368,14 +412,12 @@ class LiveOrder(base.Base):
             self.logging.info("Use account default leverage")
             return
 
-        url = f"{self.__get_order_url()}/leverage"
-
         for symbol in self.args.symbols:
             req = self.__create_req_common()
             req["symbol"] = symbol
             req["leverage"] = self.args.leverage
 
-            res = requests.post(url, json=req)
+            res = self.dispatcher.request("post", "/leverage", req)
             if res.status_code != 200:
                 raise Exception(f"Failed to set leverage: err={res.json()}")
 
@@ -389,6 +431,10 @@ class LiveOrder(base.Base):
         self.order_done_cb = order_done_cb
         self.all_order_done_cb = all_order_done_cb
 
+        # 주문 서버 요청은 모두 dispatcher의 keep-alive session으로 보낸다. 분할 주문 수만큼 동시에 보낼 수 있게 한다.
+        worker_count = max(4, self.args.multi_order.split_count) if self.args.multi_order else 4
+        self.dispatcher = OrderDispatcher(self.__get_order_url(), worker_count=worker_count)
+
         # redis
         redis_config = config.redis()
         self.redis_client = redis.Redis(host=redis_config["Url"], port=redis_config["Port"], db=0)
@@ -416,9 +462,7 @@ class LiveOrder(base.Base):
             # funding rate 갱신 시간이 지났으므로 새로운 funding rate를 요청한다.
             req = self.__create_req_common()
             req["symbol"] = symbol
-            url = f"{self.__get_order_url()}/funding_rate"
-
-            res = requests.get(url, json=req)
+            res = self.dispatcher.request("get", "/funding_rate", req)
             if res.status_code != 200:
                 self.logging.error(f"Failed to get funding rate: err={res.json()}")
             else:
@@ -443,9 +487,7 @@ class LiveOrder(base.Base):
             }
 
         req = self.__create_req_common()
-        url = f"{self.__get_order_url()}/account"
-
-        res = requests.get(url, json=req)
+        res = self.dispatcher.request("get", "/account", req)
         if res.status_code != 200:
             self.logging.error(f"Failed to get account info: err={res.json()}")
             return
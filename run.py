@@ -1,5 +1,6 @@
 from mode import backtest
 from mode import live
+from mode import vector
 import ccxt
 import sys
 
@@ -37,6 +38,9 @@ if __name__ == "__main__":
     if mode_str == "backtest":
         # 백테스트
         argos = backtest.BacktestMode(strategy_name, False)
+    elif mode_str == "backtest_vector":
+        # target 컬럼 기반 전략의 벡터 백테스트
+        argos = vector.VectorBacktestMode(strategy_name, False)
     # elif mode_str == "backtest_simple":
     #     argos = backtest.BacktestMode(strategy_name, True)
     # elif mode_str == "live_paper":